@@ -3,15 +3,33 @@
 LangGraph 기반 AI Agent 논리 흐름 및 상태 관리
 """
 
-from typing import TypedDict, List, Any
+import asyncio
+import threading
+import time
+from contextlib import nullcontext
+from typing import TypedDict, List, Any, AsyncIterator, Dict, Iterator, Optional, Tuple
 from langgraph.graph import StateGraph, MessagesState, START, END
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import tool
-from rag_utils import load_chroma_vectorstore, get_retriever
-from config import AZURE_OPENAI_CHAT_MODEL, LegalAgentState
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from rag_utils import get_cached_embeddings, get_pooled_search_retriever
+from semantic_cache import SemanticAnswerCache
+from tracing import TraceRecorder, record_span, start_trace
+from legal_chunker import format_article_label
+from context_packing import estimate_tokens, postprocess_results
+from config import (
+    AZURE_OPENAI_CHAT_MODEL,
+    CONTEXT_TOKEN_BUDGET,
+    HISTORY_TOKEN_BUDGET,
+    RETRIEVAL_DEDUP_THRESHOLD,
+    RETRIEVAL_FETCH_K,
+    RETRIEVAL_MMR_LAMBDA,
+    RETRIEVAL_SCORE_THRESHOLD,
+    RETRIEVAL_TOP_K,
+    SEMANTIC_CACHE_ENABLED,
+    LegalAgentState,
+)
 
 # 1. State 정의 (MessagesState + RAG 검색 결과)
 class LegalAgentState(MessagesState):
@@ -20,19 +38,59 @@ class LegalAgentState(MessagesState):
     input: str  # ChatPromptTemplate 필수 입력
 
 # 2. RAG Tool 정의 (리트리버 래핑)
-@tool
-def search_law(query: str) -> str:
+# 본문은 LLM에 전달되고, artifact(참조 문서 목록)는 ToolMessage에 구조화된 형태로 남는다.
+@tool(response_format="content_and_artifact")
+def search_law(query: str) -> Tuple[str, List[Dict]]:
     """
     법률 질문에 대해 관련 법률 조항을 검색합니다.
     """
-    vectorstore = load_chroma_vectorstore()
-    retriever = get_retriever(vectorstore, top_k=5, score_threshold=0.7)
-    docs = retriever.invoke(query)
+    references = retrieve_references(query)
     # 간단 요약(실제 서비스에서는 더 정교하게)
-    if not docs:
-        return "관련 법률 조항을 찾지 못했습니다."
-    result = "\n\n".join([f"[출처: {d.metadata.get('source', '')} p{d.metadata.get('page', '')}]\n{d.page_content[:500]}..." for d in docs])
-    return result
+    if not references:
+        return "관련 법률 조항을 찾지 못했습니다.", []
+    result = "\n\n".join([format_reference(ref) for ref in references])
+    return result, references
+
+def retrieve_references(query: str, top_k: int = RETRIEVAL_TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET) -> List[Dict]:
+    """
+    검색 결과를 참조 문서 목록으로 변환 (search_law와 검색 전용 API 공용)
+    RETRIEVAL_FETCH_K개 후보를 점수 임계값으로 거른 뒤 중복 청크를 제외하고 MMR로 top_k개를 고르며,
+    본문은 전체 token_budget 안에서 질의와 가장 관련 있는 문장 구간만 발췌한다.
+    """
+    retriever = get_pooled_search_retriever(top_k=max(RETRIEVAL_FETCH_K, top_k), score_threshold=RETRIEVAL_SCORE_THRESHOLD)
+    candidates = retriever.invoke(query)
+    start = time.perf_counter()
+    packed = postprocess_results(
+        candidates, query, top_k=top_k, token_budget=token_budget,
+        dedup_threshold=RETRIEVAL_DEDUP_THRESHOLD, mmr_lambda=RETRIEVAL_MMR_LAMBDA,
+    )
+    record_span("context_packing", "rerank", (time.perf_counter() - start) * 1000,
+                candidates=len(candidates), doc_count=len(packed),
+                tokens=sum(estimate_tokens(excerpt) for _, excerpt in packed))
+    return [
+        {
+            "source": d.metadata.get('source', ''),
+            "page": d.metadata.get('page', ''),
+            "label": format_article_label(d.metadata, default=d.metadata.get('title')),
+            "content": excerpt,
+        }
+        for d, excerpt in packed
+    ]
+
+def format_reference(ref: Dict) -> str:
+    label = f"{ref['label']} · " if ref.get('label') else ""
+    page = f" p{ref['page']}" if ref.get('page') not in ('', None) else ""
+    return f"[출처: {label}{ref['source']}{page}]\n{ref['content']}"
+
+def extract_references(messages: List[Any]) -> List[Dict]:
+    """마지막 사용자 질문 이후 search_law ToolMessage의 artifact에서 참조 문서 수집"""
+    references = []
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, ToolMessage) and msg.artifact:
+            references = list(msg.artifact) + references
+    return references
 
 # 3. 프롬프트 템플릿 (역할/사고과정/법률적 인용)
 system_prompt = (
@@ -54,20 +112,282 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-# 4. LLM/Tool Agent 생성 (ReAct)
-llm = AzureChatOpenAI(model=AZURE_OPENAI_CHAT_MODEL, temperature=0)
+# 4. Tool 목록 (LLM/ReAct Agent는 build_legal_agent_graph에서 생성)
 tools = [search_law]
-agent = create_react_agent(llm, tools, prompt=prompt, state_schema=LegalAgentState)
 
-# 5. StateGraph 설계 (질문→RAG검색→답변생성)
-builder = StateGraph(LegalAgentState)
-builder.add_node("agent", agent)
-builder.add_edge(START, "agent")
-builder.add_edge("agent", END)
+# 5. 대화 기록 토큰 예산 관리 (예산을 넘는 오래된 메시지는 state에서 삭제)
+def trim_history(state: LegalAgentState):
+    messages = state["messages"]
+    kept = trim_messages(
+        messages,
+        max_tokens=HISTORY_TOKEN_BUDGET,
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human",
+    )
+    if not kept:
+        # 마지막 질문 하나만으로 예산을 넘는 경우에는 그대로 둔다
+        return {}
+    kept_ids = {msg.id for msg in kept}
+    removed = [RemoveMessage(id=msg.id) for msg in messages if msg.id not in kept_ids]
+    return {"messages": removed} if removed else {}
+
+# 6. StateGraph 설계 (기록 정리→질문→RAG검색→답변생성)
+def build_legal_agent_graph(llm=None, checkpointer=None):
+    """
+    법률 상담 그래프 생성
+    llm을 생략하면 AzureChatOpenAI, checkpointer를 생략하면 SQLite checkpointer를 사용한다.
+    (벤치마크/테스트에서는 로컬 대체 모델과 임시 checkpointer를 주입)
+    """
+    # langchain_openai, langgraph.prebuilt, SQLite checkpointer는 그래프를 처음 만들 때만 import
+    from langgraph.prebuilt import create_react_agent
+    from checkpointer import get_checkpointer
+
+    if llm is None:
+        from langchain_openai import AzureChatOpenAI
+        llm = AzureChatOpenAI(model=AZURE_OPENAI_CHAT_MODEL, temperature=0)
+    agent = create_react_agent(llm, tools, prompt=prompt, state_schema=LegalAgentState)
+
+    builder = StateGraph(LegalAgentState)
+    builder.add_node("trim_history", trim_history)
+    builder.add_node("agent", agent)
+    builder.add_edge(START, "trim_history")
+    builder.add_edge("trim_history", "agent")
+    builder.add_edge("agent", END)
 
-# 6. MemorySaver로 대화 기록 관리
-graph = builder.compile(checkpointer=InMemorySaver())
+    # SQLite checkpointer로 대화 기록 관리 (재시작 후에도 유지, 스레드별 이력 제한)
+    return builder.compile(checkpointer=checkpointer if checkpointer is not None else get_checkpointer())
+
+# 7. 그래프 지연 생성 (import 시에는 LLM 클라이언트/checkpointer를 만들지 않고 첫 사용 시 한 번만 생성)
+_GRAPH = None
+_GRAPH_LOCK = threading.Lock()
 
-# 7. 외부에서 사용할 수 있도록 graph 객체 export
 def get_legal_agent_graph():
-    return graph 
\ No newline at end of file
+    global _GRAPH
+    with _GRAPH_LOCK:
+        if _GRAPH is None:
+            _GRAPH = build_legal_agent_graph()
+        return _GRAPH
+
+def set_legal_agent_graph(graph) -> None:
+    """프로세스 전역 그래프 교체 (벤치마크/테스트에서 대체 모델로 만든 그래프 주입)"""
+    global _GRAPH
+    with _GRAPH_LOCK:
+        _GRAPH = graph
+
+def __getattr__(name: str):
+    # 기존 `from agent_flow import graph` 호환: 접근 시점에 그래프 생성
+    if name == "graph":
+        return get_legal_agent_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 8. 시맨틱 답변 캐시 (유사 질문은 LLM 호출 없이 응답)
+_ANSWER_CACHE: Optional[SemanticAnswerCache] = None
+_ANSWER_CACHE_LOCK = threading.Lock()
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global _ANSWER_CACHE
+    with _ANSWER_CACHE_LOCK:
+        if _ANSWER_CACHE is None:
+            _ANSWER_CACHE = SemanticAnswerCache(get_cached_embeddings())
+        return _ANSWER_CACHE
+
+def _lookup_cache(cache: Optional[SemanticAnswerCache], question: str) -> Optional[Dict]:
+    if cache is None:
+        return None
+    start = time.perf_counter()
+    hit = cache.lookup(question)
+    record_span("semantic_cache", "cache", (time.perf_counter() - start) * 1000,
+                hit=hit is not None, similarity=hit["similarity"] if hit else None)
+    return hit
+
+def _cached_turn(question: str, hit: Dict) -> Dict:
+    # 캐시 응답도 대화 기록(checkpoint)에 남겨 이후 턴의 맥락을 유지
+    return {"messages": [HumanMessage(content=question), AIMessage(content=hit["answer"])]}
+
+def _answer_from_cache(cache: Optional[SemanticAnswerCache], question: str, config: Dict) -> Optional[Dict]:
+    hit = _lookup_cache(cache, question)
+    if hit is None:
+        return None
+    get_legal_agent_graph().update_state(config, _cached_turn(question, hit), as_node="agent")
+    return {"answer": hit["answer"], "references": hit["references"], "cached": True}
+
+async def _aanswer_from_cache(cache: Optional[SemanticAnswerCache], question: str, config: Dict) -> Optional[Dict]:
+    # 캐시 조회는 임베딩 호출을 포함하므로 워커 스레드에서 실행
+    hit = await asyncio.to_thread(_lookup_cache, cache, question)
+    if hit is None:
+        return None
+    await get_legal_agent_graph().aupdate_state(config, _cached_turn(question, hit), as_node="agent")
+    return {"answer": hit["answer"], "references": hit["references"], "cached": True}
+
+def _has_prior_turns(messages: Optional[List[Any]]) -> bool:
+    # 호출자가 넘긴 messages에 이번 질문 외의 메시지가 있으면 이전 턴이 있는 대화
+    return messages is not None and len(messages) > 1
+
+def _answer_cache_for(use_cache: bool, messages: Optional[List[Any]], config: Dict) -> Optional[SemanticAnswerCache]:
+    """
+    스레드의 첫 턴에만 시맨틱 캐시 사용
+    이전 턴 맥락에 따라 달라지는 후속 질문("그럼 과태료는?")의 답변이 다른 스레드에 재사용되지 않도록
+    대화 기록이 있는 스레드에서는 조회/저장을 모두 건너뛴다.
+    """
+    if not use_cache or _has_prior_turns(messages):
+        return None
+    if get_legal_agent_graph().get_state(config).values.get("messages"):
+        return None
+    return get_answer_cache()
+
+async def _aanswer_cache_for(use_cache: bool, messages: Optional[List[Any]], config: Dict) -> Optional[SemanticAnswerCache]:
+    """_answer_cache_for의 비동기 버전 (checkpoint 조회에 aget_state 사용)"""
+    if not use_cache or _has_prior_turns(messages):
+        return None
+    if (await get_legal_agent_graph().aget_state(config)).values.get("messages"):
+        return None
+    return get_answer_cache()
+
+def _traced_config(config: Dict, trace: Optional[TraceRecorder]) -> Dict:
+    """추적 중이면 그래프 실행 config에 TraceRecorder 콜백 추가 (꺼져 있으면 config 그대로)"""
+    return {**config, "callbacks": [trace]} if trace is not None else config
+
+def _build_input_state(question: str, messages: Optional[List[Any]]) -> Dict:
+    return {
+        "messages": messages if messages is not None else [{"role": "user", "content": question}],
+        "input": question,
+    }
+
+def answer_question(
+    question: str,
+    thread_id: str,
+    messages: Optional[List[Any]] = None,
+    use_cache: bool = SEMANTIC_CACHE_ENABLED
+) -> Dict:
+    """
+    질문 하나에 대한 답변 생성 (Streamlit/헤드리스 API 공용 진입점)
+    반환: {"answer": str, "references": List[Dict], "cached": bool}
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    cache = _answer_cache_for(use_cache, messages, config)
+    trace = start_trace(thread_id, question)
+    with trace if trace is not None else nullcontext():
+        cached = _answer_from_cache(cache, question, config)
+        if cached is not None:
+            if trace is not None:
+                trace.finish(cached=True)
+            return cached
+
+        result = get_legal_agent_graph().invoke(_build_input_state(question, messages), config=_traced_config(config, trace))
+    answer = result["messages"][-1].content if result["messages"] else "답변 생성 실패"
+    references = extract_references(result["messages"])
+    if cache is not None and result["messages"]:
+        cache.store(question, answer, references)
+    return {"answer": answer, "references": references, "cached": False}
+
+def stream_answer(
+    question: str,
+    thread_id: str,
+    messages: Optional[List[Any]] = None,
+    use_cache: bool = SEMANTIC_CACHE_ENABLED
+) -> Iterator[Dict]:
+    """
+    답변을 이벤트 단위로 스트리밍
+    - {"type": "token", "content": str}: LLM 토큰
+    - {"type": "tool_start", "name": str}: 도구 호출 시작
+    - {"type": "tool_end", "name": str, "references": List[Dict]}: 도구 결과(구조화된 참조 문서)
+    - {"type": "final", "answer": str, "references": List[Dict], "cached": bool}: 최종 답변
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    cache = _answer_cache_for(use_cache, messages, config)
+    trace = start_trace(thread_id, question)
+    with trace if trace is not None else nullcontext():
+        cached = _answer_from_cache(cache, question, config)
+        if cached is not None:
+            if trace is not None:
+                trace.finish(cached=True)
+            yield {"type": "final", **cached}
+            return
+        references: List[Dict] = []
+        yield from _stream_graph_events(question, messages, _traced_config(config, trace), references)
+
+    final_messages = get_legal_agent_graph().get_state(config).values.get("messages", [])
+    answer = final_messages[-1].content if final_messages else "답변 생성 실패"
+    if cache is not None and final_messages:
+        cache.store(question, answer, references)
+    yield {"type": "final", "answer": answer, "references": references, "cached": False}
+
+_STREAM_OPTIONS = {"stream_mode": ["messages", "updates"], "subgraphs": True}
+
+def _stream_graph_events(question: str, messages: Optional[List[Any]], config: Dict, references: List[Dict]) -> Iterator[Dict]:
+    """graph.stream 이벤트를 token/tool_start/tool_end 이벤트로 변환 (도구 결과는 references에도 누적)"""
+    for _, mode, data in get_legal_agent_graph().stream(_build_input_state(question, messages), config=config, **_STREAM_OPTIONS):
+        yield from _to_answer_events(mode, data, references)
+
+def _to_answer_events(mode: str, data: Any, references: List[Dict]) -> Iterator[Dict]:
+    if mode == "messages":
+        chunk, metadata = data
+        if not isinstance(chunk, AIMessageChunk) or metadata.get("langgraph_node") != "agent":
+            return
+        for tool_call in chunk.tool_call_chunks:
+            if tool_call.get("name"):
+                yield {"type": "tool_start", "name": tool_call["name"]}
+        if isinstance(chunk.content, str) and chunk.content:
+            yield {"type": "token", "content": chunk.content}
+    elif "tools" in data:
+        for msg in (data["tools"] or {}).get("messages", []):
+            if isinstance(msg, ToolMessage):
+                tool_refs = list(msg.artifact or [])
+                references.extend(tool_refs)
+                yield {"type": "tool_end", "name": msg.name, "references": tool_refs}
+
+# 9. 비동기 진입점 (HTTP API: 여러 세션이 하나의 이벤트 루프와 리트리버를 공유)
+async def aanswer_question(
+    question: str,
+    thread_id: str,
+    messages: Optional[List[Any]] = None,
+    use_cache: bool = SEMANTIC_CACHE_ENABLED
+) -> Dict:
+    """answer_question의 비동기 버전 (graph.ainvoke 사용)"""
+    config = {"configurable": {"thread_id": thread_id}}
+    cache = await _aanswer_cache_for(use_cache, messages, config)
+    trace = start_trace(thread_id, question)
+    with trace if trace is not None else nullcontext():
+        cached = await _aanswer_from_cache(cache, question, config)
+        if cached is not None:
+            if trace is not None:
+                trace.finish(cached=True)
+            return cached
+
+        result = await get_legal_agent_graph().ainvoke(_build_input_state(question, messages), config=_traced_config(config, trace))
+    answer = result["messages"][-1].content if result["messages"] else "답변 생성 실패"
+    references = extract_references(result["messages"])
+    if cache is not None and result["messages"]:
+        await asyncio.to_thread(cache.store, question, answer, references)
+    return {"answer": answer, "references": references, "cached": False}
+
+async def astream_answer(
+    question: str,
+    thread_id: str,
+    messages: Optional[List[Any]] = None,
+    use_cache: bool = SEMANTIC_CACHE_ENABLED
+) -> AsyncIterator[Dict]:
+    """stream_answer의 비동기 버전 (graph.astream 사용, 이벤트 형식 동일)"""
+    config = {"configurable": {"thread_id": thread_id}}
+    cache = await _aanswer_cache_for(use_cache, messages, config)
+    trace = start_trace(thread_id, question)
+    with trace if trace is not None else nullcontext():
+        cached = await _aanswer_from_cache(cache, question, config)
+        if cached is not None:
+            if trace is not None:
+                trace.finish(cached=True)
+            yield {"type": "final", **cached}
+            return
+        references: List[Dict] = []
+        async for _, mode, data in get_legal_agent_graph().astream(
+            _build_input_state(question, messages), config=_traced_config(config, trace), **_STREAM_OPTIONS
+        ):
+            for event in _to_answer_events(mode, data, references):
+                yield event
+
+    final_messages = (await get_legal_agent_graph().aget_state(config)).values.get("messages", [])
+    answer = final_messages[-1].content if final_messages else "답변 생성 실패"
+    if cache is not None and final_messages:
+        await asyncio.to_thread(cache.store, question, answer, references)
+    yield {"type": "final", "answer": answer, "references": references, "cached": False}
\ No newline at end of file
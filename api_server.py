@@ -0,0 +1,294 @@
+# api_server.py
+"""
+법률 상담 에이전트 헤드리스 HTTP API (Starlette + uvicorn)
+- POST /chat: 답변 한 번에 반환
+- POST /chat/stream: SSE로 token/tool_start/tool_end/final 이벤트 스트리밍
+- POST /search: LLM 없이 검색 결과(참조 문서)만 반환
+- GET /health: 실행/대기 중인 요청 수
+모든 세션이 하나의 이벤트 루프, 그래프, 미리 로드한 리트리버를 공유하며
+같은 thread_id의 요청은 순서대로 실행하고, 대기 요청이 한도를 넘으면 429로 거절한다.
+
+실행: python api_server.py  (또는 uvicorn api_server:app)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+import agent_flow
+from config import (
+    API_MAX_CONCURRENCY,
+    API_MAX_PENDING,
+    API_MAX_PENDING_PER_THREAD,
+    API_REQUEST_TIMEOUT_SECONDS,
+    RETRIEVAL_TOP_K,
+    SEMANTIC_CACHE_ENABLED,
+)
+from rag_utils import get_pooled_search_retriever
+
+logger = logging.getLogger(__name__)
+
+
+class RequestLimiter:
+    """
+    요청 입장 제어
+    - 전역 실행 슬롯 max_concurrency개, 슬롯을 기다리는 요청은 max_pending개까지 (초과 시 거절)
+    - thread_id별 잠금으로 같은 대화의 턴은 순서대로 실행, 스레드당 요청은 max_per_thread개까지
+    단일 이벤트 루프에서만 사용하므로 카운터에 별도 잠금이 필요 없다.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = API_MAX_CONCURRENCY,
+        max_pending: int = API_MAX_PENDING,
+        max_per_thread: int = API_MAX_PENDING_PER_THREAD
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_per_thread = max_per_thread
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._threads: Dict[str, list] = {}  # thread_id -> [asyncio.Lock, 입장한 요청 수]
+        self._admitted = 0
+        self._active = 0
+        self.rejected = 0
+
+    def admit(self, thread_id: str) -> bool:
+        """요청을 받을 수 있으면 자리를 예약하고 True (이후 반드시 release 호출)"""
+        entry = self._threads.get(thread_id)
+        if self._admitted >= self.max_concurrency + self.max_pending or (entry and entry[1] >= self.max_per_thread):
+            self.rejected += 1
+            return False
+        if entry is None:
+            entry = self._threads[thread_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        self._admitted += 1
+        return True
+
+    def release(self, thread_id: str) -> None:
+        entry = self._threads[thread_id]
+        entry[1] -= 1
+        self._admitted -= 1
+        if entry[1] == 0:
+            del self._threads[thread_id]
+
+    @asynccontextmanager
+    async def slot(self, thread_id: str) -> AsyncIterator[None]:
+        """입장한 요청의 실행 구간: 같은 스레드의 이전 요청이 끝난 뒤 전역 슬롯을 얻는다"""
+        async with self._threads[thread_id][0], self._slots:
+            self._active += 1
+            try:
+                yield
+            finally:
+                self._active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self._active,
+            "pending": self._admitted - self._active,
+            "threads": len(self._threads),
+            "rejected": self.rejected,
+        }
+
+
+def _error(status: int, message: str, **headers: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status, headers=headers or None)
+
+
+def _too_busy() -> JSONResponse:
+    return _error(429, "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도하세요.", **{"Retry-After": "1"})
+
+
+async def _read_body(request: Request, field: str) -> Tuple[Optional[Dict[str, Any]], Optional[JSONResponse]]:
+    """JSON 본문과 필수 문자열 필드 검증 (실패 시 400 응답 반환)"""
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, _error(400, "JSON 본문이 필요합니다.")
+    if not isinstance(body, dict) or not isinstance(body.get(field), str) or not body[field].strip():
+        return None, _error(400, f"'{field}' 문자열이 필요합니다.")
+    return body, None
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    입장(admit)한 요청의 스트리밍 응답
+    본문 생성기가 시작되기 전에 클라이언트가 끊기거나 전송이 중단되어도 생성기를 닫고 예약을 반환한다.
+    (Starlette는 ClientDisconnect 시 background 작업을 실행하지 않으므로 __call__에서 정리)
+    """
+
+    def __init__(self, content: AsyncIterator[str], limiter: "RequestLimiter", thread_id: str, **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+        self.thread_id = thread_id
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()
+            finally:
+                self.limiter.release(self.thread_id)
+
+
+_STREAM_END = object()
+
+
+def _sse(event: Dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def chat(request: Request) -> JSONResponse:
+    body, error = await _read_body(request, "question")
+    if error:
+        return error
+    thread_id = str(body.get("thread_id") or uuid.uuid4())
+    limiter: RequestLimiter = request.app.state.limiter
+    if not limiter.admit(thread_id):
+        return _too_busy()
+
+    async def run() -> Dict:
+        async with limiter.slot(thread_id):
+            return await agent_flow.aanswer_question(
+                body["question"], thread_id=thread_id, use_cache=bool(body.get("use_cache", SEMANTIC_CACHE_ENABLED))
+            )
+
+    try:
+        result = await asyncio.wait_for(run(), timeout=API_REQUEST_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return _error(504, "답변 생성 시간이 초과되었습니다.")
+    finally:
+        limiter.release(thread_id)
+    return JSONResponse({**result, "thread_id": thread_id})
+
+
+async def chat_stream(request: Request):
+    body, error = await _read_body(request, "question")
+    if error:
+        return error
+    thread_id = str(body.get("thread_id") or uuid.uuid4())
+    limiter: RequestLimiter = request.app.state.limiter
+    if not limiter.admit(thread_id):
+        return _too_busy()
+
+    # 그래프 스트림은 한 작업(task) 안에서 끝까지 실행하고 이벤트는 큐로 전달
+    # (/chat과 같이 슬롯 대기를 포함한 전체 시간을 API_REQUEST_TIMEOUT_SECONDS로 제한)
+    async def produce(queue: asyncio.Queue) -> None:
+        try:
+            async with limiter.slot(thread_id):
+                async for event in agent_flow.astream_answer(
+                    body["question"], thread_id=thread_id, use_cache=bool(body.get("use_cache", SEMANTIC_CACHE_ENABLED))
+                ):
+                    await queue.put(event)
+        except Exception as e:
+            logger.error(f"스트리밍 답변 생성 실패 (thread_id={thread_id}): {e}")
+            await queue.put({"type": "error", "message": "답변 생성 중 오류가 발생했습니다."})
+        finally:
+            await queue.put(_STREAM_END)
+
+    async def events() -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(produce(queue))
+        deadline = time.monotonic() + API_REQUEST_TIMEOUT_SECONDS
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    yield _sse({"type": "error", "message": "답변 생성 시간이 초과되었습니다."})
+                    return
+                if event is _STREAM_END:
+                    return
+                yield _sse(event)
+        finally:
+            # 시간 초과/클라이언트 종료 시 그래프 실행을 취소하고 실행 슬롯 반환
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    return _AdmittedStreamingResponse(
+        events(),
+        limiter,
+        thread_id,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Thread-Id": thread_id},
+    )
+
+
+async def search(request: Request) -> JSONResponse:
+    body, error = await _read_body(request, "query")
+    if error:
+        return error
+    top_k = body.get("top_k", RETRIEVAL_TOP_K)
+    if not isinstance(top_k, int) or not 1 <= top_k <= 50:
+        return _error(400, "'top_k'는 1~50 사이 정수여야 합니다.")
+    # 검색 요청도 전역 슬롯을 공유 (스레드 직렬화가 필요 없으므로 요청마다 고유 키)
+    key = f"search:{uuid.uuid4()}"
+    limiter: RequestLimiter = request.app.state.limiter
+    if not limiter.admit(key):
+        return _too_busy()
+    try:
+        async with limiter.slot(key):
+            references = await asyncio.to_thread(agent_flow.retrieve_references, body["query"], top_k)
+    finally:
+        limiter.release(key)
+    return JSONResponse({"references": references})
+
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", **request.app.state.limiter.stats()})
+
+
+def warm_up_retriever() -> float:
+    """벡터스토어와 어휘 인덱스를 미리 열어 첫 요청의 cold start를 없앤다"""
+    start = time.perf_counter()
+    get_pooled_search_retriever()
+    return time.perf_counter() - start
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    # 동기 도구/임베딩 호출이 실행 슬롯 수만큼 동시에 돌 수 있도록 기본 executor 크기 조정
+    executor = ThreadPoolExecutor(max_workers=app.state.limiter.max_concurrency + 4, thread_name_prefix="api")
+    asyncio.get_running_loop().set_default_executor(executor)
+    elapsed = await asyncio.to_thread(warm_up_retriever)
+    logger.info(f"리트리버 준비 완료 ({elapsed:.2f}s)")
+    # 그래프(LLM 클라이언트/checkpointer)는 agent_flow import 시 만들지 않으므로 첫 요청 전에 생성
+    await asyncio.to_thread(agent_flow.get_legal_agent_graph)
+    yield
+    executor.shutdown(wait=False)
+
+
+def create_app(limiter: Optional[RequestLimiter] = None) -> Starlette:
+    app = Starlette(
+        routes=[
+            Route("/chat", chat, methods=["POST"]),
+            Route("/chat/stream", chat_stream, methods=["POST"]),
+            Route("/search", search, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.limiter = limiter or RequestLimiter()
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host=os.getenv("API_HOST", "0.0.0.0"), port=int(os.getenv("API_PORT", "8000")))
@@ -1,21 +1,26 @@
 import streamlit as st
+import time
 import uuid
 from config import AZURE_OPENAI_CHAT_MODEL
-from agent_flow import get_legal_agent_graph
+from agent_flow import answer_question, format_reference, get_answer_cache, get_legal_agent_graph, stream_answer
+from rag_utils import VECTORSTORE_POOL
+from tracing import get_trace_sink, tracing_enabled
 
 st.set_page_config(page_title="AI 법률 상담사", layout="wide")
 st.title("AI 법률 상담사 (Legal AI Consultant)")
 
 st.sidebar.header("설정")
 st.sidebar.write(f"사용 모델: {AZURE_OPENAI_CHAT_MODEL}")
+streaming = st.sidebar.toggle("스트리밍 응답", value=True)
 
 # 1. 에이전트 그래프 캐싱 (초기화 비용 절감)
-@st.cache_resource
+# 페이지 첫 렌더링을 막지 않도록 첫 질문이 들어올 때 한 번만 초기화한다.
+@st.cache_resource(show_spinner="법률 상담 에이전트 준비 중...")
 def load_agent():
+    # 벡터스토어/임베딩 클라이언트와 LLM 그래프를 함께 초기화
+    VECTORSTORE_POOL.warm_up()
     return get_legal_agent_graph()
 
-graph = load_agent()
-
 # 2. 세션 상태 초기화 (대화 기록, 참조 문서)
 if "messages" not in st.session_state:
     st.session_state["messages"] = []  # {"role": "user"|"ai", "content": str}
@@ -23,6 +28,8 @@ if "docs" not in st.session_state:
     st.session_state["docs"] = []      # 최근 참조 문서(법률 조항 등)
 if "thread_id" not in st.session_state:
     st.session_state["thread_id"] = str(uuid.uuid4())
+if "ttft" not in st.session_state:
+    st.session_state["ttft"] = None    # 최근 답변의 첫 토큰까지 걸린 시간(초)
 
 # 3. 기존 대화 메시지 출력
 for msg in st.session_state["messages"]:
@@ -41,27 +48,99 @@ if prompt := st.chat_input("법률 질문을 입력하세요 (예: 개인정보
     with st.chat_message("user"):
         st.markdown(prompt)
 
+    load_agent()
     # AI 답변 생성
     with st.chat_message("ai"):
-        with st.spinner("법률 정보 검색 및 답변 생성 중..."):
-            # LangGraph agent 호출 (대화 기록 전달)
-            # messages: [{"role": "user"|"ai", "content": ...}]
-            input_state = {
-                "messages": st.session_state["messages"],
-                "input": prompt  # ← 반드시 추가!
-            }
-            result = graph.invoke(input_state, config={"thread_id": st.session_state["thread_id"]})
-            ai_msg = result["messages"][-1].content if result["messages"] else "답변 생성 실패"
-            # 참조 문서(법률 조항) 추출: search_law tool의 결과가 답변 내에 포함됨
-            refs = []
-            if "[출처:" in ai_msg:
-                # 여러 개일 수 있으므로 분리
-                refs = [chunk for chunk in ai_msg.split("[출처:") if chunk.strip()]
-                refs = ["[출처:" + r for r in refs]
-            st.markdown(ai_msg)
+        start = time.perf_counter()
+        if streaming:
+            # LangGraph stream 이벤트로 토큰/도구 진행상황을 실시간 표시
+            tool_status = None
+            status_slot = st.container()
+            answer_slot = st.empty()
+            refs_slot = st.empty()
+            ai_msg, refs, cached, ttft = "", [], False, None
+            # 이전 대화는 checkpointer가 보관하므로 새 질문만 전달
+            for event in stream_answer(prompt, thread_id=st.session_state["thread_id"]):
+                if event["type"] == "token":
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    ai_msg += event["content"]
+                    answer_slot.markdown(ai_msg + "▌")
+                elif event["type"] == "tool_start":
+                    tool_status = status_slot.status(f"{event['name']} 실행 중…")
+                elif event["type"] == "tool_end":
+                    refs.extend(format_reference(ref) for ref in event["references"])
+                    if tool_status is not None:
+                        tool_status.update(label=f"{event['name']} 완료 (참조 {len(event['references'])}건)", state="complete")
+                    with refs_slot.container():
+                        with st.expander("참조 법률 조항/출처 보기"):
+                            for ref in refs:
+                                st.markdown(ref)
+                elif event["type"] == "final":
+                    ai_msg = event["answer"]
+                    refs = [format_reference(ref) for ref in event["references"]]
+                    cached = event["cached"]
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            if cached:
+                st.caption("유사 질문의 캐시된 답변입니다.")
+            answer_slot.markdown(ai_msg)
             if refs:
-                with st.expander("참조 법률 조항/출처 보기"):
-                    for ref in refs:
-                        st.markdown(ref)
-            # 대화 기록/참조 문서 세션에 저장
-            st.session_state["messages"].append({"role": "ai", "content": ai_msg, "refs": refs}) 
\ No newline at end of file
+                with refs_slot.container():
+                    with st.expander("참조 법률 조항/출처 보기"):
+                        for ref in refs:
+                            st.markdown(ref)
+        else:
+            with st.spinner("법률 정보 검색 및 답변 생성 중..."):
+                # LangGraph agent 호출 (이전 대화는 checkpointer가 보관하므로 새 질문만 전달)
+                # 유사 질문이 캐시에 있으면 LLM 호출 없이 답변
+                result = answer_question(prompt, thread_id=st.session_state["thread_id"])
+                ai_msg = result["answer"]
+                # 참조 문서(법률 조항): search_law tool의 구조화된 결과(artifact) 사용
+                refs = [format_reference(ref) for ref in result["references"]]
+                ttft = time.perf_counter() - start
+                if result["cached"]:
+                    st.caption("유사 질문의 캐시된 답변입니다.")
+                st.markdown(ai_msg)
+                if refs:
+                    with st.expander("참조 법률 조항/출처 보기"):
+                        for ref in refs:
+                            st.markdown(ref)
+        st.session_state["ttft"] = ttft
+        # 대화 기록/참조 문서 세션에 저장
+        st.session_state["messages"].append({"role": "ai", "content": ai_msg, "refs": refs})
+
+# 5. 응답 지연 및 시맨틱 캐시 통계
+if st.session_state["ttft"] is not None:
+    st.sidebar.metric("첫 토큰까지 시간 (TTFT)", f"{st.session_state['ttft']:.2f}s")
+cache_stats = get_answer_cache().stats()
+st.sidebar.subheader("답변 캐시")
+st.sidebar.write(f"적중률: {cache_stats['hit_rate']:.0%} (hit {cache_stats['hits']} / miss {cache_stats['misses']})")
+st.sidebar.write(f"저장 항목: {cache_stats['entries']}")
+
+# 6. 성능 추적 (마지막 턴의 구간별 소요 시간 + 최근 턴 p50/p95)
+if tracing_enabled():
+    sink = get_trace_sink()
+    st.sidebar.subheader("성능 추적")
+    last_traces = sink.recent_traces(limit=1, thread_id=st.session_state["thread_id"])
+    if last_traces:
+        last = last_traces[0]
+        label = " (캐시)" if last["cached"] else ""
+        st.sidebar.write(f"마지막 턴: {last['duration_ms']:.0f}ms{label}")
+        st.sidebar.dataframe(
+            [
+                {
+                    "구간": span["name"],
+                    "종류": span["kind"],
+                    "ms": round(span["duration_ms"], 1),
+                    "토큰": (span["attrs"].get("prompt_tokens") or 0) + (span["attrs"].get("completion_tokens") or 0) or None,
+                    "문서": span["attrs"].get("doc_count"),
+                }
+                for span in last["spans"]
+            ],
+            hide_index=True,
+        )
+    rolling = sink.span_percentiles(window=200)
+    if rolling:
+        st.sidebar.caption("최근 200턴 구간별 지연 (ms)")
+        st.sidebar.dataframe(rolling, hide_index=True)
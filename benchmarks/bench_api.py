@@ -0,0 +1,204 @@
+# benchmarks/bench_api.py
+"""
+HTTP API(api_server) 부하 테스트: 가짜 채팅 모델 + 로컬 임베딩으로 uvicorn 서버를 띄우고 동시 요청을 보낸다.
+- /search, /chat, /chat/stream 동시성 단계별 requests/sec, 지연시간 p50/p95 (스트리밍은 첫 토큰까지 시간 포함)
+- 같은 동시성으로 스레드에서 동기 answer_question을 호출한 경우(기존 Streamlit 방식)와 처리량 비교
+- 같은 thread_id로 몰아서 보낸 요청의 직렬화/거절(429) 확인
+
+사용법: python benchmarks/bench_api.py --concurrency 1,8,32 --requests 64 --model-latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from common import FakeChatModel, HashingEmbeddings, make_queries, make_statute_corpus, percentiles
+
+for key, value in {
+    "AZURE_OPENAI_API_KEY": "offline-benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://example.invalid",
+    "OPENAI_API_VERSION": "2024-06-01",
+    "AZURE_OPENAI_CHAT_MODEL": "gpt-4o",
+    "AZURE_OPENAI_EMBEDDING_MODEL": "text-embedding-3-small",
+    "TRACING_ENABLED": "false",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx
+import uvicorn
+
+
+def summarize(latencies_ms: List[float], statuses: Counter, seconds: float) -> Dict:
+    ok = statuses.get(200, 0)
+    return {
+        "requests": sum(statuses.values()),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(ok / seconds, 1) if seconds else 0.0,
+        "latency_ms": {k: round(v, 1) for k, v in percentiles(latencies_ms).items()},
+    }
+
+
+async def _request(client: httpx.AsyncClient, path: str, payload: Dict, first_token_ms: List[float]) -> int:
+    if path != "/chat/stream":
+        return (await client.post(path, json=payload)).status_code
+    start = time.perf_counter()
+    async with client.stream("POST", path, json=payload) as response:
+        if response.status_code != 200:
+            return response.status_code
+        seen_token = False
+        async for line in response.aiter_lines():
+            if line == "event: token" and not seen_token:
+                first_token_ms.append((time.perf_counter() - start) * 1000)
+                seen_token = True
+            elif line in ("event: final", "event: error"):
+                return 200 if line == "event: final" else 500
+    return 200
+
+
+async def run_load(base_url: str, path: str, payloads: List[Dict], concurrency: int) -> Dict:
+    """concurrency개 작업자가 payloads를 나눠 순서대로 요청"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies, first_token_ms, statuses = [], [], Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def worker():
+            while not queue.empty():
+                payload = queue.get_nowait()
+                start = time.perf_counter()
+                statuses[await _request(client, path, payload, first_token_ms)] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    report = summarize(latencies, statuses, elapsed)
+    if first_token_ms:
+        report["first_token_ms"] = {k: round(v, 1) for k, v in percentiles(first_token_ms).items()}
+    return report
+
+
+def run_sync_threads(questions: List[str], concurrency: int, prefix: str) -> Dict:
+    """기존 방식 비교: 스레드마다 동기 answer_question (graph.invoke) 호출"""
+    import agent_flow
+
+    latencies, statuses = [], Counter()
+
+    def call(item):
+        i, question = item
+        start = time.perf_counter()
+        agent_flow.answer_question(question, thread_id=f"{prefix}-{i % concurrency}", use_cache=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[200] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, enumerate(questions)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+async def burst_same_thread(base_url: str, question: str, n: int) -> Dict:
+    """한 thread_id로 n개를 동시에 보내 직렬화와 429 거절 확인"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        responses = await asyncio.gather(*(
+            client.post("/chat", json={"question": question, "thread_id": "burst", "use_cache": False})
+            for _ in range(n)
+        ))
+    return {"sent": n, "statuses": dict(Counter(str(r.status_code) for r in responses))}
+
+
+def index_corpus(docs, persist_directory: str) -> None:
+    import rag_utils
+    from hybrid_search import get_lexical_index, mark_lexical_index_saved
+
+    vectorstore = rag_utils.get_pooled_vectorstore(persist_directory)
+    lexical_index = get_lexical_index(persist_directory)
+    ids = vectorstore.add_documents(docs)
+    lexical_index.add(ids, [doc.page_content for doc in docs])
+    lexical_index.save()
+    mark_lexical_index_saved(lexical_index)
+    rag_utils.VECTORSTORE_POOL.mark_fresh(persist_directory)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,8,32", help="쉼표로 구분한 동시 요청 수 단계")
+    parser.add_argument("--requests", type=int, default=64, help="단계별 요청 수")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="가짜 채팅 모델 응답 지연(초, LLM 호출 대기 모사)")
+    parser.add_argument("--laws", type=int, default=3)
+    parser.add_argument("--articles", type=int, default=40)
+    parser.add_argument("--skip-sync", action="store_true", help="동기 스레드 방식 비교 생략")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        import agent_flow
+        import api_server
+        import rag_utils
+        from checkpointer import BoundedSqliteSaver
+
+        embeddings = HashingEmbeddings()
+        rag_utils.VECTORSTORE_POOL.embeddings_factory = lambda model: embeddings
+        corpus = make_statute_corpus(n_laws=args.laws, articles_per_law=args.articles)
+        index_corpus(corpus, rag_utils.CHROMA_PERSIST_DIR)
+        questions = [q for q, _ in make_queries(corpus, n=args.requests)]
+
+        checkpointer = BoundedSqliteSaver(sqlite3.connect("checkpoints.sqlite3", check_same_thread=False))
+        agent_flow.set_legal_agent_graph(agent_flow.build_legal_agent_graph(
+            llm=FakeChatModel(latency=args.model_latency), checkpointer=checkpointer
+        ))
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(
+            api_server.create_app(api_server.RequestLimiter(max_concurrency=max(levels), max_pending=max(levels))),
+            host="127.0.0.1", port=port, log_level="warning",
+        ))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+        base_url = f"http://127.0.0.1:{port}"
+
+        report = {"params": vars(args), "levels": {}}
+        try:
+            for concurrency in levels:
+                level = {}
+                for path, field in (("/search", "query"), ("/chat", "question"), ("/chat/stream", "question")):
+                    payloads = [
+                        {field: q, "thread_id": f"{path}-{concurrency}-{i % concurrency}", "use_cache": False}
+                        for i, q in enumerate(questions)
+                    ]
+                    level[path] = asyncio.run(run_load(base_url, path, payloads, concurrency))
+                if not args.skip_sync:
+                    level["sync_threads"] = run_sync_threads(questions, concurrency, f"sync-{concurrency}")
+                report["levels"][str(concurrency)] = level
+            report["burst_same_thread"] = asyncio.run(burst_same_thread(base_url, questions[0], 8))
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
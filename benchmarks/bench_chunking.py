@@ -0,0 +1,70 @@
+# benchmarks/bench_chunking.py
+"""
+크기 기준 분할(RecursiveCharacterTextSplitter 1000/200)과 조 단위 법령 청커 비교
+- 청크 수, 총 텍스트 길이(중복률), 인덱스 크기 추정치
+- 조문 본문 발췌 질의에 대한 recall@k 및 검색 결과 평균 길이(토큰 비용 대리 지표)
+
+사용법: python benchmarks/bench_chunking.py --k 5
+"""
+
+import argparse
+import json
+import random
+
+from common import HashingEmbeddings, make_statute_pages
+
+from legal_chunker import chunk_statute_documents
+from rag_utils import chunk_documents
+
+
+def evaluate(chunks, queries, embeddings, k):
+    vectors = embeddings.embed_documents([c.page_content for c in chunks])
+    hits, returned_chars = 0, 0
+    for query, answer in queries:
+        q = embeddings.embed_query(query)
+        scores = [sum(a * b for a, b in zip(q, v)) for v in vectors]
+        top = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)[:k]
+        returned_chars += sum(len(chunks[i].page_content) for i in top)
+        if any(answer in chunks[i].page_content for i in top):
+            hits += 1
+    return {"recall_at_k": hits / len(queries), "avg_result_chars": returned_chars / len(queries)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--laws", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=1536, help="인덱스 크기 추정에 쓸 임베딩 차원")
+    args = parser.parse_args()
+
+    pages = make_statute_pages(args.laws, args.articles)
+    source_chars = sum(len(p.page_content) for p in pages)
+
+    # 질의: 조문 한 항의 뒷부분, 정답: 해당 항 전체 문장이 잘리지 않고 포함된 청크
+    rng = random.Random(7)
+    full_text = "\n".join(p.page_content for p in pages)
+    sentences = [line for line in full_text.split("\n") if line.startswith(("①", "②", "③", "④")) and len(line) > 30]
+    queries = [(" ".join(s.split()[-4:]), s) for s in rng.sample(sentences, min(args.queries, len(sentences)))]
+
+    report = {"pages": len(pages), "source_chars": source_chars, "queries": len(queries), "k": args.k}
+    embeddings = HashingEmbeddings()
+    for strategy in ("recursive", "statute", "statute_unpacked"):
+        if strategy == "statute_unpacked":
+            chunks = chunk_statute_documents(pages, pack_chars=0)
+        else:
+            chunks = chunk_documents(pages, strategy=strategy)
+        total_chars = sum(len(c.page_content) for c in chunks)
+        report[strategy] = {
+            "chunks": len(chunks),
+            "total_chars": total_chars,
+            "duplication_ratio": total_chars / source_chars,
+            "est_index_bytes": len(chunks) * args.dim * 4 + total_chars * 3,
+            **evaluate(chunks, queries, embeddings, args.k),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
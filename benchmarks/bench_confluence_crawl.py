@@ -0,0 +1,104 @@
+# benchmarks/bench_confluence_crawl.py
+"""
+로컬 목 Confluence 서버에서 순차 크롤링과 동시 크롤링(토큰 버킷) 비교, 체크포인트 재개 확인
+
+사용법: python benchmarks/bench_confluence_crawl.py --depth 3 --branching 3 --rps 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from mock_confluence import MockConfluence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from get_confl import ConfluenceCrawler
+
+
+class LegacyCrawler(ConfluenceCrawler):
+    """기존 동작 재현: 2회 요청마다 1초 대기, 하위 페이지 본문을 get_page_info로 다시 요청"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.window_count = 0
+        self.window_start = 0.0
+
+    def _rate_limit(self):
+        now = time.time()
+        if now - self.window_start >= 1:
+            self.window_count, self.window_start = 0, now
+        if self.window_count >= 2:
+            time.sleep(1)
+            self.window_count, self.window_start = 0, time.time()
+        self.window_count += 1
+        self.request_count += 1
+
+    def crawl_page_hierarchy(self, page_id, page_info=None, include_body=True):
+        return super().crawl_page_hierarchy(page_id, include_body=include_body)
+
+
+def count_pages(node) -> int:
+    return 1 + sum(count_pages(child) for child in node.get("children", []))
+
+
+def run(mock: MockConfluence, base_url: str, rps: float, fn, crawler_cls=ConfluenceCrawler) -> dict:
+    mock.reset_counters()
+    crawler = crawler_cls(base_url=base_url, max_requests_per_second=rps)
+    start = time.perf_counter()
+    tree = fn(crawler)
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "pages": count_pages(tree),
+        "requests": mock.request_count,
+        "bytes": mock.bytes_sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="목 서버 응답 지연(초)")
+    parser.add_argument("--rps", type=float, default=5, help="크롤러 초당 요청 제한")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    mock = MockConfluence(depth=args.depth, branching=args.branching, latency=args.latency)
+    base_url = mock.start()
+    root = mock.root_id
+    report = {"pages": len(mock.pages), "latency": args.latency, "rps": args.rps}
+    try:
+        report["legacy"] = run(mock, base_url, args.rps, lambda c: c.crawl_page_hierarchy(root), LegacyCrawler)
+        report["sequential"] = run(mock, base_url, args.rps, lambda c: c.crawl_page_hierarchy(root))
+        report["concurrent"] = run(
+            mock, base_url, args.rps, lambda c: c.crawl_page_hierarchy_concurrent(root, max_workers=args.workers)
+        )
+        report["speedup_vs_legacy"] = round(report["legacy"]["seconds"] / report["concurrent"]["seconds"], 2)
+        report["speedup_vs_sequential"] = round(report["sequential"]["seconds"] / report["concurrent"]["seconds"], 2)
+
+        # 체크포인트 재개: 크롤링 도중 중단된 상황을 체크포인트 앞부분만 남겨 재현한 뒤 이어서 실행
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "crawl.checkpoint.jsonl")
+            run(
+                mock, base_url, args.rps,
+                lambda c: c.crawl_page_hierarchy_concurrent(root, max_workers=args.workers, checkpoint_path=checkpoint),
+            )
+            with open(checkpoint, encoding="utf-8") as f:
+                lines = f.readlines()
+            with open(checkpoint, "w", encoding="utf-8") as f:
+                f.writelines(lines[:len(lines) // 2])
+            report["resumed_after_interrupt"] = run(
+                mock, base_url, args.rps,
+                lambda c: c.crawl_page_hierarchy_concurrent(root, max_workers=args.workers, checkpoint_path=checkpoint),
+            )
+    finally:
+        mock.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
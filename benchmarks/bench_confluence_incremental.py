@@ -0,0 +1,79 @@
+# benchmarks/bench_confluence_incremental.py
+"""
+전체 크롤링과 증분 크롤링(매니페스트 버전 비교)의 야간 동기화 비용 비교
+
+사용법: python benchmarks/bench_confluence_incremental.py --depth 3 --branching 5 --edits 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from mock_confluence import MockConfluence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from get_confl import ConfluenceCrawler
+
+
+def run(mock: MockConfluence, base_url: str, rps: float, fn) -> dict:
+    mock.reset_counters()
+    crawler = ConfluenceCrawler(base_url=base_url, max_requests_per_second=rps)
+    start = time.perf_counter()
+    result = fn(crawler)
+    report = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "requests": mock.request_count,
+        "bytes": mock.bytes_sent,
+    }
+    if "changed" in result:
+        report.update({
+            "changed": sorted(page["id"] for page in result["changed"]),
+            "deleted": len(result["deleted"]),
+            "unchanged": result["unchanged"],
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--branching", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rps", type=float, default=5)
+    parser.add_argument("--edits", type=int, default=3)
+    args = parser.parse_args()
+
+    mock = MockConfluence(depth=args.depth, branching=args.branching, latency=args.latency)
+    base_url = mock.start()
+    root = mock.root_id
+    report = {"pages": len(mock.pages), "rps": args.rps}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "manifest.json")
+            report["first_sync"] = run(mock, base_url, args.rps, lambda c: c.crawl_incremental(root, manifest))
+            report["first_sync"]["changed"] = len(report["first_sync"]["changed"])
+            report["nightly_no_change"] = run(mock, base_url, args.rps, lambda c: c.crawl_incremental(root, manifest))
+
+            # 일부 페이지 수정 + 리프가 아닌 하위 트리 하나 삭제
+            edited = sorted(mock.pages)[-args.edits:]
+            for page_id in edited:
+                mock.edit_page(page_id)
+            removed = mock.children[root][0]
+            removed_count = 1 + sum(1 for pid in mock.pages if removed in mock.ancestors(pid))
+            mock.delete_page(removed)
+            report["edited"], report["removed_subtree_pages"] = edited, removed_count
+            report["nightly_with_changes"] = run(mock, base_url, args.rps, lambda c: c.crawl_incremental(root, manifest))
+            report["full_crawl"] = run(
+                mock, base_url, args.rps, lambda c: c.crawl_page_hierarchy_concurrent(root, max_workers=8)
+            )
+    finally:
+        mock.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
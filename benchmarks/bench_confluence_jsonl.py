@@ -0,0 +1,95 @@
+# benchmarks/bench_confluence_jsonl.py
+"""
+중첩 JSON 저장(crawl_page_hierarchy + save_to_json)과 JSONL 스트리밍 저장의 최대 메모리/파일 크기/API 요청 수 비교
+PageTree로 계층을 다시 읽어 원래 트리와 같은지도 확인한다.
+
+사용법: python benchmarks/bench_confluence_jsonl.py --depth 3 --branching 6 --body-chars 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from mock_confluence import MockConfluence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from confluence_jsonl import PageTree
+from get_confl import ConfluenceCrawler
+
+
+def measure(fn) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(seconds, 3), "peak_mb": round(peak / 2 ** 20, 2), "result": result}
+
+
+def strip_links(node: dict) -> dict:
+    return {
+        "id": node["id"],
+        "version": node["version"]["number"],
+        "children": [strip_links(child) for child in node.get("children", [])],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--branching", type=int, default=6)
+    parser.add_argument("--body-chars", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    mock = MockConfluence(depth=args.depth, branching=args.branching, latency=0.0, body_chars=args.body_chars)
+    base_url = mock.start()
+    root = mock.root_id
+    report = {"pages": len(mock.pages), "body_chars": args.body_chars}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            def crawler():
+                return ConfluenceCrawler(base_url=base_url, max_requests_per_second=10000, page_size=args.page_size)
+
+            json_path = os.path.join(tmp, "confluence_data.json")
+
+            crawlers = {}
+
+            def nested():
+                c = crawlers["nested_json"] = crawler()
+                c.save_to_json(c.crawl_page_hierarchy(root), json_path)
+
+            for name, path, workers in [
+                ("jsonl", os.path.join(tmp, "confluence_data.jsonl"), 1),
+                ("jsonl_concurrent", os.path.join(tmp, "concurrent.jsonl"), args.workers),
+                ("jsonl_gzip", os.path.join(tmp, "confluence_data.jsonl.gz"), 1),
+            ]:
+                def stream(name=name, path=path, workers=workers):
+                    c = crawlers[name] = crawler()
+                    return c.save_to_jsonl(c.iter_page_hierarchy(root, max_workers=workers), path)
+                report[name] = measure(stream)
+                report[name]["file_kb"] = round(os.path.getsize(path) / 1024, 1)
+            report["nested_json"] = measure(nested)
+            report["nested_json"]["file_kb"] = round(os.path.getsize(json_path) / 1024, 1)
+            for name, c in crawlers.items():
+                report[name]["requests"] = c.request_count
+
+            with open(json_path, encoding="utf-8") as f:
+                expected = strip_links(json.load(f))
+            for name in ("confluence_data.jsonl", "confluence_data.jsonl.gz"):
+                with PageTree(os.path.join(tmp, name)) as tree:
+                    report[f"rebuilt_matches_{name}"] = strip_links(tree.to_nested()) == expected
+    finally:
+        mock.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
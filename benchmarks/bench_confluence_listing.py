@@ -0,0 +1,69 @@
+# benchmarks/bench_confluence_listing.py
+"""
+하위 페이지가 많은 Confluence 페이지/스페이스 목록 조회 비교
+- 기존: limit=100 한 번만 요청 (100개 초과분 누락)
+- 페이지네이션 + 본문 포함 / 페이지네이션 + 본문 제외(트리 구조만)
+
+사용법: python benchmarks/bench_confluence_listing.py --children 350 --page-size 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from mock_confluence import MockConfluence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from get_confl import CHILD_EXPAND_WITH_BODY, ConfluenceCrawler
+
+
+def legacy_child_listing(crawler: ConfluenceCrawler, page_id: str):
+    """기존 get_child_pages 동작: limit=100 단일 요청"""
+    url = f"{crawler.api_url}/content/{page_id}/child/page"
+    return crawler._make_request(url, {'limit': 100, 'expand': CHILD_EXPAND_WITH_BODY}).get('results', [])
+
+
+def run(mock: MockConfluence, fn) -> dict:
+    mock.reset_counters()
+    start = time.perf_counter()
+    count = sum(1 for _ in fn())
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "pages": count,
+        "requests": mock.request_count,
+        "bytes": mock.bytes_sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--children", type=int, default=350, help="루트 페이지의 하위 페이지 수")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--body-chars", type=int, default=4000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    mock = MockConfluence(depth=1, branching=args.children, latency=args.latency, body_chars=args.body_chars)
+    base_url = mock.start()
+    crawler = ConfluenceCrawler(base_url=base_url, max_requests_per_second=1000, page_size=args.page_size)
+    root = mock.root_id
+    report = {"children": args.children, "space_pages": len(mock.pages), "page_size": args.page_size}
+    try:
+        report["legacy_children"] = run(mock, lambda: legacy_child_listing(crawler, root))
+        report["children_with_body"] = run(mock, lambda: crawler.iter_child_pages(root))
+        report["children_tree_only"] = run(mock, lambda: crawler.iter_child_pages(root, include_body=False))
+        report["space_with_body"] = run(mock, lambda: crawler.iter_space_pages("MOCK"))
+        report["space_tree_only"] = run(mock, lambda: crawler.iter_space_pages("MOCK", include_body=False))
+        report["tree_only_bytes_ratio"] = round(
+            report["space_tree_only"]["bytes"] / report["space_with_body"]["bytes"], 3
+        )
+    finally:
+        mock.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_context_packing.py
+"""
+search_law 결과 구성 비교: 기존(상위 5개, 청크별 앞 500자) vs 후처리(과다 검색 → 임계값 → 중복 제거/MMR → 토큰 예산 발췌)
+- 도구 호출당 프롬프트 토큰 (context_packing.estimate_tokens 기준)
+- 근거 포함률: 질의를 만든 원문 문장(조문 지정 질의는 해당 조문 첫 항)이 결과 본문에 그대로 들어 있는 비율
+- 결과 내 중복 청크 쌍 수 (문자 5-gram Jaccard ≥ dedup 임계값)
+
+사용법: python benchmarks/bench_context_packing.py --strategy recursive --budget 1200
+"""
+
+import argparse
+import json
+import random
+import tempfile
+
+from common import HashingEmbeddings, make_statute_pages, percentiles, time_calls
+
+from langchain_chroma import Chroma
+
+import rag_utils
+from config import (
+    RETRIEVAL_DEDUP_THRESHOLD,
+    RETRIEVAL_FETCH_K,
+    RETRIEVAL_LEXICAL_MIN_RATIO,
+    RETRIEVAL_MMR_LAMBDA,
+    RETRIEVAL_TOP_K,
+)
+from context_packing import estimate_tokens, jaccard, postprocess_results, shingles
+from hybrid_search import HybridRetriever, LexicalIndex
+
+
+def make_grounded_queries(pages, n: int, seed: int = 1):
+    """(질의, 정답 문장) 목록: 본문 문장 끝 4어절 발췌 질의와 '법령명 제N조' 질의를 반반"""
+    rng = random.Random(seed)
+    lines = [(page.metadata["source"][:-4], line) for page in pages for line in page.page_content.split("\n")]
+    paragraphs = [(law, line) for law, line in lines if line[:1] in "①②③④⑤⑥⑦⑧" and len(line.split()) > 6]
+    queries = []
+    for i in range(n):
+        law, line = rng.choice(paragraphs)
+        if i % 2 == 0:
+            queries.append((" ".join(line.split()[-4:]), line))
+        else:
+            # 조문 번호 질의: 같은 법령에서 해당 조문 제목 바로 다음 줄(첫 항)을 정답으로 사용
+            idx = next(j for j, (l, text) in enumerate(lines) if l == law and text == line)
+            while idx > 0 and not lines[idx][1].startswith("제"):
+                idx -= 1
+            heading = lines[idx][1]
+            if idx + 1 >= len(lines) or not heading.startswith("제"):
+                queries.append((" ".join(line.split()[-4:]), line))
+                continue
+            queries.append((f"{law} {heading.split('(')[0]} 내용", lines[idx + 1][1]))
+    return queries
+
+
+def legacy_contents(docs):
+    return [d.page_content if len(d.page_content) <= 500 else d.page_content[:500] + "..." for d in docs]
+
+
+def evaluate(results, queries):
+    tokens = [sum(estimate_tokens(c) for c in contents) for contents in results]
+    grounded = sum(1 for contents, (_, answer) in zip(results, queries) if any(answer in c for c in contents))
+    duplicates = 0
+    for contents in results:
+        signatures = [shingles(c) for c in contents]
+        duplicates += sum(
+            1 for i in range(len(signatures)) for j in range(i) if jaccard(signatures[i], signatures[j]) >= RETRIEVAL_DEDUP_THRESHOLD
+        )
+    return {
+        "tokens_per_call": {"mean": round(sum(tokens) / len(tokens), 1), **{k: v for k, v in percentiles(tokens).items()}},
+        "grounded_rate": round(grounded / len(queries), 3),
+        "duplicate_pairs_per_call": round(duplicates / len(queries), 2),
+        "docs_per_call": round(sum(len(c) for c in results) / len(results), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", choices=["recursive", "statute"], default="recursive")
+    parser.add_argument("--laws", type=int, default=4)
+    parser.add_argument("--articles", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=1200, help="후처리 토큰 예산")
+    parser.add_argument("--threshold", type=float, default=0.0, help="dense 코사인 유사도 임계값 (로컬 해시 임베딩은 점수 분포가 낮음)")
+    args = parser.parse_args()
+
+    pages = make_statute_pages(n_laws=args.laws, articles_per_law=args.articles)
+    chunks = rag_utils.chunk_documents(pages, strategy=args.strategy)
+    queries = make_grounded_queries(pages, args.queries)
+    ids = [str(i) for i in range(len(chunks))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectorstore = Chroma.from_documents(chunks, HashingEmbeddings(), ids=ids, persist_directory=tmp)
+        lexical_index = LexicalIndex()
+        lexical_index.add(ids, [c.page_content for c in chunks])
+        legacy = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index, top_k=RETRIEVAL_TOP_K)
+        overfetch = HybridRetriever(
+            vectorstore=vectorstore, lexical_index=lexical_index, top_k=RETRIEVAL_FETCH_K, fetch_k=RETRIEVAL_FETCH_K,
+            score_threshold=args.threshold, lexical_min_ratio=RETRIEVAL_LEXICAL_MIN_RATIO,
+        )
+
+        legacy_results = [legacy_contents(legacy.invoke(q)) for q, _ in queries]
+        candidates = [(q, overfetch.invoke(q)) for q, _ in queries]
+        packed, postprocess_ms = time_calls(
+            lambda item: postprocess_results(
+                item[1], item[0], top_k=RETRIEVAL_TOP_K, token_budget=args.budget,
+                dedup_threshold=RETRIEVAL_DEDUP_THRESHOLD, mmr_lambda=RETRIEVAL_MMR_LAMBDA,
+            ),
+            candidates,
+        )
+        packed_results = [[excerpt for _, excerpt in result] for result in packed]
+
+    report = {
+        "strategy": args.strategy,
+        "chunks": len(chunks),
+        "queries": len(queries),
+        "legacy_top5_500chars": evaluate(legacy_results, queries),
+        "packed": {
+            "budget": args.budget,
+            **evaluate(packed_results, queries),
+            "postprocess_ms": {k: round(v, 2) for k, v in percentiles(postprocess_ms).items()},
+        },
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_hybrid_retrieval.py
+"""
+dense 단독 검색과 하이브리드(BM25 + dense, RRF) 검색의 recall@k / 지연시간 비교
+
+사용법: python benchmarks/bench_hybrid_retrieval.py --k 5 --queries 200
+"""
+
+import argparse
+import json
+import tempfile
+
+from common import HashingEmbeddings, make_queries, make_statute_corpus, percentiles, time_calls
+
+from langchain_chroma import Chroma
+from hybrid_search import HybridRetriever, LexicalIndex
+
+
+def recall_at_k(results, queries) -> float:
+    hits = sum(1 for docs, (_, relevant) in zip(results, queries) if relevant in [d.id for d in docs])
+    return hits / len(queries) if queries else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--laws", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=60)
+    args = parser.parse_args()
+
+    docs = make_statute_corpus(args.laws, args.articles)
+    ids = [str(i) for i in range(len(docs))]
+    queries = make_queries(docs, args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectorstore = Chroma.from_documents(docs, HashingEmbeddings(), ids=ids, persist_directory=tmp)
+        lexical_index = LexicalIndex()
+        lexical_index.add(ids, [d.page_content for d in docs])
+        hybrid = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index, top_k=args.k)
+
+        texts = [q for q, _ in queries]
+        dense_results, dense_latency = time_calls(lambda q: vectorstore.similarity_search(q, k=args.k), texts)
+        hybrid_results, hybrid_latency = time_calls(hybrid.invoke, texts)
+
+    report = {
+        "corpus_chunks": len(docs),
+        "queries": len(queries),
+        "k": args.k,
+        "dense": {"recall_at_k": recall_at_k(dense_results, queries), "latency_ms": percentiles(dense_latency)},
+        "hybrid": {"recall_at_k": recall_at_k(hybrid_results, queries), "latency_ms": percentiles(hybrid_latency)},
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
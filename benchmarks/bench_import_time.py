@@ -0,0 +1,115 @@
+# benchmarks/bench_import_time.py
+"""
+모듈별 import 시간 프로파일 (python -X importtime 기반, 새 프로세스에서 측정)
+- import_ms: 모듈 import 누적 시간 (반복 측정 중 최솟값)
+- heaviest: 자체 import 시간이 큰 최상위 패키지 상위 N개
+- graph_first_use_ms: agent_flow import 후 첫 get_legal_agent_graph() 호출(LLM 클라이언트/checkpointer 생성) 시간
+run_benchmarks.py 결과의 import_time 항목으로도 저장되어 baseline 비교 시 시작 시간 회귀가 드러난다.
+
+사용법: python benchmarks/bench_import_time.py --repeat 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from common import REPO_ROOT
+
+# 앱/CLI 진입점과 그 의존 모듈 (가벼운 것부터)
+MODULES = [
+    "config",
+    "tracing",
+    "hybrid_search",
+    "legal_chunker",
+    "rag_utils",
+    "mmap_index",
+    "db_manager",
+    "get_confl",
+    "confluence_ingest",
+    "agent_flow",
+    "api_server",
+]
+
+# config가 import 시 읽는 Azure 설정 더미 값 (네트워크 호출 없음)
+DUMMY_ENV = {
+    "AZURE_OPENAI_API_KEY": "offline-benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://example.invalid",
+    "OPENAI_API_VERSION": "2024-06-01",
+    "AZURE_OPENAI_CHAT_MODEL": "gpt-4o",
+    "AZURE_OPENAI_EMBEDDING_MODEL": "text-embedding-3-small",
+    "TRACING_ENABLED": "false",
+}
+
+
+def _run(code: str, cwd: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, **DUMMY_ENV, "PYTHONPATH": REPO_ROOT}
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """'import time: self [us] | cumulative | imported package' 줄을 {name, self_us, cumulative_us}로 변환"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"name": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return rows
+
+
+def profile_module(module: str, cwd: str, top: int = 5) -> Dict:
+    rows = parse_importtime(_run(f"import {module}", cwd, importtime=True).stderr)
+    own = next((row for row in rows if row["name"] == module), None)
+    by_package: Dict[str, int] = defaultdict(int)
+    for row in rows:
+        by_package[row["name"].split(".")[0]] += row["self_us"]
+    heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "import_ms": round(own["cumulative_us"] / 1000, 1) if own else 0.0,
+        "modules_loaded": len(rows),
+        "heaviest": {package: round(us / 1000, 1) for package, us in heaviest},
+    }
+
+
+def graph_first_use_ms(cwd: str) -> float:
+    """지연 생성된 그래프의 첫 사용 비용 (SQLite checkpointer 파일은 cwd에 생성)"""
+    code = (
+        "import time, agent_flow\n"
+        "start = time.perf_counter()\n"
+        "agent_flow.get_legal_agent_graph()\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    return float(_run(code, cwd).stdout.strip().splitlines()[-1])
+
+
+def measure_import_times(modules: Sequence[str] = MODULES, repeat: int = 3, top: int = 5) -> Dict:
+    """모듈마다 repeat번 새 프로세스에서 측정해 import_ms가 가장 작은 결과 사용 (디스크 캐시/잡음 영향 축소)"""
+    report: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        # 첫 실행의 .pyc 생성/디스크 캐시 워밍업
+        _run("import " + ", ".join(modules), cwd)
+        for module in modules:
+            runs = [profile_module(module, cwd, top) for _ in range(repeat)]
+            report[module] = min(runs, key=lambda run: run["import_ms"])
+        report["graph_first_use_ms"] = round(min(graph_first_use_ms(cwd) for _ in range(repeat)), 1)
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", default=",".join(MODULES), help="쉼표로 구분한 측정 모듈")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="모듈별로 보고할 무거운 패키지 수")
+    args = parser.parse_args(argv)
+    report = measure_import_times(args.modules.split(","), repeat=args.repeat, top=args.top)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
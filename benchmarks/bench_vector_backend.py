@@ -0,0 +1,182 @@
+# benchmarks/bench_vector_backend.py
+"""
+검색 벡터 백엔드 비교: Chroma(HNSW) vs mmap_index(정확한 코사인 top-k, memory-mapped)
+같은 코퍼스(합성 법령 본문 + 군집 구조의 합성 임베딩)를 Chroma에 적재하고 mmap 인덱스로 export한 뒤
+- 단일 질의 지연시간 p50/p95 (질의 벡터 기준, 임베딩 호출 제외, Document 생성 포함)
+- 배치 질의 처리량 (Chroma collection.query 배치 vs 행렬 곱 배치, ID만 반환)
+- Chroma 결과의 recall@k (mmap 정확 검색 기준)
+- 워커 프로세스 N개가 동시에 인덱스를 열었을 때 프로세스별 열기 시간(백엔드 모듈 import 포함), RSS, PSS(공유 페이지를 나눈 실제 점유)
+
+사용법: python benchmarks/bench_vector_backend.py --vectors 20000 --dim 768 --workers 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from common import HashingEmbeddings, make_statute_corpus, percentiles, time_calls
+
+from langchain_core.embeddings import Embeddings
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """본문 → 미리 만든 벡터 조회 (대규모 코퍼스 적재 시 임베딩 계산 비용 제외)"""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+
+def make_corpus(n: int, dim: int, clusters: int, seed: int = 0):
+    """조문 본문을 순환해 n개 청크를 만들고, 군집 중심 + 잡음으로 단위 벡터 생성"""
+    rng = np.random.default_rng(seed)
+    base = make_statute_corpus(n_laws=7, articles_per_law=60)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=n)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"{base[i % len(base)].page_content}\n#{i}" for i in range(n)]
+    metadatas = [dict(base[i % len(base)].metadata) for i in range(n)]
+    return texts, metadatas, vectors
+
+
+def make_query_vectors(vectors: np.ndarray, n: int, seed: int = 1) -> np.ndarray:
+    """코퍼스 벡터에 잡음을 더한 질의 (가까운 이웃이 여럿 있는 현실적인 분포)"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), size=n)] + 0.3 * rng.standard_normal((n, vectors.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def open_backend(backend: str, persist_directory: str):
+    if backend == "mmap":
+        from mmap_index import MmapVectorStore, mmap_index_path
+        return MmapVectorStore.load(mmap_index_path(persist_directory), HashingEmbeddings())
+    from langchain_chroma import Chroma
+    return Chroma(embedding_function=HashingEmbeddings(), persist_directory=persist_directory)
+
+
+def batch_search_ids(backend: str, store, queries: np.ndarray, k: int) -> List[List[str]]:
+    if backend == "mmap":
+        rows, _ = store.index.search(queries, k)
+        return [[store.index.ids[row] for row in query_rows] for query_rows in rows]
+    return store._collection.query(query_embeddings=queries.tolist(), n_results=k, include=[])["ids"]
+
+
+def memory_kb() -> Dict[str, Optional[int]]:
+    """/proc/self/smaps_rollup의 Rss/Pss (리눅스 외에는 최대 RSS만)"""
+    try:
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+        return {"rss_kb": fields.get("Rss"), "pss_kb": fields.get("Pss")}
+    except OSError:
+        return {"rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "pss_kb": None}
+
+
+def _worker(backend: str, persist_directory: str, queries: np.ndarray, k: int, barrier, results) -> None:
+    start = time.perf_counter()
+    store = open_backend(backend, persist_directory)
+    open_ms = (time.perf_counter() - start) * 1000
+    _, latencies = time_calls(lambda q: store.similarity_search_by_vector(q.tolist(), k=k), queries)
+    # 모든 워커가 인덱스를 열고 검색한 상태에서 메모리 측정 (공유 페이지가 PSS에 나눠 반영되도록)
+    barrier.wait()
+    results.put({"open_ms": open_ms, "query_p50_ms": percentiles(latencies)["p50"], **memory_kb()})
+    barrier.wait()
+
+
+def run_workers(backend: str, persist_directory: str, queries: np.ndarray, k: int, workers: int) -> Dict:
+    """새 프로세스(spawn) workers개에서 동시에 백엔드를 열어 열기 시간/메모리 측정"""
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(workers), context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(backend, persist_directory, queries, k, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    stats = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def mean(key):
+        values = [s[key] for s in stats if s[key] is not None]
+        return round(sum(values) / len(values), 1) if values else None
+
+    return {
+        "workers": workers,
+        "open_ms": mean("open_ms"),
+        "query_p50_ms": mean("query_p50_ms"),
+        "rss_mb_per_worker": round(mean("rss_kb") / 1024, 1),
+        "pss_mb_per_worker": round(mean("pss_kb") / 1024, 1) if mean("pss_kb") is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=20000, help="코퍼스 청크 수")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=64, help="배치 질의 크기")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 인덱스를 여는 워커 프로세스 수 (0이면 생략)")
+    args = parser.parse_args()
+
+    import mmap_index
+    from langchain_chroma import Chroma
+
+    texts, metadatas, vectors = make_corpus(args.vectors, args.dim, args.clusters)
+    queries = make_query_vectors(vectors, args.queries)
+    report = {"params": vars(args)}
+
+    with tempfile.TemporaryDirectory() as persist_directory:
+        embeddings = PrecomputedEmbeddings(dict(zip(texts, vectors.tolist())))
+        chroma = Chroma(embedding_function=embeddings, persist_directory=persist_directory)
+        start = time.perf_counter()
+        for i in range(0, len(texts), 2000):
+            chroma.add_texts(texts[i:i + 2000], metadatas=metadatas[i:i + 2000])
+        report["chroma_index_seconds"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        manifest = mmap_index.export_mmap_index(chroma, mmap_index.mmap_index_path(persist_directory), embedding_model="synthetic")
+        report["mmap_export_seconds"] = round(time.perf_counter() - start, 2)
+        index_dir = mmap_index.mmap_index_path(persist_directory)
+        report["mmap_index_mb"] = round(
+            sum(os.path.getsize(os.path.join(index_dir, name)) for name in manifest["files"].values()) / 2 ** 20, 1
+        )
+
+        stores = {"chroma": chroma, "mmap": open_backend("mmap", persist_directory)}
+        exact = batch_search_ids("mmap", stores["mmap"], queries, args.k)
+        for backend, store in stores.items():
+            _, latencies = time_calls(lambda q: store.similarity_search_by_vector(q.tolist(), k=args.k), queries)
+            batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+            start = time.perf_counter()
+            found = [ids for batch in batches for ids in batch_search_ids(backend, store, batch, args.k)]
+            batch_seconds = time.perf_counter() - start
+            report[backend] = {
+                "query_ms": {key: round(value, 3) for key, value in percentiles(latencies).items()},
+                "batch_queries_per_second": round(len(queries) / batch_seconds, 1),
+                "recall_at_k": round(
+                    sum(len(set(a) & set(b)) for a, b in zip(found, exact)) / (len(queries) * args.k), 4
+                ),
+            }
+        if args.workers > 0:
+            for backend in stores:
+                report[backend]["processes"] = run_workers(backend, persist_directory, queries[:50], args.k, args.workers)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
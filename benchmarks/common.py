@@ -0,0 +1,254 @@
+# benchmarks/common.py
+"""
+벤치마크 공용 유틸: 결정적 로컬 임베딩/채팅 모델, 합성 한국어 법령 코퍼스(PDF 포함), 지연시간 통계
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# 저장소 루트 모듈(rag_utils 등)을 import할 수 있도록 경로 추가
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+LAW_NAMES = ["개인정보 보호법", "근로기준법", "전자상거래법", "정보통신망법", "저작권법", "신용정보법", "주택임대차보호법"]
+TOPICS = [
+    "개인정보", "정보주체", "동의", "제공", "위탁", "파기", "유출", "손해배상", "과태료", "근로자",
+    "임금", "해고", "계약", "청약철회", "환불", "저작물", "이용허락", "신용정보", "임차인", "보증금",
+]
+PHRASES = [
+    "{a}에 관한 사항은 대통령령으로 정한다",
+    "{a}를 처리하는 자는 {b}의 권리를 보호하여야 한다",
+    "{a}의 경우에는 지체 없이 {b}에게 알려야 한다",
+    "{a}를 위반한 자에게는 {b}를 부과한다",
+    "{a}에 대하여 {b}의 동의를 받아야 한다",
+    "{a}는 {b}의 목적 외의 용도로 이용하여서는 아니 된다",
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    문자 trigram을 해시 버킷에 누적하는 결정적 임베딩 (네트워크 호출 없음)
+    call_count로 실제 임베딩 계산 횟수를 확인할 수 있다.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.call_count = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        text = f"  {text}  "
+        for i in range(len(text) - 2):
+            digest = hashlib.md5(text[i:i + 3].encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.call_count += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.call_count += 1
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    search_law를 한 번 호출한 뒤 검색 결과의 첫 출처를 인용해 답하는 결정적 채팅 모델
+    latency만큼 응답을 지연시킬 수 있으며, 모델 안에서 보낸 시간을 model_seconds에 누적한다.
+    """
+
+    latency: float = 0.0
+    calls: int = 0
+    model_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-legal-chat"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "FakeChatModel":
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        # 프롬프트가 항상 ("human", "{input}")으로 끝나므로 직전 메시지까지 확인
+        tool_messages = [m for m in messages[-2:] if isinstance(m, ToolMessage)]
+        if tool_messages:
+            first_line = str(tool_messages[-1].content).split("\n", 1)[0]
+            return AIMessage(content=f"검색된 조항에 따라 답변드립니다. {first_line}")
+        query = str(messages[-1].content)
+        call_id = "call_" + hashlib.md5(f"{self.calls}:{query}".encode("utf-8")).hexdigest()[:8]
+        return AIMessage(content="", tool_calls=[{"name": "search_law", "args": {"query": query}, "id": call_id}])
+
+    def _timed_reply(self, messages: List[BaseMessage]) -> AIMessage:
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        reply = self._reply(messages)
+        self.calls += 1
+        self.model_seconds += time.perf_counter() - start
+        return reply
+
+    async def _atimed_reply(self, messages: List[BaseMessage]) -> AIMessage:
+        # 비동기 경로는 이벤트 루프를 막지 않고 대기 (실제 HTTP 클라이언트와 같은 동작)
+        start = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        reply = self._reply(messages)
+        self.calls += 1
+        self.model_seconds += time.perf_counter() - start
+        return reply
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._timed_reply(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=await self._atimed_reply(messages))])
+
+    @staticmethod
+    def _reply_chunks(reply: AIMessage):
+        if reply.tool_calls:
+            call = reply.tool_calls[0]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[{
+                "name": call["name"], "args": json.dumps(call["args"], ensure_ascii=False), "id": call["id"], "index": 0,
+            }]))
+            return
+        for word in reply.content.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self._reply_chunks(self._timed_reply(messages)):
+            if run_manager and chunk.message.content:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self._reply_chunks(await self._atimed_reply(messages)):
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+
+def make_article_text(law: str, number: int, rng: random.Random, paragraphs: int = 3) -> str:
+    title = f"{rng.choice(TOPICS)}의 {rng.choice(['제한', '보호', '의무', '절차', '특례'])}"
+    lines = [f"제{number}조({title})"]
+    for p in range(paragraphs):
+        a, b = rng.sample(TOPICS, 2)
+        lines.append(f"{chr(0x2460 + p)} {law}에 따라 " + rng.choice(PHRASES).format(a=a, b=b) + ".")
+    return "\n".join(lines)
+
+
+def make_statute_corpus(
+    n_laws: int = 5,
+    articles_per_law: int = 40,
+    seed: int = 0
+) -> List[Document]:
+    """조문 단위 합성 법령 코퍼스 (metadata: source, page, law_name, article_no)"""
+    rng = random.Random(seed)
+    docs = []
+    for law in LAW_NAMES[:n_laws]:
+        for number in range(1, articles_per_law + 1):
+            docs.append(Document(
+                page_content=f"{law}\n" + make_article_text(law, number, rng, paragraphs=rng.randint(2, 5)),
+                metadata={"source": f"{law}.pdf", "page": number // 3, "law_name": law, "article_no": f"제{number}조"},
+            ))
+    return docs
+
+
+def make_statute_pages(
+    n_laws: int = 5,
+    articles_per_law: int = 40,
+    chars_per_page: int = 1800,
+    seed: int = 0
+) -> List[Document]:
+    """PDF 로더 출력과 같은 페이지 단위 법령 문서 (조문이 페이지 경계를 넘나듦)"""
+    rng = random.Random(seed)
+    pages = []
+    for law in LAW_NAMES[:n_laws]:
+        text = law + "\n" + "\n".join(
+            make_article_text(law, number, rng, paragraphs=rng.randint(2, 8))
+            for number in range(1, articles_per_law + 1)
+        )
+        for page_no, start in enumerate(range(0, len(text), chars_per_page)):
+            pages.append(Document(
+                page_content=text[start:start + chars_per_page],
+                metadata={"source": f"{law}.pdf", "page": page_no},
+            ))
+    return pages
+
+
+def write_statute_pdfs(
+    folder: str,
+    n_laws: int = 5,
+    articles_per_law: int = 40,
+    chars_per_page: int = 1800,
+    seed: int = 0
+) -> List[str]:
+    """make_statute_pages의 페이지를 법령별 PDF 파일로 저장하고 경로 목록 반환 (PyMuPDF 한국어 내장 폰트)"""
+    import pymupdf
+
+    os.makedirs(folder, exist_ok=True)
+    by_source: Dict[str, List[str]] = {}
+    for page in make_statute_pages(n_laws, articles_per_law, chars_per_page, seed):
+        by_source.setdefault(page.metadata["source"], []).append(page.page_content)
+    paths = []
+    for source, texts in by_source.items():
+        pdf = pymupdf.open()
+        for text in texts:
+            pdf.new_page().insert_textbox(pymupdf.Rect(40, 40, 560, 800), text, fontname="korea", fontsize=9)
+        path = os.path.join(folder, source)
+        pdf.save(path)
+        pdf.close()
+        paths.append(path)
+    return paths
+
+
+def make_queries(docs: Sequence[Document], n: int = 100, seed: int = 1) -> List[Tuple[str, str]]:
+    """(질의, 정답 문서 인덱스) 목록: 조문 번호 지정 질의와 본문 발췌 질의를 반반 섞는다"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n):
+        idx = rng.randrange(len(docs))
+        doc = docs[idx]
+        if i % 2 == 0:
+            queries.append((f"{doc.metadata['law_name']} {doc.metadata['article_no']} 내용", str(idx)))
+        else:
+            sentence = rng.choice(doc.page_content.split("\n")[2:])
+            words = sentence.split()
+            queries.append((" ".join(words[-4:]), str(idx)))
+    return queries
+
+
+def percentiles(samples: Sequence[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, float]:
+    if not samples:
+        return {f"p{p}": 0.0 for p in points}
+    ordered = sorted(samples)
+    return {
+        f"p{p}": ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+        for p in points
+    }
+
+
+def time_calls(fn: Callable, inputs: Sequence) -> Tuple[List, List[float]]:
+    """입력별 호출 결과와 소요 시간(ms) 목록"""
+    results, latencies = [], []
+    for item in inputs:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
@@ -0,0 +1,179 @@
+# benchmarks/mock_confluence.py
+"""
+로컬 Confluence REST API 목 서버 (크롤러 벤치마크용)
+합성 페이지 트리를 만들고 요청 수/전송 바이트를 집계한다.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+class MockConfluence:
+    def __init__(
+        self,
+        depth: int = 3,
+        branching: int = 5,
+        latency: float = 0.03,
+        body_chars: int = 2000,
+        root_id: str = "1000",
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.root_id = root_id
+        self.pages: Dict[str, Dict] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.request_count = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._next_id = int(root_id)
+        self._body_chars = body_chars
+        self._add_page(None, 0, depth, branching)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _add_page(self, parent_id: Optional[str], level: int, depth: int, branching: int) -> str:
+        page_id = str(self._next_id)
+        self._next_id += 1
+        self.pages[page_id] = {
+            "id": page_id,
+            "type": "page",
+            "status": "current",
+            "title": f"페이지 {page_id}",
+            "version": {"number": 1, "message": "", "minorEdit": False, "when": "2024-01-01T00:00:00.000Z"},
+            "body": {"storage": {"value": self._make_body(page_id), "representation": "storage"}},
+            "_links": {"webui": f"/spaces/MOCK/pages/{page_id}"},
+            "parent_id": parent_id,
+        }
+        self.children[page_id] = []
+        if parent_id is not None:
+            self.children[parent_id].append(page_id)
+        if level < depth:
+            for _ in range(branching):
+                self._add_page(page_id, level + 1, depth, branching)
+        return page_id
+
+    def _make_body(self, page_id: str) -> str:
+        words = ["개인정보", "처리", "위탁", "동의", "보안", "점검", "정책", "절차"]
+        text = " ".join(self._rng.choice(words) for _ in range(self._body_chars // 4))
+        return f"<h1>페이지 {page_id}</h1><p>{text}</p>"
+
+    # 데이터 변경 (증분 크롤링 벤치마크용)
+    def edit_page(self, page_id: str) -> None:
+        page = self.pages[page_id]
+        page["version"]["number"] += 1
+        page["version"]["when"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        page["body"]["storage"]["value"] = self._make_body(page_id)
+
+    def delete_page(self, page_id: str) -> None:
+        for child_id in list(self.children.get(page_id, [])):
+            self.delete_page(child_id)
+        page = self.pages.pop(page_id)
+        self.children.pop(page_id, None)
+        if page["parent_id"] is not None:
+            self.children[page["parent_id"]].remove(page_id)
+
+    def ancestors(self, page_id: str) -> List[str]:
+        result, parent = [], self.pages[page_id]["parent_id"]
+        while parent is not None:
+            result.append(parent)
+            parent = self.pages[parent]["parent_id"]
+        return result
+
+    def render(self, page_id: str, expand: str) -> Dict:
+        page = self.pages[page_id]
+        data = {k: page[k] for k in ("id", "type", "status", "title", "_links")}
+        fields = set(expand.split(",")) if expand else set()
+        if "version" in fields:
+            data["version"] = page["version"]
+        if "body.storage" in fields:
+            data["body"] = page["body"]
+        if "ancestors" in fields:
+            data["ancestors"] = [{"id": a} for a in reversed(self.ancestors(page_id))]
+        return data
+
+    def paginate(self, path: str, ids: List[str], query: Dict) -> Dict:
+        start = int(query.get("start", ["0"])[0])
+        limit = int(query.get("limit", ["25"])[0])
+        expand = query.get("expand", [""])[0]
+        window = ids[start:start + limit]
+        data = {
+            "results": [self.render(pid, expand) for pid in window],
+            "start": start,
+            "limit": limit,
+            "size": len(window),
+            "_links": {},
+        }
+        if start + limit < len(ids):
+            next_query = {k: v[0] for k, v in query.items()}
+            next_query.update({"start": start + limit, "limit": limit})
+            data["_links"]["next"] = f"{path}?{urlencode(next_query)}"
+        return data
+
+    def handle(self, path: str, query: Dict) -> Optional[Dict]:
+        parts = [p for p in path.split("/") if p]
+        expand = query.get("expand", [""])[0]
+        if parts[:3] != ["rest", "api", "content"]:
+            return None
+        with self._lock:
+            if len(parts) == 3:
+                return self.paginate(path, sorted(self.pages), query)
+            if len(parts) == 4 and parts[3] == "search":
+                return self.search(path, query)
+            if parts[3] not in self.pages:
+                return None
+            if len(parts) == 4:
+                return self.render(parts[3], expand)
+            if parts[4:] == ["child", "page"]:
+                return self.paginate(path, self.children[parts[3]], query)
+        return None
+
+    def search(self, path: str, query: Dict) -> Dict:
+        """CQL 일부 지원: 'ancestor = X or id = X', 'id in (a,b,...)'"""
+        cql = query.get("cql", [""])[0]
+        if cql.startswith("id in"):
+            wanted = [x.strip() for x in cql[cql.index("(") + 1:cql.index(")")].split(",")]
+            ids = [pid for pid in wanted if pid in self.pages]
+        else:
+            root = cql.split("ancestor")[1].split("=")[1].split()[0].strip()
+            ids = sorted(pid for pid in self.pages if pid == root or root in self.ancestors(pid))
+        return self.paginate(path, ids, query)
+
+    def start(self) -> str:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                time.sleep(mock.latency)
+                data = mock.handle(url.path, parse_qs(url.query))
+                payload = json.dumps(data if data is not None else {"message": "not found"}).encode("utf-8")
+                with mock._lock:
+                    mock.request_count += 1
+                    mock.bytes_sent += len(payload)
+                self.send_response(200 if data is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.request_count = 0
+            self.bytes_sent = 0
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,310 @@
+# benchmarks/run_benchmarks.py
+"""
+RAG/에이전트 핵심 경로 오프라인 벤치마크 (Azure OpenAI 호출 없음)
+- PDF 로딩(순차/병렬), 청킹(statute/recursive), 임베딩+인덱싱
+- search_law 지연시간 (cold: 벡터스토어/어휘 인덱스 첫 로드 포함, warm: p50/p95/p99)
+- graph.invoke 종단 지연시간과 모델 시간을 뺀 그래프 오버헤드
+- 턴 단위 추적(tracing) 켬/끔 지연시간 차이
+- 모듈별 import 시간과 그래프 첫 생성 시간 (bench_import_time, 새 프로세스에서 측정)
+결과는 JSON으로 저장하고, --baseline을 주면 이전 결과와 비교해 느려진 지표를 보고한다.
+
+사용법:
+  python benchmarks/run_benchmarks.py --output benchmarks/results/latest.json
+  python benchmarks/run_benchmarks.py --baseline benchmarks/results/base.json --fail-on-regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from common import (
+    REPO_ROOT,
+    FakeChatModel,
+    HashingEmbeddings,
+    make_statute_corpus,
+    make_queries,
+    percentiles,
+    time_calls,
+    write_statute_pdfs,
+)
+
+# agent_flow는 import 시 Azure 클라이언트 설정을 읽으므로 더미 값을 채운다 (실제 호출 없음)
+for key, value in {
+    "AZURE_OPENAI_API_KEY": "offline-benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://example.invalid",
+    "OPENAI_API_VERSION": "2024-06-01",
+    "AZURE_OPENAI_CHAT_MODEL": "gpt-4o",
+    "AZURE_OPENAI_EMBEDDING_MODEL": "text-embedding-3-small",
+}.items():
+    os.environ.setdefault(key, value)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# 값이 작을수록 좋은 지표 (회귀 비교 대상)
+LOWER_IS_BETTER = ("seconds", "_ms", "p50", "p95", "p99")
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    summary = {k: round(v, 3) for k, v in percentiles(latencies_ms).items()}
+    summary["mean_ms"] = round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0
+    return summary
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round(time.perf_counter() - start, 4)
+
+
+def bench_pdf_load(folder: str, workers: int) -> Dict:
+    import rag_utils
+
+    docs, seconds = timed(lambda: rag_utils.load_pdf_documents(folder, loader_type="pymupdf"))
+    _, parallel_seconds = timed(lambda: rag_utils.load_pdf_documents(folder, loader_type="pymupdf", max_workers=workers))
+    return {
+        "pages": len(docs),
+        "seconds": seconds,
+        "parallel_seconds": parallel_seconds,
+        "parallel_workers": workers,
+        "pages_per_second": round(len(docs) / seconds, 1) if seconds else 0.0,
+    }, docs
+
+
+def bench_chunking(pages) -> Dict:
+    import rag_utils
+
+    report = {}
+    chunks = None
+    for strategy in ("recursive", "statute"):
+        result, seconds = timed(lambda: rag_utils.chunk_documents(pages, strategy=strategy))
+        report[strategy] = {"chunks": len(result), "seconds": seconds}
+        if strategy == rag_utils.CHUNK_STRATEGY:
+            chunks = result
+    return report, chunks
+
+
+def bench_indexing(chunks, persist_directory: str, batch_size: int = 256) -> Dict:
+    import rag_utils
+    from hybrid_search import get_lexical_index, mark_lexical_index_saved
+
+    def index():
+        vectorstore = rag_utils.get_pooled_vectorstore(persist_directory)
+        lexical_index = get_lexical_index(persist_directory)
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i + batch_size]
+            ids = vectorstore.add_documents(batch)
+            lexical_index.add(ids, [chunk.page_content for chunk in batch])
+        lexical_index.save()
+        mark_lexical_index_saved(lexical_index)
+        rag_utils.VECTORSTORE_POOL.mark_fresh(persist_directory)
+
+    _, seconds = timed(index)
+    return {
+        "chunks": len(chunks),
+        "seconds": seconds,
+        "chunks_per_second": round(len(chunks) / seconds, 1) if seconds else 0.0,
+    }
+
+
+def reset_retrieval_state() -> None:
+    """프로세스 내 벡터스토어 풀과 어휘 인덱스 캐시를 비워 다음 검색을 cold start로 만든다"""
+    import hybrid_search
+    import rag_utils
+
+    rag_utils.VECTORSTORE_POOL.invalidate()
+    with hybrid_search._LEXICAL_INDEXES_LOCK:
+        hybrid_search._LEXICAL_INDEXES.clear()
+
+
+def bench_search_law(queries: List[str]) -> Dict:
+    import agent_flow
+
+    reset_retrieval_state()
+    _, cold_ms = time_calls(lambda q: agent_flow.search_law.invoke({"query": q}), queries[:1])
+    _, warm_ms = time_calls(lambda q: agent_flow.search_law.invoke({"query": q}), queries[1:])
+    return {"cold_ms": round(cold_ms[0], 3), "warm": latency_summary(warm_ms), "queries": len(warm_ms)}
+
+
+def bench_graph(queries: List[str], checkpoint_path: str, model_latency: float, threads: int = 4) -> Dict:
+    import agent_flow
+    from checkpointer import BoundedSqliteSaver
+
+    llm = FakeChatModel(latency=model_latency)
+    checkpointer = BoundedSqliteSaver(sqlite3.connect(checkpoint_path, check_same_thread=False))
+    agent_flow.set_legal_agent_graph(agent_flow.build_legal_agent_graph(llm=llm, checkpointer=checkpointer))
+
+    total_ms, overhead_ms, model_ms = [], [], []
+    for i, question in enumerate(queries):
+        model_before = llm.model_seconds
+        start = time.perf_counter()
+        agent_flow.answer_question(question, thread_id=f"bench-{i % threads}", use_cache=False)
+        elapsed = (time.perf_counter() - start) * 1000
+        in_model = (llm.model_seconds - model_before) * 1000
+        total_ms.append(elapsed)
+        model_ms.append(in_model)
+        overhead_ms.append(elapsed - in_model)
+    return {
+        "turns": len(queries),
+        "model_calls": llm.calls,
+        "total": latency_summary(total_ms),
+        "model": latency_summary(model_ms),
+        "overhead": latency_summary(overhead_ms),
+    }
+
+
+def bench_tracing(queries: List[str], checkpoint_path: str, model_latency: float, threads: int = 4) -> Dict:
+    """
+    추적 끔/켬 턴을 번갈아 실행해 추적 오버헤드(p50 차이)와 턴당 기록된 구간 수 측정
+    (순서대로 따로 돌리면 워밍업/기록 길이 차이가 오버헤드보다 커서 교차 실행)
+    """
+    import agent_flow
+    import tracing
+    from checkpointer import BoundedSqliteSaver
+
+    checkpointer = BoundedSqliteSaver(sqlite3.connect(checkpoint_path, check_same_thread=False))
+    agent_flow.set_legal_agent_graph(
+        agent_flow.build_legal_agent_graph(llm=FakeChatModel(latency=model_latency), checkpointer=checkpointer)
+    )
+
+    samples = {False: [], True: []}
+    enabled_before = tracing.tracing_enabled()
+    try:
+        for i, question in enumerate(queries):
+            for enabled in (False, True):
+                tracing.set_tracing_enabled(enabled)
+                start = time.perf_counter()
+                agent_flow.answer_question(question, thread_id=f"trace-{enabled}-{i % threads}", use_cache=False)
+                samples[enabled].append((time.perf_counter() - start) * 1000)
+    finally:
+        tracing.set_tracing_enabled(enabled_before)
+    untraced, traced = latency_summary(samples[False]), latency_summary(samples[True])
+    recent = tracing.get_trace_sink().recent_traces(limit=len(queries))
+    return {
+        "untraced": untraced,
+        "traced": traced,
+        "overhead_p50_ms": round(traced["p50"] - untraced["p50"], 3),
+        "spans_per_turn": round(sum(len(t["spans"]) for t in recent) / len(recent), 1) if recent else 0.0,
+    }
+
+
+def flatten(data: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 1.0) -> List[Dict]:
+    """
+    baseline 대비 tolerance(비율) 이상 느려진 지표 목록
+    수 ms 수준의 지표는 측정 잡음이 크므로 절대 차이가 min_delta_ms 미만이면 무시한다.
+    """
+    current_flat, baseline_flat = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    for key, value in current_flat.items():
+        leaf = key.rsplit(".", 1)[-1]
+        if key not in baseline_flat or not any(leaf.endswith(s) or leaf == s for s in LOWER_IS_BETTER):
+            continue
+        before = baseline_flat[key]
+        delta_ms = (value - before) * (1000 if leaf.endswith("seconds") else 1)
+        if before > 0 and value > before * (1 + tolerance) and delta_ms >= min_delta_ms:
+            regressions.append({"metric": key, "baseline": before, "current": value, "ratio": round(value / before, 3)})
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--laws", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4, help="병렬 PDF 파싱 프로세스 수")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="가짜 채팅 모델 응답 지연(초)")
+    parser.add_argument("--import-repeat", type=int, default=3, help="import 시간 측정 반복 횟수 (0이면 생략)")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", "latest.json"))
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용 지연 증가 비율")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # 상대 경로 기본값(chroma_db, checkpoints.sqlite3 등)이 임시 디렉터리에 생기도록 이동
+        os.chdir(workdir)
+        import rag_utils
+        from embedding_cache import CachedEmbeddings, EmbeddingDiskCache
+
+        embeddings = HashingEmbeddings()
+        cache = EmbeddingDiskCache(os.path.join(workdir, "embedding_cache.sqlite3"))
+        rag_utils.VECTORSTORE_POOL.embeddings_factory = lambda model: CachedEmbeddings(embeddings, cache=cache)
+
+        pdf_dir = os.path.join(workdir, "legal_docs")
+        write_statute_pdfs(pdf_dir, n_laws=args.laws, articles_per_law=args.articles)
+        corpus = make_statute_corpus(n_laws=args.laws, articles_per_law=args.articles)
+        questions = [q for q, _ in make_queries(corpus, n=args.queries + 1)]
+
+        results = {}
+        results["pdf_load"], pages = bench_pdf_load(pdf_dir, args.workers)
+        results["chunking"], chunks = bench_chunking(pages)
+        results["indexing"] = bench_indexing(chunks, rag_utils.CHROMA_PERSIST_DIR)
+        results["search_law"] = bench_search_law(questions)
+        results["graph_invoke"] = bench_graph(
+            questions[:args.turns], os.path.join(workdir, "checkpoints.sqlite3"), args.model_latency
+        )
+        results["tracing"] = bench_tracing(
+            questions[:args.turns], os.path.join(workdir, "checkpoints_tracing.sqlite3"), args.model_latency
+        )
+        os.chdir(REPO_ROOT)
+
+    if args.import_repeat > 0:
+        from bench_import_time import measure_import_times
+
+        results["import_time"] = measure_import_times(repeat=args.import_repeat)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.tolerance)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"결과 저장: {output}", file=sys.stderr)
+
+    if args.fail_on_regression and report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# checkpointer.py
+"""
+LangGraph 대화 checkpoint를 SQLite에 저장하되 스레드별 이력과 유휴 스레드를 제한하는 checkpointer
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from config import CHECKPOINT_DB_PATH, CHECKPOINT_KEEP_LAST, THREAD_IDLE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver + 보존 정책
+    - 스레드의 루트 checkpoint는 최근 keep_last개만 유지 (이전 턴의 서브그래프 checkpoint도 함께 정리)
+    - evict_every번 저장할 때마다 idle_ttl_seconds 이상 사용되지 않은 스레드를 삭제
+    - 비동기 메서드(aget_tuple/aput 등)는 동기 구현을 워커 스레드에서 실행 (graph.ainvoke/astream 지원)
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        idle_ttl_seconds: float = THREAD_IDLE_TTL_SECONDS,
+        evict_every: int = 200,
+        **kwargs: Any
+    ):
+        super().__init__(conn, **kwargs)
+        self.keep_last = keep_last
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evict_every = evict_every
+        self._puts = 0
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity ("
+            " thread_id TEXT PRIMARY KEY,"
+            " last_seen REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def put(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            if checkpoint_ns == "":
+                self._prune_thread(cur, thread_id)
+
+        self._puts += 1
+        if self.evict_every and self._puts % self.evict_every == 0:
+            self.evict_idle_threads()
+        return next_config
+
+    # 비동기 API: SqliteSaver는 비동기 메서드를 지원하지 않으므로 연결 잠금을 공유하는 동기 구현에 위임
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def _prune_thread(self, cur: sqlite3.Cursor, thread_id: str) -> None:
+        """루트 checkpoint는 최근 keep_last개만 남기고, 그보다 오래된 서브그래프 checkpoint는 모두 삭제"""
+        cur.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''"
+            " ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, self.keep_last - 1),
+        )
+        row = cur.fetchone()
+        if row is None:
+            return
+        oldest_kept = row[0]
+        # checkpoint_id는 시간순 정렬되는 uuid6이므로 문자열 비교로 이전 checkpoint를 고를 수 있다.
+        for table in ("checkpoints", "writes"):
+            cur.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < ?",
+                (thread_id, oldest_kept),
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.cursor() as cur:
+            for table in ("checkpoints", "writes", "thread_activity"):
+                cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+
+    def evict_idle_threads(self, max_idle_seconds: Optional[float] = None) -> int:
+        """max_idle_seconds 동안 사용되지 않은 스레드의 checkpoint 삭제, 삭제된 스레드 수 반환"""
+        cutoff = time.time() - (max_idle_seconds if max_idle_seconds is not None else self.idle_ttl_seconds)
+        with self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,))
+            idle = [row[0] for row in cur.fetchall()]
+            for thread_id in idle:
+                for table in ("checkpoints", "writes", "thread_activity"):
+                    cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        if idle:
+            logger.info(f"유휴 스레드 {len(idle)}개의 대화 기록을 삭제했습니다.")
+        return len(idle)
+
+    def stats(self) -> Dict[str, int]:
+        with self.cursor(transaction=False) as cur:
+            threads = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+            checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        return {"threads": threads, "checkpoints": checkpoints}
+
+
+_CHECKPOINTER: Optional[BoundedSqliteSaver] = None
+_CHECKPOINTER_LOCK = threading.Lock()
+
+
+def get_checkpointer(path: str = CHECKPOINT_DB_PATH) -> BoundedSqliteSaver:
+    """프로세스 전역 checkpointer (Streamlit 세션들이 하나의 SQLite 연결을 공유)"""
+    global _CHECKPOINTER
+    with _CHECKPOINTER_LOCK:
+        if _CHECKPOINTER is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            _CHECKPOINTER = BoundedSqliteSaver(conn)
+            _CHECKPOINTER.evict_idle_threads()
+        return _CHECKPOINTER
@@ -12,6 +12,51 @@ OPENAI_API_VERSION = os.getenv("OPENAI_API_VERSION")
 
 CHROMA_PERSIST_DIR = "./chroma_db"
 LEGAL_DOCS_DIR = "./legal_docs"
+EMBEDDING_CACHE_PATH = "./embedding_cache.sqlite3"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "hybrid" 또는 "dense"
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "statute")  # "statute"(조 단위) 또는 "recursive"(크기 기준)
+# statute 청킹에서 같은 장의 연속된 짧은 조문을 묶을 최대 글자 수 (0이면 조문마다 한 청크)
+# 대부분의 조문은 수백 자라서 조문마다 한 청크면 벡터 수가 recursive보다 3배가량 많아진다 (bench_chunking.py)
+STATUTE_PACK_CHARS = int(os.getenv("STATUTE_PACK_CHARS", "1000"))
+# 검색용 벡터 백엔드: "chroma" 또는 "mmap"(mmap_index.py로 export한 읽기 전용 인덱스, 워커 프로세스 간 페이지 캐시 공유)
+# 색인/삭제(db_manager, confluence_ingest)는 항상 Chroma에 기록하고, mmap 인덱스는 export 시점의 스냅샷이다.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+MMAP_INDEX_DIRNAME = "mmap_index"  # CHROMA_PERSIST_DIR 아래 export 디렉터리
+
+# 검색 후처리 (search_law: 과다 검색 → 점수 임계값 → 중복 제거/MMR → 토큰 예산 발췌)
+RETRIEVAL_TOP_K = 5  # LLM에 전달할 최대 문서 수
+RETRIEVAL_FETCH_K = 20  # 후처리 전에 가져올 후보 수
+# dense 후보의 코사인 유사도 하한. Chroma(l2)/mmap이 반환하는 제곱 거리 d(단위 벡터면 2−2cos)를
+# cos = 1 − d/2로 변환해 비교한다 (hybrid_search.distance_to_cosine, text-embedding-3 기준)
+RETRIEVAL_SCORE_THRESHOLD = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0.28"))
+RETRIEVAL_LEXICAL_MIN_RATIO = 0.2  # BM25 점수가 1위의 이 비율 미만인 어휘 후보는 제외
+RETRIEVAL_DEDUP_THRESHOLD = 0.6  # 이미 고른 청크와 문자 5-gram Jaccard 유사도가 이 이상이면 중복으로 제외
+RETRIEVAL_MMR_LAMBDA = 0.7  # 1에 가까울수록 관련도, 0에 가까울수록 다양성 우선
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))  # search_law 결과 본문 토큰 예산
+
+# 시맨틱 답변 캐시 설정
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = 512
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# 대화 기록(checkpoint) 설정
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "./checkpoints.sqlite3")
+CHECKPOINT_KEEP_LAST = 3  # 스레드별로 보존할 루트 checkpoint 수
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))  # 이 토큰 수를 넘는 과거 메시지는 삭제
+THREAD_IDLE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# 성능 추적(span) 설정
+# 사용자 질문 원문이 디스크에 기록되므로 기본은 비활성화 (TRACING_ENABLED=true로 켬)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_DB_PATH = os.getenv("TRACE_DB_PATH", "./traces.sqlite3")  # .jsonl로 지정하면 JSONL로 기록
+TRACE_RETENTION = 5000  # 보존할 최근 턴 수 (SQLite/JSONL 공통)
+
+# HTTP API 서버 설정 (api_server.py)
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "32"))  # 동시에 실행하는 그래프 턴 수
+API_MAX_PENDING = int(os.getenv("API_MAX_PENDING", "64"))  # 실행 슬롯을 기다릴 수 있는 요청 수 (초과 시 429)
+API_MAX_PENDING_PER_THREAD = 2  # 같은 thread_id에 대해 실행 중 + 대기 중인 요청 수 상한
+API_REQUEST_TIMEOUT_SECONDS = float(os.getenv("API_REQUEST_TIMEOUT_SECONDS", "120"))
 
 class LegalAgentState(TypedDict):
     messages: List[Any]
@@ -0,0 +1,187 @@
+# confluence_ingest.py
+"""
+Confluence 크롤링 결과를 법률 RAG 벡터스토어(Chroma)에 적재하는 단계
+storage 포맷 HTML을 텍스트로 변환하고, 페이지 단위로 변경된 페이지만 다시 임베딩한다.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from config import CHROMA_PERSIST_DIR, VECTOR_BACKEND
+from confluence_jsonl import is_end_marker, iter_page_records
+from db_manager import LegalDocDBManager
+
+logger = logging.getLogger(__name__)
+
+# 줄바꿈으로 구분할 블록 요소
+_BLOCK_TAGS = {
+    "p", "div", "br", "hr", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li",
+    "table", "tr", "blockquote", "pre", "ac:structured-macro", "ac:rich-text-body",
+    "ac:plain-text-body", "ac:task",
+}
+# 본문에 포함하지 않을 요소 (매크로 파라미터, 스타일/스크립트)
+_SKIP_TAGS = {"ac:parameter", "style", "script"}
+
+
+class _StorageTextParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+            if tag == "li":
+                self.parts.append("- ")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in ("td", "th"):
+            self.parts.append(" | ")
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def unknown_decl(self, data):
+        # 코드/텍스트 매크로 본문: <![CDATA[...]]>
+        if data.startswith("CDATA[") and not self.skip_depth:
+            self.parts.append(data[len("CDATA["):])
+
+
+def storage_to_text(html: str) -> str:
+    """Confluence storage 포맷(XHTML + ac:/ri: 매크로)을 줄 단위 일반 텍스트로 변환"""
+    parser = _StorageTextParser()
+    parser.feed(html or "")
+    parser.close()
+    lines = []
+    for line in "".join(parser.parts).replace("\xa0", " ").splitlines():
+        line = re.sub(r"[ \t]+", " ", line).strip().rstrip("|").strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def page_to_document(record: Dict) -> Optional[Document]:
+    """크롤링 페이지 레코드를 제목/URL/버전 메타데이터를 가진 Document로 변환 (본문이 없으면 None)"""
+    body = record.get("body", {}).get("storage", {}).get("value")
+    if body is None or record.get("error"):
+        return None
+    title = record.get("title", "")
+    metadata = {
+        "source": record.get("url", ""),
+        "source_type": "confluence",
+        "page_id": record["id"],
+        "title": title,
+        "url": record.get("url", ""),
+        "version": record.get("version", {}).get("number", 0),
+        "last_modified": record.get("lastModified", ""),
+    }
+    if record.get("parent_id"):
+        metadata["parent_id"] = record["parent_id"]
+    return Document(page_content=f"{title}\n{storage_to_text(body)}".strip(), metadata=metadata)
+
+
+def iter_page_documents(records: Iterable[Dict]) -> Iterator[Tuple[str, Optional[Document]]]:
+    """(페이지 ID, Document 또는 None) 스트림 - None은 본문 없이 목록에만 있었던 페이지 (기존 청크 유지)"""
+    for record in records:
+        yield record["id"], page_to_document(record)
+
+
+def iter_nested_records(node: Dict, parent_id: Optional[str] = None, depth: int = 0) -> Iterator[Dict]:
+    """기존 confluence_data.json(중첩 구조)을 parent_id/depth가 붙은 평면 레코드로 펼침"""
+    record = {k: v for k, v in node.items() if k != "children"}
+    record.update({"parent_id": parent_id, "depth": depth})
+    yield record
+    for child in node.get("children", []):
+        yield from iter_nested_records(child, node["id"], depth + 1)
+
+
+class _CrawlStatus:
+    """레코드 스트림을 지나가며 본 페이지 ID, 실패 레코드 수, 종료 레코드 확인 여부를 기록"""
+
+    def __init__(self, complete: bool = False):
+        self.page_ids: Set[str] = set()
+        self.errors = 0
+        self.complete = complete
+
+    def track(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        for record in records:
+            if is_end_marker(record):
+                self.complete = bool(record.get("complete"))
+                continue
+            self.page_ids.add(record["id"])
+            if record.get("error"):
+                self.errors += 1
+            yield record
+
+    @property
+    def prunable(self) -> bool:
+        """크롤링이 끝까지 완료되고 실패한 페이지가 없을 때만 True"""
+        return self.complete and not self.errors
+
+
+def ingest_confluence_output(
+    path: str,
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    batch_size: int = 50,
+    prune: bool = False
+) -> Dict[str, List[str]]:
+    """
+    크롤러 출력 파일을 벡터스토어에 동기화
+    - .jsonl / .jsonl.gz: 한 줄씩 스트리밍하며 적재
+    - 증분 크롤링 결과(confluence_delta.json): 바뀐 페이지만 적재하고 deleted 목록의 페이지 삭제
+    - 기존 중첩 JSON(confluence_data.json): 펼쳐서 적재
+    prune=True면 전체 크롤링 결과에 없는 기존 페이지를 삭제한다. 단, 종료 레코드가 없거나(중단된 JSONL)
+    error 레코드가 있으면(조회 실패로 하위 트리가 빠졌을 수 있음) 삭제하지 않는다.
+    """
+    manager = LegalDocDBManager(persist_directory=persist_directory)
+    if path.endswith((".jsonl", ".jsonl.gz")):
+        status = _CrawlStatus()
+        records = status.track(iter_page_records(path, include_end_marker=True))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "changed" in data:
+            return manager.sync_confluence_pages(
+                iter_page_documents(data["changed"]), deleted_page_ids=data.get("deleted", []), batch_size=batch_size
+            )
+        # 중첩 JSON은 파일 전체가 읽혔으므로 실패 레코드만 확인
+        status = _CrawlStatus(complete=True)
+        records = status.track(iter_nested_records(data))
+
+    summary = manager.sync_confluence_pages(iter_page_documents(records), batch_size=batch_size)
+    if prune:
+        if status.prunable:
+            summary["removed"] = manager.prune_confluence_pages(status.page_ids)
+        else:
+            logger.warning(
+                f"크롤링 완료가 확인되지 않아(중단되었거나 조회 실패 {status.errors}개) "
+                f"사라진 페이지를 삭제하지 않습니다: {path}"
+            )
+    return summary
+
+
+# 사용 예시: python confluence_ingest.py confluence_data.jsonl --prune
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confluence 크롤링 결과를 벡터스토어에 적재")
+    parser.add_argument("path", nargs="?", default=os.getenv("CONFLUENCE_OUTPUT", "confluence_data.json"))
+    parser.add_argument("--prune", action="store_true", help="완료된 전체 크롤링 결과에 없는 기존 페이지 삭제")
+    args = parser.parse_args()
+    summary = ingest_confluence_output(args.path, prune=args.prune)
+    print({k: len(v) for k, v in summary.items()})
+    if VECTOR_BACKEND == "mmap":
+        LegalDocDBManager().export_mmap_index()
@@ -0,0 +1,165 @@
+# confluence_jsonl.py
+"""
+Confluence 크롤링 결과를 페이지당 한 줄(JSONL, 선택적으로 gzip)로 저장하고 다시 읽는 유틸리티
+각 레코드는 parent_id와 depth를 가진 평면 구조이며, 계층은 읽을 때 필요한 만큼만 복원한다.
+"""
+
+import gzip
+import json
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+# 스트림 끝에 기록하는 종료 레코드의 키 (이 줄이 없으면 중단된 크롤링 결과)
+END_MARKER_KEY = '_end'
+
+
+def is_end_marker(record: Dict) -> bool:
+    return bool(record.get(END_MARKER_KEY))
+
+
+def _is_gzip(path: str, compress: Optional[bool] = None) -> bool:
+    return compress if compress is not None else path.endswith('.gz')
+
+
+def _open(path: str, mode: str, compress: Optional[bool] = None) -> IO:
+    if _is_gzip(path, compress):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def write_page_records(
+    records: Iterable[Dict],
+    path: str,
+    compress: Optional[bool] = None,
+    flush_every: int = 20,
+    is_complete: Optional[Callable[[], bool]] = None
+) -> int:
+    """
+    페이지 레코드를 받는 즉시 한 줄씩 기록하고 기록한 수 반환 (.gz 경로면 gzip 압축)
+    flush_every개마다 flush하므로 중간에 중단되어도 그 전까지의 페이지는 남는다.
+    스트림을 끝까지 기록하면 종료 레코드({'_end': true, 'pages': n, 'complete': ...})를 덧붙인다.
+    complete는 error 레코드가 없고 is_complete()(주어진 경우)가 참일 때만 true이다.
+    """
+    count = errors = 0
+    with _open(path, 'wb', compress) as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            count += 1
+            errors += 1 if record.get('error') else 0
+            if count % flush_every == 0:
+                f.flush()
+        complete = not errors and (is_complete is None or is_complete())
+        end = {END_MARKER_KEY: True, 'pages': count, 'errors': errors, 'complete': complete}
+        f.write(json.dumps(end).encode('utf-8') + b'\n')
+    return count
+
+
+def _iter_lines(path: str, compress: Optional[bool] = None) -> Iterator[Tuple[int, bytes]]:
+    """(줄 시작 오프셋, 줄) 반환, 중단으로 잘린 gzip 스트림 끝은 무시"""
+    with _open(path, 'rb', compress) as f:
+        while True:
+            offset = f.tell()
+            try:
+                line = f.readline()
+            except EOFError:
+                return
+            if not line:
+                return
+            yield offset, line
+
+
+def iter_page_records(
+    path: str,
+    compress: Optional[bool] = None,
+    include_end_marker: bool = False
+) -> Iterator[Dict]:
+    """
+    JSONL 파일의 페이지 레코드를 한 건씩 반환 (마지막 줄이 잘린 경우 건너뜀)
+    include_end_marker=True면 종료 레코드도 반환한다 (완료 여부 확인용, is_end_marker 참고).
+    """
+    for _, line in _iter_lines(path, compress):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if include_end_marker or not is_end_marker(record):
+            yield record
+
+
+class PageTree:
+    """
+    JSONL 크롤링 결과의 지연 로딩 계층 뷰
+    처음 한 번 파일을 훑어 페이지 ID별 오프셋/부모/제목만 기억하고,
+    본문이 포함된 레코드는 get_page/walk에서 필요할 때 파일에서 다시 읽는다.
+    """
+
+    def __init__(self, path: str, compress: Optional[bool] = None):
+        self.path = path
+        self.compress = compress
+        self.offsets: Dict[str, int] = {}
+        self.parents: Dict[str, Optional[str]] = {}
+        self.titles: Dict[str, str] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.roots: List[str] = []
+        # 종료 레코드가 있고 실패한 페이지가 없으면 True (중단/실패한 크롤링이면 False)
+        self.complete = False
+        self._file: Optional[IO] = None
+
+        for offset, line in _iter_lines(path, compress):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if is_end_marker(record):
+                self.complete = bool(record.get('complete'))
+                continue
+            page_id = record['id']
+            parent_id = record.get('parent_id')
+            if page_id not in self.offsets:
+                (self.children.setdefault(parent_id, []) if parent_id else self.roots).append(page_id)
+            self.offsets[page_id] = offset
+            self.parents[page_id] = parent_id
+            self.titles[page_id] = record.get('title', '')
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, page_id: str) -> bool:
+        return page_id in self.offsets
+
+    def get_page(self, page_id: str) -> Dict:
+        """페이지 레코드 하나만 파일에서 읽어 반환"""
+        if self._file is None:
+            self._file = _open(self.path, 'rb', self.compress)
+        self._file.seek(self.offsets[page_id])
+        return json.loads(self._file.readline())
+
+    def get_children(self, page_id: str) -> List[str]:
+        return self.children.get(page_id, [])
+
+    def walk(self, page_id: Optional[str] = None) -> Iterator[Tuple[Dict, int]]:
+        """page_id(없으면 모든 루트)부터 깊이 우선으로 (레코드, 깊이)를 하나씩 읽어 반환"""
+        stack = [(pid, 0) for pid in reversed([page_id] if page_id else self.roots)]
+        while stack:
+            pid, depth = stack.pop()
+            yield self.get_page(pid), depth
+            stack.extend((cid, depth + 1) for cid in reversed(self.get_children(pid)))
+
+    def to_nested(self, page_id: Optional[str] = None) -> Dict:
+        """기존 confluence_data.json과 같은 중첩 구조로 변환 (트리 전체가 메모리에 올라감)"""
+        page_id = page_id or self.roots[0]
+        node = self.get_page(page_id)
+        node.pop('parent_id', None)
+        node.pop('depth', None)
+        node['children'] = [self.to_nested(cid) for cid in self.get_children(page_id)]
+        return node
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'PageTree':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,232 @@
+# context_packing.py
+"""
+검색 결과 후처리: 중복 청크 제거(MMR + 문자 shingle 유사도)와 토큰 예산 안에서의 문장 윈도우 발췌
+교차 인코더 없이 검색 점수와 질의 어휘 겹침만으로 LLM에 넘길 근거 문맥을 줄인다.
+"""
+
+import math
+import re
+import unicodedata
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from hybrid_search import tokenize_korean
+
+_HANGUL = re.compile(r"[가-힣]")
+_WHITESPACE = re.compile(r"\s+")
+# 줄바꿈, 항 번호(①~⑳), "다." 등 문장 종결 뒤에서 분리
+_SENTENCE_BOUNDARY = re.compile(r"\n+|(?<=[.?!])\s+|(?=[①-⑳])")
+ELLIPSIS = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    """tiktoken 없이 쓰는 토큰 수 근사 (한글은 글자당 약 1토큰, 그 외는 4글자당 1토큰)"""
+    hangul = len(_HANGUL.findall(text))
+    return hangul + math.ceil((len(text) - hangul) / 4)
+
+
+def shingles(text: str, n: int = 5) -> FrozenSet[str]:
+    """공백을 정규화한 문자 n-gram 집합 (청크 겹침/반복 페이지 판별용)"""
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(text) <= n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    overlap = len(a & b)
+    return overlap / (len(a) + len(b) - overlap)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text).lower()
+
+
+def term_weights(sentence_lists: Sequence[Sequence[str]], query: str) -> Dict[str, float]:
+    """
+    질의 어휘(tokenize_korean)의 문장 단위 IDF (후보 문서 전체 문장 기준)
+    모든 항에 반복되는 법령명 bigram보다 '제17조' 같은 드문 어휘가 발췌 위치를 결정하도록 한다.
+    어휘는 문장 안의 연속 문자열이므로 문장을 토큰화하지 않고 부분 문자열로 확인한다.
+    """
+    sentences = [_normalize(sentence) for sentences in sentence_lists for sentence in sentences]
+    n = len(sentences) or 1
+    return {
+        term: math.log(1 + n / (1 + sum(1 for sentence in sentences if term in sentence)))
+        for term in set(tokenize_korean(query))
+    }
+
+
+def _sentence_scores(sentences: Sequence[str], weights: Dict[str, float]) -> List[float]:
+    scores = []
+    for sentence in sentences:
+        normalized = _normalize(sentence)
+        score = sum(weight for term, weight in weights.items() if term in normalized)
+        scores.append(score / math.sqrt(len(normalized)) if score else 0.0)
+    return scores
+
+
+def _relevance(docs: Sequence[Document]) -> List[float]:
+    """리트리버 점수(rrf_score/relevance_score)를 최댓값 기준 0~1로 정규화, 점수가 없으면 순위로 대체"""
+    scores = []
+    for rank, doc in enumerate(docs):
+        score = doc.metadata.get("rrf_score", doc.metadata.get("relevance_score"))
+        scores.append(float(score) if score is not None else 1.0 / (rank + 1))
+    top = max(scores, default=0.0) or 1.0
+    return [score / top for score in scores]
+
+
+def rerank_scores(
+    docs: Sequence[Document],
+    sentence_scores: Sequence[Sequence[float]],
+    retriever_weight: float = 0.5
+) -> List[float]:
+    """
+    교차 인코더 대신 쓰는 경량 재순위 점수 (0~1)
+    retriever_weight·리트리버 점수 + (1−retriever_weight)·문서 내 가장 잘 맞는 문장의 질의 어휘 점수
+    """
+    retriever = _relevance(docs)
+    best = [max(scores, default=0.0) for scores in sentence_scores]
+    top = max(best, default=0.0) or 1.0
+    return [retriever_weight * r + (1 - retriever_weight) * b / top for r, b in zip(retriever, best)]
+
+
+def select_diverse(
+    docs: Sequence[Document],
+    top_k: int,
+    dedup_threshold: float = 0.6,
+    mmr_lambda: float = 0.7,
+    relevance: Optional[Sequence[float]] = None
+) -> List[int]:
+    """
+    MMR로 top_k개의 인덱스 선택: λ·관련도 − (1−λ)·이미 고른 문서와의 최대 shingle 유사도
+    이미 고른 문서와 유사도가 dedup_threshold 이상이면 (청크 overlap, 같은 조문의 반복 페이지) 제외한다.
+    relevance를 생략하면 리트리버 점수를 사용한다.
+    """
+    relevance = list(relevance) if relevance is not None else _relevance(docs)
+    signatures = [shingles(doc.page_content) for doc in docs]
+    redundancy = [0.0] * len(docs)
+    remaining = set(range(len(docs)))
+    selected: List[int] = []
+    while remaining and len(selected) < top_k:
+        best = max(remaining, key=lambda i: (mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy[i], -i))
+        selected.append(best)
+        remaining.discard(best)
+        # 새로 고른 문서와의 유사도만 계산해 최대 유사도 갱신
+        for i in list(remaining):
+            redundancy[i] = max(redundancy[i], jaccard(signatures[i], signatures[best]))
+            if redundancy[i] >= dedup_threshold:
+                remaining.discard(i)
+    return selected
+
+
+def _truncate(text: str, budget: int) -> str:
+    """budget 토큰에 맞게 앞부분만 남김 (한 문장이 예산보다 긴 경우)"""
+    if estimate_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + ELLIPSIS if low else ""
+
+
+def best_window(text: str, sentences: Sequence[str], scores: Sequence[float], budget: int) -> str:
+    """
+    질의 어휘 점수(scores)가 가장 높은 문장을 중심으로 앞뒤 문장을 budget 토큰까지 붙인 발췌
+    첫 줄(조문 제목/법령명)은 예산이 허락하면 유지하고, 잘린 부분은 '...'으로 표시한다.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    budget -= 2  # 앞뒤 '...' 표시 몫
+    if not sentences:
+        return _truncate(text, budget)
+    center = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+    costs = [estimate_tokens(s) + 1 for s in sentences]
+
+    start, end = center, center + 1
+    used = costs[center]
+    if used > budget:
+        return _truncate(sentences[center], budget)
+    # 점수가 높은 쪽 이웃부터 예산이 남는 동안 확장
+    while True:
+        left = start - 1 if start > 0 and used + costs[start - 1] <= budget else None
+        right = end if end < len(sentences) and used + costs[end] <= budget else None
+        if left is None and right is None:
+            break
+        if right is None or (left is not None and scores[left] > scores[right]):
+            start, used = left, used + costs[left]
+        else:
+            end, used = end + 1, used + costs[end]
+
+    parts = sentences[start:end]
+    if start > 0:
+        # 확장이 멈춘 뒤에도 첫 줄이 들어가면 제목으로 붙인다 (start-1 문장은 예산 초과)
+        head = [sentences[0]] if start > 1 and used + costs[0] + 1 <= budget else []
+        parts = head + [ELLIPSIS] + parts
+    if end < len(sentences):
+        parts.append(ELLIPSIS)
+    return "\n".join(parts)
+
+
+def pack_context(
+    docs: Sequence[Document],
+    query: str,
+    token_budget: int,
+    min_doc_tokens: int = 40
+) -> List[Tuple[Document, str]]:
+    """
+    순위대로 남은 예산을 남은 문서 수로 나눠 각 문서의 발췌를 만든다 (짧은 문서가 남긴 예산은 뒤 문서로 이월)
+    반환: (문서, 발췌 본문) 목록, 예산이 min_doc_tokens 미만으로 남으면 이후 문서는 제외
+    """
+    sentence_lists = [split_sentences(doc.page_content) for doc in docs]
+    weights = term_weights(sentence_lists, query)
+    return _pack(docs, sentence_lists, [_sentence_scores(s, weights) for s in sentence_lists], token_budget, min_doc_tokens)
+
+
+def _pack(docs, sentence_lists, sentence_scores, token_budget: int, min_doc_tokens: int) -> List[Tuple[Document, str]]:
+    packed = []
+    remaining = token_budget
+    for position, doc in enumerate(docs):
+        share = remaining // (len(docs) - position)
+        if share < min_doc_tokens:
+            share = remaining
+        if share < min_doc_tokens:
+            break
+        excerpt = best_window(doc.page_content, sentence_lists[position], sentence_scores[position], share)
+        if not excerpt:
+            continue
+        packed.append((doc, excerpt))
+        remaining -= estimate_tokens(excerpt)
+    return packed
+
+
+def postprocess_results(
+    docs: Sequence[Document],
+    query: str,
+    top_k: int,
+    token_budget: int,
+    dedup_threshold: float = 0.6,
+    mmr_lambda: float = 0.7
+) -> List[Tuple[Document, str]]:
+    """과다 검색한 후보 → 경량 재순위 → 중복 제거/MMR 선택 → 토큰 예산 발췌 (문장 분리/점수는 한 번만 계산)"""
+    sentence_lists = [split_sentences(doc.page_content) for doc in docs]
+    weights = term_weights(sentence_lists, query)
+    sentence_scores = [_sentence_scores(sentences, weights) for sentences in sentence_lists]
+    chosen = select_diverse(
+        docs, top_k, dedup_threshold=dedup_threshold, mmr_lambda=mmr_lambda,
+        relevance=rerank_scores(docs, sentence_scores),
+    )
+    return _pack(
+        [docs[i] for i in chosen], [sentence_lists[i] for i in chosen], [sentence_scores[i] for i in chosen],
+        token_budget, min_doc_tokens=40,
+    )
@@ -3,50 +3,395 @@
 ChromaDB 등 DB 관리 및 초기화 함수 정의
 """
 
-import os
 import glob
-from typing import List, Dict, Optional
-from rag_utils import get_vectorstore, load_and_split_pdf
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+from config import LEGAL_DOCS_DIR, CHROMA_PERSIST_DIR, VECTOR_BACKEND
+from hybrid_search import build_lexical_index, get_lexical_index, mark_lexical_index_saved
+from rag_utils import (
+    VECTORSTORE_POOL,
+    IngestStats,
+    chunk_documents,
+    file_sha256,
+    get_collection_signature,
+    get_pooled_vectorstore,
+    parse_pdf_files,
+    persist_vectorstore,
+)
+
+SOURCE_INDEX_FILENAME = "source_index.json"
+CONFLUENCE_SOURCE_PREFIX = "confluence:"
+
+
+def confluence_source_key(page_id: str) -> str:
+    """Confluence 페이지의 SourceIndex 키 (PDF 경로와 구분)"""
+    return f"{CONFLUENCE_SOURCE_PREFIX}{page_id}"
+
+
+def make_chunk_ids(source: str, content_hash: str, count: int) -> List[str]:
+    """source 경로와 내용 해시로 결정되는 청크 ID (같은 내용이면 항상 같은 ID)"""
+    source_key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return [f"{source_key}-{content_hash[:12]}-{i:05d}" for i in range(count)]
+
+
+def normalize_source(source: str) -> str:
+    """같은 파일이 './legal_docs/x.pdf'와 'legal_docs/x.pdf'로 따로 색인되지 않도록 경로 정규화"""
+    if source.startswith(CONFLUENCE_SOURCE_PREFIX):
+        return source
+    return os.path.normpath(source)
+
+
+class SourceIndex:
+    """source 경로 → 내용 해시, mtime, 크기, 청크 ID 목록을 저장하는 영속 인덱스 (키는 normalize_source 기준)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = {normalize_source(source): entry for source, entry in json.load(f).items()}
+        self._by_name = {os.path.basename(source): source for source in self.entries}
+
+    def get(self, source: str) -> Optional[Dict]:
+        return self.entries.get(normalize_source(source))
+
+    def find_by_name(self, filename: str) -> Optional[str]:
+        return self._by_name.get(os.path.basename(filename))
+
+    def find_by_chunk_id(self, chunk_id: str) -> Optional[str]:
+        """청크 ID를 가진 source 반환 (청크 단위 삭제 시에만 쓰는 선형 탐색)"""
+        for source, entry in self.entries.items():
+            if chunk_id in entry["chunk_ids"]:
+                return source
+        return None
+
+    def set(self, source: str, entry: Dict) -> None:
+        source = normalize_source(source)
+        self.entries[source] = entry
+        self._by_name[os.path.basename(source)] = source
+
+    def remove(self, source: str) -> Optional[Dict]:
+        source = normalize_source(source)
+        entry = self.entries.pop(source, None)
+        if self._by_name.get(os.path.basename(source)) == source:
+            del self._by_name[os.path.basename(source)]
+        return entry
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
 
-LEGAL_DOCS_DIR = "legal_docs"
 
 class LegalDocDBManager:
-    def __init__(self, persist_directory: str = "chroma_db"):
+    def __init__(
+        self,
+        persist_directory: str = CHROMA_PERSIST_DIR,
+        docs_directory: str = LEGAL_DOCS_DIR,
+        max_workers: Optional[int] = None
+    ):
         self.persist_directory = persist_directory
-        self.vectorstore = get_vectorstore(persist_directory=self.persist_directory)
+        self.docs_directory = docs_directory
+        self.max_workers = max_workers
+        self.vectorstore = get_pooled_vectorstore(persist_directory=self.persist_directory)
+        self.index = SourceIndex(os.path.join(self.persist_directory, SOURCE_INDEX_FILENAME))
+        if not self.index.entries and self._seed_index_from_collection():
+            # 인덱스 없이 만들어진 컬렉션(build_chroma_vectorstore 등)은 청크 메타데이터로 한 번 복원
+            self.index.save()
+        self.lexical_index = get_lexical_index(self.persist_directory)
+        if len(self.lexical_index) == 0 and self.index.entries:
+            # 어휘 인덱스 도입 이전에 만들어진 컬렉션은 한 번 전체 구축
+            self.lexical_index = build_lexical_index(self.vectorstore, self.persist_directory)
+            mark_lexical_index_saved(self.lexical_index)
+
+    def _seed_index_from_collection(self, page_size: int = 1000) -> bool:
+        """
+        기존 컬렉션 청크의 source/content_hash 메타데이터로 SourceIndex를 채우고, 채운 항목이 있으면 True
+        mtime/크기는 알 수 없으므로 다음 sync_documents에서 해시를 비교하며,
+        content_hash가 없던 파일은 한 번 다시 임베딩되고 기존 청크는 교체된다 (중복 추가 없음).
+        """
+        offset = 0
+        while True:
+            page = self.vectorstore.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                if metadata.get("source_type") == "confluence" and metadata.get("page_id"):
+                    source = confluence_source_key(str(metadata["page_id"]))
+                    defaults = {
+                        "type": "confluence",
+                        "title": metadata.get("title", ""),
+                        "url": metadata.get("url", ""),
+                        "version": metadata.get("version", 0),
+                    }
+                elif metadata.get("source"):
+                    source = normalize_source(metadata["source"])
+                    defaults = {"mtime": None, "size": None, "pages": 0}
+                else:
+                    continue
+                entry = self.index.get(source)
+                if entry is None:
+                    entry = {**defaults, "content_hash": metadata.get("content_hash", ""), "chunk_ids": []}
+                    self.index.set(source, entry)
+                entry["chunk_ids"].append(chunk_id)
+                if "page" in metadata and "pages" in entry:
+                    entry["pages"] = max(entry["pages"], int(metadata["page"]) + 1)
+            offset += len(page["ids"])
+        return bool(self.index.entries)
+
+    def _document_info(self, source: str, entry: Dict) -> Dict:
+        info = {
+            "source": source,
+            "content_hash": entry["content_hash"],
+            "mtime": entry.get("mtime"),
+            "pages": entry.get("pages", 0),
+            "chunks": len(entry["chunk_ids"]),
+        }
+        if entry.get("type") == "confluence":
+            info.update({"type": "confluence", "title": entry["title"], "url": entry["url"], "version": entry["version"]})
+        return info
 
     def list_documents(self) -> List[Dict]:
-        """벡터스토어에 저장된 모든 문서의 메타데이터 리스트 반환"""
-        return [doc.metadata for doc in self.vectorstore.get()['documents']]
+        """인덱싱된 모든 문서의 메타데이터 리스트 반환 (벡터스토어 전체 조회 없음)"""
+        return [self._document_info(source, entry) for source, entry in self.index.entries.items()]
+
+    def _upsert_sources(self, items: List[Tuple[str, List[Document], Dict]]) -> None:
+        """
+        (source, 청크, 인덱스 항목) 묶음을 한 번의 add_documents로 upsert하고,
+        각 source의 이전 버전 청크 중 더 이상 쓰이지 않는 것만 삭제
+        """
+        all_chunks, all_ids = [], []
+        for source, chunks, entry in items:
+            entry["chunk_ids"] = make_chunk_ids(source, entry["content_hash"], len(chunks))
+            all_chunks.extend(chunks)
+            all_ids.extend(entry["chunk_ids"])
+        if all_chunks:
+            self.vectorstore.add_documents(all_chunks, ids=all_ids)
+            self.lexical_index.add(all_ids, [chunk.page_content for chunk in all_chunks])
+
+        for source, _, entry in items:
+            previous = self.index.get(source)
+            if previous:
+                stale_ids = list(set(previous["chunk_ids"]) - set(entry["chunk_ids"]))
+                if stale_ids:
+                    self.vectorstore.delete(stale_ids)
+                    self.lexical_index.remove(stale_ids)
+            self.index.set(source, entry)
+
+    def _update_chunk_metadata(self, items: List[Tuple[List[str], Dict]]) -> None:
+        """(청크 ID 목록, 페이지 메타데이터) 묶음을 다시 임베딩하지 않고 청크 메타데이터에 병합"""
+        ids, metadatas = [], []
+        for chunk_ids, metadata in items:
+            ids.extend(chunk_ids)
+            metadatas.extend(dict(metadata) for _ in chunk_ids)
+        if ids:
+            self.vectorstore._collection.update(ids=ids, metadatas=metadatas)
+
+    def _index_pages(self, source: str, pages: List, content_hash: str, stat: os.stat_result) -> int:
+        """파싱된 페이지를 청킹해 upsert하고, 이전 버전의 청크가 있으면 삭제 (청크 수 반환)"""
+        for page in pages:
+            page.metadata["content_hash"] = content_hash
+        chunks = chunk_documents(pages)
+        self._upsert_sources([(source, chunks, {
+            "content_hash": content_hash,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "pages": len(pages),
+        })])
+        return len(chunks)
+
+    def _remove_source(self, source: str) -> None:
+        entry = self.index.remove(source)
+        if entry and entry["chunk_ids"]:
+            self.vectorstore.delete(entry["chunk_ids"])
+            self.lexical_index.remove(entry["chunk_ids"])
+
+    def _commit(self) -> None:
+        """배치 단위로 한 번만 영속화"""
+        persist_vectorstore(self.vectorstore)
+        self.index.save()
+        self.lexical_index.save()
+        mark_lexical_index_saved(self.lexical_index)
+        VECTORSTORE_POOL.mark_fresh(self.persist_directory)
 
     def add_document(self, pdf_path: str) -> None:
-        """PDF 파일을 벡터스토어에 추가 및 임베딩"""
-        docs = load_and_split_pdf(pdf_path)
-        self.vectorstore.add_documents(docs)
-        self.vectorstore.persist()
+        """PDF 파일을 벡터스토어에 추가 및 임베딩 (이미 있으면 해당 파일 청크만 교체)"""
+        content_hash = file_sha256(pdf_path)
+        for source, pages, _ in parse_pdf_files([pdf_path], max_workers=1):
+            self._index_pages(normalize_source(source), pages, content_hash, os.stat(source))
+        self._commit()
 
     def remove_document(self, doc_id: str) -> None:
-        """문서 ID로 벡터스토어에서 삭제"""
-        self.vectorstore.delete([doc_id])
-        self.vectorstore.persist()
-
-    def sync_documents(self) -> None:
-        """legal_docs 폴더 내 PDF 파일과 벡터스토어 동기화 (새 파일 자동 임베딩)"""
-        pdf_files = glob.glob(os.path.join(LEGAL_DOCS_DIR, "*.pdf"))
-        existing_docs = set([meta.get('source') for meta in self.list_documents()])
+        """source 경로(또는 청크 ID)로 벡터스토어에서 삭제 (청크 ID면 소유 항목의 chunk_ids에서도 제거)"""
+        if self.index.get(doc_id) is not None:
+            self._remove_source(doc_id)
+        else:
+            self.vectorstore.delete([doc_id])
+            self.lexical_index.remove([doc_id])
+            source = self.index.find_by_chunk_id(doc_id)
+            if source is not None:
+                entry = self.index.get(source)
+                entry["chunk_ids"].remove(doc_id)
+                if not entry["chunk_ids"]:
+                    # 남은 청크가 없으면 항목도 제거 (다음 sync_documents에서 다시 추가됨)
+                    self.index.remove(source)
+        self._commit()
+
+    def sync_documents(self, stats: Optional[IngestStats] = None) -> Dict[str, List[str]]:
+        """
+        legal_docs 폴더 내 PDF 파일과 벡터스토어를 한 번의 diff로 동기화
+        새 파일은 추가, 내용이 바뀐 파일은 해당 청크만 교체, 사라진 파일은 삭제한다.
+        mtime/크기가 그대로면 해시 계산도 생략한다.
+        stats가 주어지면 파싱한 파일별 시간과 전체 처리량(pages/sec)을 기록한다.
+        """
+        start = time.perf_counter()
+        pdf_files = sorted(normalize_source(p) for p in glob.glob(os.path.join(self.docs_directory, "*.pdf")))
+        summary = {"added": [], "updated": [], "removed": [], "unchanged": []}
+        changed: Dict[str, str] = {}
+        file_stats: Dict[str, os.stat_result] = {}
+
         for pdf_path in pdf_files:
-            if pdf_path not in existing_docs:
-                self.add_document(pdf_path)
+            stat = file_stats[pdf_path] = os.stat(pdf_path)
+            entry = self.index.get(pdf_path)
+            if entry and entry["mtime"] == stat.st_mtime and entry.get("size") == stat.st_size:
+                summary["unchanged"].append(pdf_path)
+                continue
+            content_hash = file_sha256(pdf_path)
+            if entry and entry["content_hash"] == content_hash:
+                entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+                summary["unchanged"].append(pdf_path)
+                continue
+            changed[pdf_path] = content_hash
+            summary["updated" if entry else "added"].append(pdf_path)
+
+        for source, pages, parse_seconds in parse_pdf_files(list(changed), max_workers=self.max_workers):
+            chunk_count = self._index_pages(source, pages, changed[source], file_stats[source])
+            if stats is not None:
+                stats.record_file(source, len(pages), chunk_count, parse_seconds, start)
+
+        current = set(pdf_files)
+        pdf_sources = [s for s, e in self.index.entries.items() if e.get("type", "pdf") == "pdf"]
+        for source in [s for s in pdf_sources if s not in current]:
+            self._remove_source(source)
+            summary["removed"].append(source)
+
+        self._commit()
+        if stats is not None:
+            stats.skipped.extend(summary["unchanged"])
+            stats.elapsed_seconds = time.perf_counter() - start
+        return summary
+
+    def sync_confluence_pages(
+        self,
+        pages: Iterable[Tuple[str, Optional[Document]]],
+        deleted_page_ids: Iterable[str] = (),
+        remove_missing: bool = False,
+        batch_size: int = 50
+    ) -> Dict[str, List[str]]:
+        """
+        (페이지 ID, Document) 스트림을 벡터스토어에 동기화 (confluence_ingest.iter_page_documents 참고)
+        - 텍스트 해시가 같은 페이지는 다시 임베딩하지 않고, 버전/제목/URL이 바뀌었으면 청크 메타데이터만 갱신
+        - 바뀐 페이지는 해당 페이지의 청크만 교체, batch_size 페이지마다 한 번에 임베딩/영속화
+        - Document가 None이면(본문 없이 목록만 받은 페이지) 기존 청크를 그대로 둔다.
+        - deleted_page_ids 및 remove_missing=True일 때 스트림에 없던 기존 페이지는 삭제
+        """
+        summary = {"added": [], "updated": [], "removed": [], "unchanged": []}
+        seen = set()
+        batch: List[Tuple[str, List[Document], Dict]] = []
+        relabeled: List[Tuple[List[str], Dict]] = []
+
+        def flush():
+            if batch or relabeled:
+                self._upsert_sources(batch)
+                self._update_chunk_metadata(relabeled)
+                self._commit()
+                batch.clear()
+                relabeled.clear()
+
+        for page_id, doc in pages:
+            source = confluence_source_key(page_id)
+            seen.add(source)
+            if doc is None:
+                continue
+            content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+            entry = self.index.get(source)
+            if entry and entry["content_hash"] == content_hash:
+                page_info = {key: doc.metadata.get(key, entry.get(key)) for key in ("title", "url", "version")}
+                if any(entry.get(key) != value for key, value in page_info.items()):
+                    # 인용/증분 manifest가 실제 색인과 어긋나지 않도록 청크 메타데이터도 함께 갱신
+                    entry.update(page_info)
+                    relabeled.append((entry["chunk_ids"], {**doc.metadata, "content_hash": content_hash}))
+                summary["unchanged"].append(page_id)
+                if len(relabeled) >= batch_size:
+                    flush()
+                continue
+            doc.metadata["content_hash"] = content_hash
+            chunks = chunk_documents([doc], strategy="recursive")
+            batch.append((source, chunks, {
+                "type": "confluence",
+                "content_hash": content_hash,
+                "title": doc.metadata.get("title", ""),
+                "url": doc.metadata.get("url", ""),
+                "version": doc.metadata.get("version", 0),
+            }))
+            summary["updated" if entry else "added"].append(page_id)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        removed = {confluence_source_key(page_id) for page_id in deleted_page_ids}
+        if remove_missing:
+            removed |= self._missing_confluence_sources(seen)
+        summary["removed"] = self._remove_confluence_sources(removed)
+        return summary
+
+    def _missing_confluence_sources(self, seen: Iterable[str]) -> Set[str]:
+        seen = set(seen)
+        return {s for s, e in self.index.entries.items() if e.get("type") == "confluence" and s not in seen}
+
+    def _remove_confluence_sources(self, sources: Iterable[str]) -> List[str]:
+        removed = []
+        for source in sorted(sources):
+            if self.index.get(source) is not None:
+                self._remove_source(source)
+                removed.append(source[len(CONFLUENCE_SOURCE_PREFIX):])
+        self._commit()
+        return removed
+
+    def prune_confluence_pages(self, keep_page_ids: Iterable[str]) -> List[str]:
+        """
+        keep_page_ids에 없는 기존 Confluence 페이지를 모두 삭제하고 삭제한 페이지 ID 반환
+        완료가 확인된 전체 크롤링 결과로만 호출해야 한다 (중단된 결과면 정상 페이지까지 삭제됨).
+        """
+        missing = self._missing_confluence_sources(confluence_source_key(page_id) for page_id in keep_page_ids)
+        return self._remove_confluence_sources(missing)
+
+    def export_mmap_index(self) -> Dict:
+        """현재 컬렉션을 검색 전용 mmap 인덱스로 export (VECTOR_BACKEND=mmap인 워커는 다음 조회 때 새 인덱스를 연다)"""
+        from mmap_index import export_mmap_index, mmap_index_path
+        return export_mmap_index(
+            self.vectorstore, mmap_index_path(self.persist_directory),
+            source_signature=get_collection_signature(self.persist_directory),
+        )
 
     def get_document_by_name(self, filename: str) -> Optional[Dict]:
         """파일명으로 문서 메타데이터 검색"""
-        for meta in self.list_documents():
-            if meta.get('source', '').endswith(filename):
-                return meta
-        return None
+        source = self.index.find_by_name(filename)
+        if source is None:
+            return None
+        return self._document_info(source, self.index.get(source))
 
 # 사용 예시 (직접 실행 시)
 if __name__ == "__main__":
     db = LegalDocDBManager()
-    db.sync_documents()
-    print(db.list_documents()) 
\ No newline at end of file
+    print(db.sync_documents())
+    print(db.list_documents())
+    if VECTOR_BACKEND == "mmap":
+        print(db.export_mmap_index())
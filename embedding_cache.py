@@ -0,0 +1,226 @@
+# embedding_cache.py
+"""
+임베딩 디스크 캐시 및 배치/동시성 제어 래퍼
+"""
+
+import hashlib
+import logging
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from langchain_core.embeddings import Embeddings
+from config import EMBEDDING_CACHE_PATH
+from tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """openai.RateLimitError 또는 HTTP 429 응답을 담은 예외인지 확인"""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class EmbeddingDiskCache:
+    """(namespace, 텍스트 해시) → float32 벡터를 저장하는 SQLite 캐시"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " namespace TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (namespace, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, namespace: str, hashes: List[str], chunk_size: int = 500) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(hashes), chunk_size):
+                part = hashes[i:i + chunk_size]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE namespace = ? AND text_hash IN ({placeholders})",
+                    [namespace, *part],
+                )
+                for h, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[h] = vector.tolist()
+        return found
+
+    def put_many(self, namespace: str, items: List[Tuple[str, List[float]]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (namespace, text_hash, vector) VALUES (?, ?, ?)",
+                [(namespace, h, array("f", vector).tobytes()) for h, vector in items],
+            )
+            self._conn.commit()
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        with self._lock:
+            if namespace is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    임의의 LangChain Embeddings 앞단에 두는 캐시 래퍼
+    - 텍스트 해시로 중복 제거 후 디스크 캐시에서 조회
+    - 캐시 미스만 batch_size/max_batch_chars 크기 배치로 나누어 최대 max_concurrency개 동시 요청
+    - 429(RateLimit) 응답은 지수 백오프로 재시도 (문서/질의 임베딩 공통)
+    - 사용자 질의 벡터는 디스크에 저장하지 않고 최근 query_cache_size개만 메모리 LRU에 보관
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        namespace: str = "default",
+        cache: Optional[EmbeddingDiskCache] = None,
+        batch_size: int = 64,
+        max_batch_chars: int = 64_000,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        query_cache_size: int = 1024,
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.cache = cache if cache is not None else EmbeddingDiskCache()
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "texts_embedded": 0, "cache_hits": 0, "cache_misses": 0}
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _make_batches(self, items: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        batches, current, chars = [], [], 0
+        for h, text in items:
+            if current and (len(current) >= self.batch_size or chars + len(text) > self.max_batch_chars):
+                batches.append(current)
+                current, chars = [], 0
+            current.append((h, text))
+            chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _with_retry(self, fn: Callable[[], T]) -> T:
+        """임베딩 API 호출 1회를 요청 수로 집계하고, 429면 Retry-After 또는 지수 백오프 후 재시도"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count("requests")
+                return fn()
+            except Exception as e:
+                if not _is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = _retry_after_seconds(e)
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * (0.5 + random.random() / 2)
+                self._count("retries")
+                logger.warning(f"임베딩 요청 제한(429), {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def _embed_batch(self, batch: List[Tuple[str, str]]) -> List[List[float]]:
+        texts = [text for _, text in batch]
+        vectors = self._with_retry(lambda: self.embeddings.embed_documents(texts))
+        self._count("texts_embedded", len(texts))
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        vectors = self.cache.get_many(self.namespace, list(unique))
+        misses = [(h, text) for h, text in unique.items() if h not in vectors]
+        self._count("cache_hits", len(unique) - len(misses))
+        self._count("cache_misses", len(misses))
+
+        if misses:
+            batches = self._make_batches(misses)
+            workers = max(1, min(self.max_concurrency, len(batches)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for batch, batch_vectors in zip(batches, executor.map(self._embed_batch, batches)):
+                    items = [(h, vector) for (h, _), vector in zip(batch, batch_vectors)]
+                    self.cache.put_many(self.namespace, items)
+                    vectors.update(items)
+
+        return [vectors[h] for h in hashes]
+
+    def _get_query_vector(self, h: str) -> Optional[List[float]]:
+        with self._stats_lock:
+            vector = self._query_cache.get(h)
+            if vector is not None:
+                self._query_cache.move_to_end(h)
+            return vector
+
+    def _put_query_vector(self, h: str, vector: List[float]) -> None:
+        with self._stats_lock:
+            self._query_cache[h] = vector
+            self._query_cache.move_to_end(h)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        질의 임베딩 (메모리 LRU → 디스크 캐시의 문서 벡터 → API 순으로 조회)
+        질의 텍스트는 무한히 다양하므로 디스크 캐시에는 기록하지 않는다.
+        """
+        start = time.perf_counter()
+        h = text_hash(text)
+        vector = self._get_query_vector(h)
+        if vector is None:
+            vector = self.cache.get_many(self.namespace, [h]).get(h)
+            if vector is not None:
+                self._put_query_vector(h, vector)
+        if vector is not None:
+            self._count("cache_hits")
+            record_span("embed_query", "embedding", (time.perf_counter() - start) * 1000, cache_hit=True)
+            return vector
+        self._count("cache_misses")
+        vector = self._with_retry(lambda: self.embeddings.embed_query(text))
+        self._put_query_vector(h, vector)
+        record_span("embed_query", "embedding", (time.perf_counter() - start) * 1000, cache_hit=False)
+        return vector
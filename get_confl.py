@@ -1,21 +1,65 @@
 import requests
 import json
+import threading
 import time
 import os
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 import logging
+from confluence_jsonl import write_page_records
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 목록 조회 시 expand 필드 (트리 구조만 필요하면 body.storage 생략)
+CHILD_EXPAND_WITH_BODY = 'body.storage,version'
+CHILD_EXPAND_WITHOUT_BODY = 'version'
+SPACE_EXPAND_WITH_BODY = 'body.storage,version,children.page'
+SPACE_EXPAND_WITHOUT_BODY = 'version,children.page'
+# 단건 조회 expand (기본은 하위 페이지/첨부 목록 포함, 스트리밍 크롤링의 루트는 목록 조회와 같은 필드만)
+PAGE_EXPAND = 'body.storage,children.page,children.attachment,version'
+# 스트리밍 크롤링에서 하위 목록 한 번에 받을 페이지 수 (메모리에는 최대 max_workers × 이 값의 본문만 남음)
+STREAM_CHILD_PAGE_SIZE = 25
+
+class TokenBucket:
+    """초당 rate개씩 토큰을 채우는 스레드 안전 토큰 버킷 (capacity개까지 버스트 허용)"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """토큰 하나를 얻을 때까지 대기"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
 class ConfluenceCrawler:
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_requests_per_second: float = 5,
+        pool_size: int = 10,
+        page_size: int = 100
+    ):
         load_dotenv()
         
         # Confluence API 설정 (환경변수에서 가져오기)
-        self.base_url = os.getenv('CONFLUENCE_BASE_URL', 'https://confluence.tde.sktelecom.com')
+        self.base_url = base_url or os.getenv('CONFLUENCE_BASE_URL', 'https://confluence.tde.sktelecom.com')
         self.api_url = f"{self.base_url}/rest/api"
         
         # 세션 쿠키 설정 (FIDO 인증 후 브라우저에서 복사)
@@ -24,13 +68,23 @@ class ConfluenceCrawler:
         self.conf_sessionid = os.getenv('CONF_SESSIONID', 'your_conf_sessionid_here')
         self.jsessionid = os.getenv('JSESSIONID', 'your_jsessionid_here')
         
-        # 요청 제한 설정 (초당 5회 제한)
+        # 요청 제한 설정 (초당 5회 제한, 토큰 버킷으로 요청 간격을 균등하게 유지)
+        self.max_requests_per_second = max_requests_per_second
+        self.rate_limiter = TokenBucket(max_requests_per_second)
         self.request_count = 0
-        self.last_request_time = 0
-        self.max_requests_per_second = 5
+        self._count_lock = threading.Lock()
         
-        # 세션 설정 (세션 쿠키 사용)
+        # 마지막 스트리밍 크롤링에서 목록/본문 조회가 실패한 페이지 ID (save_to_jsonl의 완료 여부 판단)
+        self.failed_page_ids: List[str] = []
+        
+        # 목록 API 한 번에 받을 항목 수 (Confluence 서버 설정에 따라 상한이 더 작을 수 있음)
+        self.page_size = page_size
+        
+        # 세션 설정 (세션 쿠키 사용, 동시 크롤링을 위해 커넥션 풀 확장)
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.session.headers.update({
             'Content-Type': 'application/json',
             'Accept': 'application/json',
@@ -46,22 +100,10 @@ class ConfluenceCrawler:
         logger.info("세션 쿠키가 설정되었습니다.")
     
     def _rate_limit(self):
-        """요청 제한을 위한 대기 로직"""
-        current_time = time.time()
-        
-        # 1초가 지났으면 카운터 리셋
-        if current_time - self.last_request_time >= 1:
-            self.request_count = 0
-            self.last_request_time = current_time
-        
-        # 2번 요청 후 1초 대기
-        if self.request_count >= 2:
-            logger.info("Rate limit reached. Waiting 1 second...")
-            time.sleep(1)
-            self.request_count = 0
-            self.last_request_time = time.time()
-        
-        self.request_count += 1
+        """요청 제한을 위한 대기 로직 (초당 max_requests_per_second회)"""
+        self.rate_limiter.acquire()
+        with self._count_lock:
+            self.request_count += 1
     
     def _make_request(self, url: str, params: Optional[Dict] = None) -> Dict:
         """API 요청을 수행하는 메서드"""
@@ -77,79 +119,140 @@ class ConfluenceCrawler:
             logger.error(f"응답 내용: {response.text if 'response' in locals() else 'N/A'}")
             raise
     
-    def get_page_info(self, page_id: str) -> Dict:
+    def get_page_info(self, page_id: str, expand: str = PAGE_EXPAND) -> Dict:
         """특정 페이지의 정보를 가져오는 메서드"""
         url = f"{self.api_url}/content/{page_id}"
         params = {
-            'expand': 'body.storage,children.page,children.attachment,version'
+            'expand': expand
         }
         
         logger.info(f"페이지 정보 가져오기: {page_id}")
         return self._make_request(url, params)
     
-    def get_child_pages(self, page_id: str) -> List[Dict]:
-        """특정 페이지의 하위 페이지들을 가져오는 메서드"""
+    def _get_results_page(
+        self, url: str, params: Optional[Dict]
+    ) -> Tuple[List[Dict], Optional[Tuple[str, Optional[Dict]]]]:
+        """
+        페이지네이션된 목록 API의 한 페이지를 받아 (결과, 다음 페이지 요청 (url, params) 또는 None) 반환
+        응답의 _links.next를 따르며, _links가 없는 응답이면 start/limit으로 다음 페이지를 만든다.
+        """
+        response = self._make_request(url, params)
+        results = response.get('results', [])
+        links = response.get('_links')
+        if links is not None:
+            if not links.get('next'):
+                return results, None
+            # next는 컨텍스트 경로 기준 상대 경로 (쿼리에 start/limit/expand 포함)
+            return results, (f"{links.get('base', self.base_url)}{links['next']}", None)
+        if params is not None and results and len(results) >= params['limit']:
+            return results, (url, {**params, 'start': params['start'] + len(results)})
+        return results, None
+    
+    def _iter_results(self, url: str, params: Dict) -> Iterator[Dict]:
+        """페이지네이션된 목록 API의 결과를 한 페이지씩 받아 항목 단위로 반환하는 제너레이터"""
+        next_page = (url, dict(params))
+        while next_page is not None:
+            results, next_page = self._get_results_page(*next_page)
+            yield from results
+    
+    def iter_child_pages(
+        self,
+        page_id: str,
+        page_size: Optional[int] = None,
+        include_body: bool = True
+    ) -> Iterator[Dict]:
+        """특정 페이지의 하위 페이지들을 페이지 단위로 받아오며 하나씩 반환 (include_body=False면 본문 제외)"""
+        logger.info(f"하위 페이지 가져오기: {page_id}")
+        return self._iter_results(*self._child_pages_request(page_id, page_size, include_body))
+    
+    def _child_pages_request(
+        self, page_id: str, page_size: Optional[int] = None, include_body: bool = True
+    ) -> Tuple[str, Dict]:
+        """하위 페이지 목록 첫 페이지의 (url, params)"""
         url = f"{self.api_url}/content/{page_id}/child/page"
         params = {
-            'limit': 100,
-            'expand': 'body.storage,version'
+            'start': 0,
+            'limit': page_size or self.page_size,
+            'expand': CHILD_EXPAND_WITH_BODY if include_body else CHILD_EXPAND_WITHOUT_BODY
         }
-        
-        logger.info(f"하위 페이지 가져오기: {page_id}")
-        return self._make_request(url, params)
+        return url, params
     
-    def get_space_pages(self, space_key: str) -> List[Dict]:
-        """특정 스페이스의 모든 페이지를 가져오는 메서드"""
+    def iter_space_pages(
+        self,
+        space_key: str,
+        page_size: Optional[int] = None,
+        include_body: bool = True
+    ) -> Iterator[Dict]:
+        """특정 스페이스의 모든 페이지를 페이지 단위로 받아오며 하나씩 반환 (include_body=False면 본문 제외)"""
         url = f"{self.api_url}/content"
         params = {
             'spaceKey': space_key,
             'type': 'page',
-            'limit': 100,
-            'expand': 'body.storage,version,children.page'
+            'start': 0,
+            'limit': page_size or self.page_size,
+            'expand': SPACE_EXPAND_WITH_BODY if include_body else SPACE_EXPAND_WITHOUT_BODY
         }
         
         logger.info(f"스페이스 페이지 가져오기: {space_key}")
-        return self._make_request(url, params)
+        return self._iter_results(url, params)
+    
+    def get_child_pages(self, page_id: str, include_body: bool = True) -> Dict:
+        """특정 페이지의 하위 페이지 전체를 {'results': [...]} 형태로 반환 (iter_child_pages 참고)"""
+        results = list(self.iter_child_pages(page_id, include_body=include_body))
+        return {'results': results, 'size': len(results)}
+    
+    def get_space_pages(self, space_key: str, include_body: bool = True) -> Dict:
+        """특정 스페이스의 모든 페이지를 {'results': [...]} 형태로 반환 (iter_space_pages 참고)"""
+        results = list(self.iter_space_pages(space_key, include_body=include_body))
+        return {'results': results, 'size': len(results)}
+    
+    def _build_page_record(self, page_info: Dict) -> Dict:
+        """API 응답(페이지 단건 또는 하위 페이지 목록 항목)을 저장용 페이지 레코드로 변환"""
+        record = {
+            'id': page_info['id'],
+            'title': page_info['title'],
+            'type': page_info['type'],
+            'status': page_info['status'],
+            'version': {
+                'number': page_info['version']['number'],
+                'message': page_info['version'].get('message', ''),
+                'minorEdit': page_info['version'].get('minorEdit', False)
+            },
+            'created': page_info.get('created', ''),
+            'lastModified': page_info.get('lastModified', ''),
+            'url': f"{self.base_url}{page_info['_links']['webui']}"
+        }
+        # 본문 없이 목록만 받은 경우(include_body=False)에는 body 필드 생략
+        if 'body' in page_info:
+            record['body'] = {
+                'storage': {
+                    'value': page_info['body']['storage']['value'],
+                    'representation': page_info['body']['storage']['representation']
+                }
+            }
+        return record
     
-    def crawl_page_hierarchy(self, page_id: str) -> Dict:
-        """페이지와 그 하위 페이지들을 재귀적으로 크롤링하는 메서드"""
+    def crawl_page_hierarchy(self, page_id: str, page_info: Optional[Dict] = None, include_body: bool = True) -> Dict:
+        """
+        페이지와 그 하위 페이지들을 재귀적으로 크롤링하는 메서드
+        page_info가 주어지면(하위 페이지 목록에서 이미 본문을 받은 경우) 페이지를 다시 요청하지 않는다.
+        include_body=False면 하위 페이지 본문 없이 트리 구조만 수집한다.
+        """
         try:
             # 현재 페이지 정보 가져오기
-            page_info = self.get_page_info(page_id)
+            if page_info is None:
+                page_info = self.get_page_info(page_id)
             
-            # 하위 페이지들 가져오기
-            children_response = self.get_child_pages(page_id)
-            children = children_response.get('results', [])
-            
-            # 하위 페이지들을 재귀적으로 크롤링
+            # 하위 페이지들을 페이지네이션하며 받아 재귀적으로 크롤링 (목록 응답의 body.storage 재사용)
             child_pages = []
-            for child in children:
+            for child in self.iter_child_pages(page_id, include_body=include_body):
                 child_id = child['id']
-                child_hierarchy = self.crawl_page_hierarchy(child_id)
+                child_hierarchy = self.crawl_page_hierarchy(child_id, page_info=child, include_body=include_body)
                 child_pages.append(child_hierarchy)
             
             # 결과 구성
-            result = {
-                'id': page_info['id'],
-                'title': page_info['title'],
-                'type': page_info['type'],
-                'status': page_info['status'],
-                'version': {
-                    'number': page_info['version']['number'],
-                    'message': page_info['version'].get('message', ''),
-                    'minorEdit': page_info['version'].get('minorEdit', False)
-                },
-                'body': {
-                    'storage': {
-                        'value': page_info['body']['storage']['value'],
-                        'representation': page_info['body']['storage']['representation']
-                    }
-                },
-                'children': child_pages,
-                'created': page_info.get('created', ''),
-                'lastModified': page_info.get('lastModified', ''),
-                'url': f"{self.base_url}{page_info['_links']['webui']}"
-            }
+            result = self._build_page_record(page_info)
+            result['children'] = child_pages
             
             return result
             
@@ -161,8 +264,246 @@ class ConfluenceCrawler:
                 'children': []
             }
     
-    def crawl_from_url(self, url: str) -> Dict:
-        """URL에서 페이지 ID를 추출하고 크롤링을 시작하는 메서드"""
+    def _load_crawl_checkpoint(self, checkpoint_path: str):
+        """체크포인트(JSONL)에서 이미 받은 페이지 레코드와 하위 목록 조회가 끝난 페이지 복원"""
+        records, parents, children_of = {}, {}, {}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 중단 시 마지막 줄이 잘렸을 수 있음
+                        continue
+                    if event['event'] == 'page':
+                        records[event['record']['id']] = event['record']
+                        parents[event['record']['id']] = event.get('parent_id')
+                    elif event['event'] == 'expanded':
+                        children_of[event['id']] = event['children']
+            logger.info(f"체크포인트에서 페이지 {len(records)}개, 탐색 완료 {len(children_of)}개를 복원했습니다.")
+        return records, parents, children_of
+    
+    def crawl_page_hierarchy_concurrent(
+        self,
+        page_id: str,
+        max_workers: int = 4,
+        checkpoint_path: Optional[str] = None,
+        include_body: bool = True
+    ) -> Dict:
+        """
+        페이지 트리를 스레드 풀로 동시에 탐색하는 크롤링 모드 (crawl_page_hierarchy와 같은 구조 반환)
+        - 모든 요청은 공용 토큰 버킷을 거치므로 워커 수와 관계없이 초당 요청 수 제한을 지킨다.
+        - 하위 페이지 목록 응답에 포함된 본문을 그대로 사용해 페이지당 한 번만 요청한다.
+        - checkpoint_path가 주어지면 받은 페이지와 탐색 완료 페이지를 JSONL로 기록하고,
+          다시 실행하면 탐색이 끝나지 않은 페이지부터 이어서 크롤링한다.
+        """
+        records, parents, children_of = self._load_crawl_checkpoint(checkpoint_path)
+        checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+        
+        def log_event(event: Dict):
+            if checkpoint is not None:
+                checkpoint.write(json.dumps(event, ensure_ascii=False) + '\n')
+                checkpoint.flush()
+        
+        def list_children(parent_id: str) -> List[Dict]:
+            return list(self.iter_child_pages(parent_id, include_body=include_body))
+        
+        try:
+            if page_id not in records:
+                records[page_id] = self._build_page_record(self.get_page_info(page_id))
+                parents[page_id] = None
+                log_event({'event': 'page', 'parent_id': None, 'record': records[page_id]})
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                in_flight = {
+                    executor.submit(list_children, pid): pid
+                    for pid in records if pid not in children_of
+                }
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        parent_id = in_flight.pop(future)
+                        try:
+                            children = future.result()
+                        except Exception as e:
+                            logger.error(f"하위 페이지 조회 실패 (ID: {parent_id}): {e}")
+                            records[parent_id].setdefault('error', str(e))
+                            continue
+                        child_ids = []
+                        for child in children:
+                            child_ids.append(child['id'])
+                            if child['id'] in records:
+                                continue
+                            records[child['id']] = self._build_page_record(child)
+                            parents[child['id']] = parent_id
+                            log_event({'event': 'page', 'parent_id': parent_id, 'record': records[child['id']]})
+                            in_flight[executor.submit(list_children, child['id'])] = child['id']
+                        children_of[parent_id] = child_ids
+                        log_event({'event': 'expanded', 'id': parent_id, 'children': child_ids})
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        
+        def build_tree(pid: str) -> Dict:
+            node = dict(records[pid])
+            node['children'] = [build_tree(cid) for cid in children_of.get(pid, []) if cid in records]
+            return node
+        
+        logger.info(f"동시 크롤링 완료: 페이지 {len(records)}개, API 요청 {self.request_count}회")
+        return build_tree(page_id)
+    
+    def iter_page_hierarchy(
+        self,
+        page_id: str,
+        max_workers: int = 1,
+        include_body: bool = True,
+        page_size: int = STREAM_CHILD_PAGE_SIZE
+    ) -> Iterator[Dict]:
+        """
+        페이지 트리를 탐색하면서 받은 페이지를 parent_id/depth가 붙은 평면 레코드로 바로 반환하는 제너레이터
+        하위 목록은 본문을 포함해 page_size개씩 받아 그대로 내보내므로 페이지마다 추가 요청이 없고,
+        메모리에는 방문한 페이지 ID/깊이와 조회 중인 목록 페이지(최대 max_workers × page_size개)만 남는다.
+        max_workers > 1이면 하위 목록을 스레드 풀로 동시에 조회한다 (요청 제한은 공용 토큰 버킷).
+        """
+        self.failed_page_ids = []
+        expand = CHILD_EXPAND_WITH_BODY if include_body else CHILD_EXPAND_WITHOUT_BODY
+        root = self._build_page_record(self.get_page_info(page_id, expand=expand))
+        root.update({'parent_id': None, 'depth': 0})
+        yield root
+        depth_of = {page_id: 0}
+        
+        # 대기 큐에는 (부모 ID, 다음 목록 페이지 요청)만 두고, 동시에 조회 중인 목록 페이지는
+        # max_workers개로 제한해 소비자가 느려도 본문이 쌓이지 않게 한다.
+        pending = deque([(page_id, self._child_pages_request(page_id, page_size, include_body))])
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+            while pending or in_flight:
+                while pending and len(in_flight) < max_workers:
+                    parent_id, request = pending.popleft()
+                    in_flight[executor.submit(self._get_results_page, *request)] = parent_id
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    parent_id = in_flight.pop(future)
+                    try:
+                        children, next_request = future.result()
+                    except Exception as e:
+                        logger.error(f"하위 페이지 조회 실패 (ID: {parent_id}): {e}")
+                        self.failed_page_ids.append(parent_id)
+                        continue
+                    if next_request is not None:
+                        pending.append((parent_id, next_request))
+                    for child in children:
+                        if child['id'] in depth_of:
+                            continue
+                        depth_of[child['id']] = depth_of[parent_id] + 1
+                        pending.append((child['id'], self._child_pages_request(child['id'], page_size, include_body)))
+                        record = self._build_page_record(child)
+                        record.update({'parent_id': parent_id, 'depth': depth_of[child['id']]})
+                        yield record
+        logger.info(f"스트리밍 크롤링 완료: 페이지 {len(depth_of)}개, API 요청 {self.request_count}회")
+    
+    def iter_page_versions(self, page_id: str, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        CQL 검색으로 page_id와 모든 하위 페이지의 메타데이터(버전, 조상)만 페이지 단위로 조회
+        본문을 받지 않으므로 트리 전체를 적은 요청과 바이트로 훑을 수 있다.
+        """
+        url = f"{self.api_url}/content/search"
+        params = {
+            'cql': f'ancestor = {page_id} or id = {page_id}',
+            'start': 0,
+            'limit': page_size or self.page_size,
+            'expand': 'version,ancestors'
+        }
+        
+        logger.info(f"페이지 버전 목록 가져오기: {page_id}")
+        return self._iter_results(url, params)
+    
+    def iter_pages_by_id(self, page_ids: List[str], batch_size: Optional[int] = None) -> Iterator[Dict]:
+        """여러 페이지를 CQL 'id in (...)' 검색으로 묶어 본문과 함께 조회"""
+        batch_size = batch_size or self.page_size
+        for i in range(0, len(page_ids), batch_size):
+            batch = page_ids[i:i + batch_size]
+            url = f"{self.api_url}/content/search"
+            params = {
+                'cql': f"id in ({','.join(batch)})",
+                'start': 0,
+                'limit': len(batch),
+                'expand': 'body.storage,version,ancestors'
+            }
+            yield from self._iter_results(url, params)
+    
+    def _load_manifest(self, manifest_path: str) -> Dict[str, Dict]:
+        """증분 크롤링 매니페스트(페이지 ID → 버전/부모/제목) 로드"""
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+    
+    def _save_manifest(self, manifest: Dict[str, Dict], manifest_path: str):
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+    
+    def crawl_incremental(self, page_id: str, manifest_path: str) -> Dict:
+        """
+        매니페스트의 version.number와 비교하여 바뀐 페이지만 본문을 받아오는 증분 크롤링
+        1. CQL로 트리 전체의 버전/조상 정보만 조회 (본문 제외)
+        2. 새 페이지 또는 버전이 바뀐 페이지만 id 묶음으로 본문 조회
+        3. 목록에서 사라진 페이지는 삭제로 처리
+        반환: {'changed': [parent_id가 포함된 페이지 레코드], 'deleted': [페이지 ID], 'unchanged': 개수}
+        매니페스트는 모든 조회가 성공한 뒤에만 갱신된다.
+        """
+        manifest = self._load_manifest(manifest_path)
+        current: Dict[str, Dict] = {}
+        for page in self.iter_page_versions(page_id):
+            ancestors = page.get('ancestors') or []
+            parent_id = ancestors[-1]['id'] if ancestors and page['id'] != page_id else None
+            current[page['id']] = {
+                'version': page['version']['number'],
+                'parent_id': parent_id,
+                'title': page['title']
+            }
+        
+        changed_ids = [
+            pid for pid, meta in current.items()
+            if manifest.get(pid, {}).get('version') != meta['version']
+        ]
+        deleted_ids = [pid for pid in manifest if pid not in current]
+        
+        changed = []
+        for page in self.iter_pages_by_id(changed_ids):
+            record = self._build_page_record(page)
+            record['parent_id'] = current.get(page['id'], {}).get('parent_id')
+            changed.append(record)
+            # 목록 조회와 본문 조회 사이에 다시 수정된 경우 실제 받은 버전을 기록
+            if page['id'] in current:
+                current[page['id']]['version'] = record['version']['number']
+        
+        self._save_manifest(current, manifest_path)
+        logger.info(
+            f"증분 크롤링 완료: 변경 {len(changed)}개, 삭제 {len(deleted_ids)}개, "
+            f"변경 없음 {len(current) - len(changed_ids)}개, API 요청 {self.request_count}회"
+        )
+        return {
+            'changed': changed,
+            'deleted': deleted_ids,
+            'unchanged': len(current) - len(changed_ids)
+        }
+    
+    def crawl_from_url(
+        self,
+        url: str,
+        max_workers: int = 1,
+        checkpoint_path: Optional[str] = None,
+        include_body: bool = True
+    ) -> Dict:
+        """
+        URL에서 페이지 ID를 추출하고 크롤링을 시작하는 메서드
+        max_workers > 1 이거나 checkpoint_path가 있으면 동시/재개 가능 모드로 크롤링
+        """
         # URL에서 페이지 ID 추출
         # 예: https://confluence.tde.sktelecom.com/spaces/SSPVTWO/pages/223745736
         try:
@@ -170,7 +511,11 @@ class ConfluenceCrawler:
             logger.info(f"URL에서 페이지 ID 추출: {page_id}")
             
             # 페이지 계층 구조 크롤링
-            result = self.crawl_page_hierarchy(page_id)
+            if max_workers > 1 or checkpoint_path:
+                return self.crawl_page_hierarchy_concurrent(
+                    page_id, max_workers=max_workers, checkpoint_path=checkpoint_path, include_body=include_body
+                )
+            result = self.crawl_page_hierarchy(page_id, include_body=include_body)
             return result
             
         except Exception as e:
@@ -186,37 +531,82 @@ class ConfluenceCrawler:
         except Exception as e:
             logger.error(f"파일 저장 실패: {e}")
             raise
+    
+    def save_to_jsonl(self, records: Iterable[Dict], filename: str = 'confluence_data.jsonl') -> int:
+        """
+        페이지 레코드를 받는 대로 JSONL 파일에 한 줄씩 저장 (.gz로 끝나면 gzip 압축)
+        저장한 페이지 수를 반환하며, 계층은 confluence_jsonl.PageTree로 다시 읽을 수 있다.
+        조회가 실패한 페이지가 있으면 종료 레코드에 미완료(complete=false)로 기록한다.
+        """
+        try:
+            count = write_page_records(records, filename, is_complete=lambda: not self.failed_page_ids)
+            logger.info(f"페이지 {count}개가 {filename}에 저장되었습니다.")
+            return count
+        except Exception as e:
+            logger.error(f"파일 저장 실패: {e}")
+            raise
 
 def main():
     """메인 실행 함수"""
-    # Confluence 크롤러 초기화
-    crawler = ConfluenceCrawler()
+    # Confluence 크롤러 초기화 (목록 API 페이지 크기는 서버 상한에 맞춰 조정)
+    crawler = ConfluenceCrawler(page_size=int(os.getenv('CONFLUENCE_PAGE_SIZE', '100')))
     
     # 대상 URL (환경변수에서 가져오기)
     target_url = os.getenv('CONFLUENCE_TARGET_URL', 'https://confluence.tde.sktelecom.com/spaces/SSPVTWO/pages/223745736')
+    # 동시 크롤링 워커 수 및 중단 후 재개용 체크포인트 파일
+    max_workers = int(os.getenv('CONFLUENCE_CRAWL_WORKERS', '4'))
+    checkpoint_path = os.getenv('CONFLUENCE_CHECKPOINT', 'confluence_crawl.checkpoint.jsonl')
+    # 증분 크롤링 모드 (바뀐 페이지만 confluence_delta.json에 저장)
+    incremental = os.getenv('CONFLUENCE_INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+    manifest_path = os.getenv('CONFLUENCE_MANIFEST', 'confluence_manifest.json')
+    # 출력 파일 (.jsonl 또는 .jsonl.gz면 페이지당 한 줄 스트리밍 저장)
+    output_path = os.getenv('CONFLUENCE_OUTPUT', 'confluence_data.json')
     
     try:
         logger.info("Confluence 크롤링 시작...")
         logger.info(f"대상 URL: {target_url}")
         
+        if incremental:
+            delta = crawler.crawl_incremental(target_url.split('/')[-1], manifest_path)
+            crawler.save_to_json(delta, 'confluence_delta.json')
+            logger.info("증분 크롤링 완료!")
+            return
+        
+        # 출력 경로가 .jsonl(.gz)이면 트리 전체를 메모리에 두지 않고 페이지마다 바로 기록
+        if output_path.endswith(('.jsonl', '.jsonl.gz')):
+            records = crawler.iter_page_hierarchy(target_url.split('/')[-1], max_workers=max_workers)
+            total_pages = crawler.save_to_jsonl(records, output_path)
+            logger.info(f"크롤링 완료! 총 {total_pages}개의 페이지가 크롤링되었습니다.")
+            if crawler.failed_page_ids:
+                logger.warning(f"{len(crawler.failed_page_ids)}개 페이지의 조회가 실패하여 미완료 결과로 기록했습니다.")
+            return
+        
         # URL에서 크롤링 시작
-        result = crawler.crawl_from_url(target_url)
+        result = crawler.crawl_from_url(target_url, max_workers=max_workers, checkpoint_path=checkpoint_path)
         
         # 결과를 JSON 파일로 저장
-        crawler.save_to_json(result, 'confluence_data.json')
+        crawler.save_to_json(result, output_path)
         
         logger.info("크롤링 완료!")
         
         # 간단한 통계 출력
-        def count_pages(data):
-            count = 1  # 현재 페이지
+        def count_pages(data, key=None):
+            count = 1 if key is None or key in data else 0  # 현재 페이지
             for child in data.get('children', []):
-                count += count_pages(child)
+                count += count_pages(child, key)
             return count
         
         total_pages = count_pages(result)
+        error_pages = count_pages(result, 'error')
         logger.info(f"총 {total_pages}개의 페이지가 크롤링되었습니다.")
         
+        # 모든 페이지가 성공한 경우에만 체크포인트 삭제 (다음 실행은 처음부터)
+        # 실패한 페이지가 있으면 남겨 두어 다음 실행이 실패한 하위 목록부터 이어서 조회하게 한다.
+        if error_pages:
+            logger.warning(f"{error_pages}개 페이지의 조회가 실패하여 체크포인트를 유지합니다: {checkpoint_path}")
+        elif checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        
     except Exception as e:
         logger.error(f"크롤링 중 오류 발생: {e}")
 
@@ -0,0 +1,266 @@
+# hybrid_search.py
+"""
+한국어 법률 문서용 BM25 어휘 인덱스 및 dense 검색과의 RRF(Reciprocal Rank Fusion) 하이브리드 리트리버
+dense 후보는 벡터스토어의 원시 거리를 코사인 유사도로 바꿔 임계값을 적용한다.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+LEXICAL_INDEX_FILENAME = "lexical_index.json"
+
+# "제17조", "제17조의2" 같은 조문 번호는 하나의 토큰으로 유지
+_ARTICLE_PATTERN = re.compile(r"제\s*(\d+)\s*조(?:\s*의\s*(\d+))?")
+_TOKEN_PATTERN = re.compile(r"[가-힣]+|[a-z]+|\d+")
+
+
+def tokenize_korean(text: str) -> List[str]:
+    """
+    한국어 법률 텍스트 토크나이저
+    한글 어절은 문자 bigram으로, 영문/숫자는 그대로, 조문 번호는 정규화된 단일 토큰으로 만든다.
+    """
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens = []
+    for match in _ARTICLE_PATTERN.finditer(text):
+        tokens.append(f"제{match.group(1)}조" + (f"의{match.group(2)}" if match.group(2) else ""))
+    for word in _TOKEN_PATTERN.findall(_ARTICLE_PATTERN.sub(" ", text)):
+        if len(word) > 1 and "가" <= word[0] <= "힣":
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    청크 ID 단위의 BM25 역색인
+    문서별 term frequency를 함께 보관하여 증분 추가/삭제가 가능하다.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self.doc_terms:
+                    self._remove_one(doc_id)
+                terms = Counter(tokenize_korean(text))
+                length = sum(terms.values())
+                self.doc_terms[doc_id] = dict(terms)
+                self.doc_lengths[doc_id] = length
+                self.total_length += length
+                for term, tf in terms.items():
+                    self.postings[term][doc_id] = tf
+
+    def _remove_one(self, doc_id: str) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                self._remove_one(doc_id)
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """BM25 점수 상위 k개의 (청크 ID, 점수) 반환"""
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if n_docs == 0:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = defaultdict(float)
+            for term, query_tf in Counter(tokenize_korean(query)).items():
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += query_tf * idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            data = {"k1": self.k1, "b": self.b, "doc_terms": self.doc_terms}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        index = cls(path)
+        if not os.path.exists(path):
+            return index
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index.k1, index.b = data.get("k1", index.k1), data.get("b", index.b)
+        for doc_id, terms in data["doc_terms"].items():
+            length = sum(terms.values())
+            index.doc_terms[doc_id] = terms
+            index.doc_lengths[doc_id] = length
+            index.total_length += length
+            for term, tf in terms.items():
+                index.postings[term][doc_id] = tf
+        return index
+
+
+def lexical_index_path(persist_directory: str) -> str:
+    return os.path.join(persist_directory, LEXICAL_INDEX_FILENAME)
+
+
+def build_lexical_index(vectorstore, persist_directory: str, page_size: int = 1000) -> LexicalIndex:
+    """기존 Chroma 컬렉션의 모든 청크로 어휘 인덱스를 새로 만들고 저장"""
+    index = LexicalIndex(lexical_index_path(persist_directory))
+    offset = 0
+    while True:
+        page = vectorstore.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        index.add(page["ids"], page["documents"])
+        offset += len(page["ids"])
+    index.save()
+    return index
+
+
+_LEXICAL_INDEXES: Dict[str, Tuple[Optional[int], LexicalIndex]] = {}
+_LEXICAL_INDEXES_LOCK = threading.Lock()
+
+
+def get_lexical_index(persist_directory: str) -> LexicalIndex:
+    """디렉터리별 어휘 인덱스를 한 번만 로드해 공유하고, 파일이 바뀌면 다시 로드"""
+    path = lexical_index_path(persist_directory)
+    mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    with _LEXICAL_INDEXES_LOCK:
+        cached = _LEXICAL_INDEXES.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _LEXICAL_INDEXES[path] = (mtime, LexicalIndex.load(path))
+        return cached[1]
+
+
+def mark_lexical_index_saved(index: LexicalIndex) -> None:
+    """이 프로세스에서 저장한 인덱스는 다시 읽지 않도록 캐시의 mtime만 갱신"""
+    with _LEXICAL_INDEXES_LOCK:
+        if index.path and os.path.exists(index.path):
+            _LEXICAL_INDEXES[index.path] = (os.stat(index.path).st_mtime_ns, index)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None
+) -> List[Tuple[str, float]]:
+    """여러 순위 리스트를 RRF 점수(sum w / (k + rank))로 합쳐 내림차순 반환"""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def distance_to_cosine(distance: float) -> float:
+    """
+    Chroma 기본 l2 공간과 mmap 인덱스가 반환하는 제곱 거리(단위 벡터면 2−2cos)를 코사인 유사도로 변환
+    LangChain relevance 변환(1 − d/√2)은 [0, 1]을 벗어나 매 질의마다 청크 본문이 담긴 경고를 출력하므로 쓰지 않는다.
+    """
+    return 1.0 - distance / 2.0
+
+
+def dense_search(vectorstore, query: str, k: int, min_similarity: Optional[float] = None) -> List[Document]:
+    """similarity_search_with_score 상위 k개 중 코사인 유사도가 min_similarity 이상인 문서 (relevance_score에 기록)"""
+    docs = []
+    for doc, distance in vectorstore.similarity_search_with_score(query, k=k):
+        similarity = distance_to_cosine(distance)
+        if min_similarity is None or similarity >= min_similarity:
+            doc.metadata["relevance_score"] = similarity
+            docs.append(doc)
+    return docs
+
+
+class DenseRetriever(BaseRetriever):
+    """코사인 유사도 임계값을 적용하는 dense 전용 리트리버 (어휘 인덱스가 없거나 RETRIEVAL_MODE=dense일 때)"""
+
+    vectorstore: Any
+    top_k: int = 5
+    score_threshold: Optional[float] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return dense_search(self.vectorstore, query, self.top_k, self.score_threshold)
+
+
+class HybridRetriever(BaseRetriever):
+    """dense(Chroma) 검색과 BM25 어휘 검색 결과를 RRF로 결합하는 리트리버"""
+
+    vectorstore: Any
+    lexical_index: Any
+    top_k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    dense_weight: float = 1.0
+    lexical_weight: float = 1.0
+    # dense 후보는 코사인 유사도(distance_to_cosine)가 score_threshold 미만이면 제외,
+    # 어휘 후보는 BM25 점수가 1위 점수의 lexical_min_ratio 미만이면 제외 (질의 bigram 한두 개만 겹치는 잡음)
+    score_threshold: Optional[float] = None
+    lexical_min_ratio: float = 0.0
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense_docs = dense_search(self.vectorstore, query, self.fetch_k, self.score_threshold)
+        docs_by_id = {doc.id: doc for doc in dense_docs if doc.id}
+        dense_ids = [doc.id for doc in dense_docs if doc.id]
+        lexical_hits = self.lexical_index.search(query, k=self.fetch_k)
+        min_lexical = lexical_hits[0][1] * self.lexical_min_ratio if lexical_hits else 0.0
+        lexical_ids = [doc_id for doc_id, score in lexical_hits if score >= min_lexical]
+
+        fused = reciprocal_rank_fusion(
+            [dense_ids, lexical_ids], k=self.rrf_k, weights=[self.dense_weight, self.lexical_weight]
+        )[:self.top_k]
+
+        missing = [doc_id for doc_id, _ in fused if doc_id not in docs_by_id]
+        if missing:
+            fetched = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                docs_by_id[doc_id] = Document(id=doc_id, page_content=text, metadata=metadata or {})
+
+        results = []
+        for doc_id, score in fused:
+            doc = docs_by_id.get(doc_id)
+            if doc is not None:
+                doc.metadata["rrf_score"] = score
+                results.append(doc)
+        return results
@@ -0,0 +1,196 @@
+# legal_chunker.py
+"""
+한국 법령 PDF용 구조 인식 청커 (조 단위 청크, 큰 조문만 항/크기 기준으로 분할)
+"""
+
+import os
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# langchain_text_splitters는 import 비용이 커서 크기 기준 분할이 필요할 때만 import 한다.
+
+# 줄 시작의 "제17조(목적)", "제17조의2(정의)", "제5조 삭제" 형태 조문 제목
+# (줄바꿈으로 줄 맨 앞에 온 "제15조제1항에 따라" 같은 본문 인용은 제외)
+ARTICLE_HEADING = re.compile(
+    r"^[ \t]*(제[ \t]*(\d+)[ \t]*조(?:[ \t]*의[ \t]*(\d+))?)[ \t]*(?:\(([^)\n]{0,60})\)|(?=삭제))",
+    re.MULTILINE,
+)
+CHAPTER_HEADING = re.compile(r"^[ \t]*제[ \t]*\d+[ \t]*장[ \t]+(\S[^\n]{0,40})", re.MULTILINE)
+# 항 번호 ①~⑳ (항 단위 분할 기준)
+PARAGRAPH_MARK = re.compile(r"(?=[①-⑳])")
+LAW_NAME_LINE = re.compile(r"^\s*(\S.{0,40}?(?:법|법률|시행령|시행규칙|규칙|규정|령))\s*$", re.MULTILINE)
+
+
+def _join_pages(pages: List[Document]) -> Tuple[str, List[int], List]:
+    """페이지 텍스트를 이어 붙이고 각 페이지의 시작 오프셋과 페이지 번호 목록 반환"""
+    parts, offsets, page_numbers, cursor = [], [], [], 0
+    for page in pages:
+        offsets.append(cursor)
+        page_numbers.append(page.metadata.get("page", 0))
+        parts.append(page.page_content)
+        cursor += len(page.page_content) + 1
+    return "\n".join(parts), offsets, page_numbers
+
+
+def detect_law_name(text: str, source: str = "") -> str:
+    match = LAW_NAME_LINE.search(text[:500])
+    if match:
+        return match.group(1).strip()
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def _split_oversized(text: str, heading: str, max_chars: int, overlap: int) -> List[str]:
+    """조문이 max_chars를 넘으면 항(①②...) 경계에서 묶고, 그래도 크면 크기 기준으로 분할"""
+    parts, current = [], ""
+    for paragraph in (p for p in PARAGRAPH_MARK.split(text) if p.strip()):
+        if current and len(current) + len(paragraph) > max_chars:
+            parts.append(current)
+            current = ""
+        current += paragraph
+    if current:
+        parts.append(current)
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=max_chars, chunk_overlap=overlap)
+    pieces = []
+    for part in parts:
+        pieces.extend(splitter.split_text(part) if len(part) > max_chars else [part])
+    # 두 번째 조각부터는 조문 제목을 앞에 붙여 검색 시 맥락 유지
+    return [pieces[0]] + [f"{heading}\n{piece}" for piece in pieces[1:]] if pieces else []
+
+
+def _merge_articles(group: List[Tuple[str, Dict]]) -> Document:
+    """
+    같은 장의 연속된 짧은 조문들을 하나의 청크로 합침 (조문 경계는 그대로 유지)
+    article_nos에 포함된 모든 조문 번호를 남겨 두 번째 이후 조문으로도 필터/인용할 수 있게 한다.
+    """
+    text = "\n".join(body for body, _ in group)
+    metadata = dict(group[0][1])
+    last = group[-1][1]
+    metadata["page_end"] = last["page_end"]
+    article_nos = [m["article_no"] for _, m in group if m.get("article_no")]
+    if article_nos:
+        metadata["article_nos"] = article_nos
+    if len(group) > 1 and last.get("article_no"):
+        metadata["article_no_end"] = last["article_no"]
+    return Document(page_content=text, metadata=metadata)
+
+
+def chunk_statute_pages(
+    pages: List[Document],
+    max_chars: int = 1500,
+    overlap: int = 100,
+    pack_chars: int = 1000
+) -> List[Document]:
+    """
+    한 법령 파일의 페이지들을 조 단위 청크로 변환
+    - 같은 장 안에서 연속된 짧은 조문은 pack_chars 이내로 묶는다 (조문을 중간에서 자르지 않음, 0이면 조문마다 한 청크)
+    - max_chars를 넘는 조문만 항/크기 기준으로 나눈다.
+    모든 조문 청크는 포함된 조문 번호 목록(article_nos)을 메타데이터로 가진다.
+    조문 제목을 찾지 못하면 일반 크기 기준 분할로 대체한다.
+    """
+    if not pages:
+        return []
+    text, offsets, page_numbers = _join_pages(pages)
+    base_metadata = {k: v for k, v in pages[0].metadata.items() if k != "page"}
+    headings = list(ARTICLE_HEADING.finditer(text))
+    if not headings:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(chunk_size=max_chars, chunk_overlap=overlap)
+        return splitter.split_documents(pages)
+
+    source = base_metadata.get("source", "")
+    law_name = detect_law_name(text, source)
+    chapters = [(m.start(), m.group(1).strip()) for m in CHAPTER_HEADING.finditer(text)]
+    chapter_starts = [start for start, _ in chapters]
+
+    def page_at(offset: int):
+        return page_numbers[max(0, bisect_right(offsets, offset) - 1)]
+
+    sections = []
+    # 법령명/목차만 있는 짧은 머리말은 별도 청크로 만들지 않음
+    if len(text[:headings[0].start()].strip()) >= 200:
+        sections.append((0, headings[0].start(), None))
+    for i, match in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        sections.append((match.start(), end, match))
+
+    chunks: List[Document] = []
+    group: List[Tuple[str, Dict]] = []
+    group_chars = 0
+
+    def flush():
+        nonlocal group, group_chars
+        if group:
+            chunks.append(_merge_articles(group))
+        group, group_chars = [], 0
+
+    for start, end, match in sections:
+        body = text[start:end].strip()
+        if not body:
+            continue
+        metadata = dict(base_metadata)
+        metadata.update({
+            "law_name": law_name,
+            "page": page_at(start),
+            "page_start": page_at(start),
+            "page_end": page_at(max(start, end - 1)),
+        })
+        if match is None:
+            metadata["article_no"] = ""
+            heading = law_name
+        else:
+            metadata["article_no"] = re.sub(r"\s+", "", match.group(1))
+            metadata["article_nos"] = [metadata["article_no"]]
+            metadata["article_title"] = (match.group(4) or "").strip()
+            heading = f"{law_name} {metadata['article_no']}" + (f"({metadata['article_title']})" if metadata["article_title"] else "")
+        chapter_index = bisect_right(chapter_starts, start) - 1
+        if chapter_index >= 0:
+            metadata["chapter"] = chapters[chapter_index][1]
+
+        if len(body) <= max_chars:
+            same_chapter = not group or group[-1][1].get("chapter") == metadata.get("chapter")
+            if not same_chapter or group_chars + len(body) > pack_chars:
+                flush()
+            group.append((body, metadata))
+            group_chars += len(body) + 1
+            continue
+
+        flush()
+        pieces = _split_oversized(body, heading, max_chars, overlap)
+        for part_no, piece in enumerate(pieces):
+            chunk_metadata = dict(metadata)
+            chunk_metadata["part"] = part_no
+            chunks.append(Document(page_content=piece, metadata=chunk_metadata))
+    flush()
+    return chunks
+
+
+def chunk_statute_documents(
+    docs: List[Document],
+    max_chars: int = 1500,
+    overlap: int = 100,
+    pack_chars: int = 1000
+) -> List[Document]:
+    """source별로 페이지를 묶어 조 단위로 청킹"""
+    by_source: Dict[str, List[Document]] = OrderedDict()
+    for doc in docs:
+        by_source.setdefault(doc.metadata.get("source", ""), []).append(doc)
+    chunks = []
+    for pages in by_source.values():
+        chunks.extend(chunk_statute_pages(pages, max_chars=max_chars, overlap=overlap, pack_chars=pack_chars))
+    return chunks
+
+
+def format_article_label(metadata: Dict, default: Optional[str] = None) -> str:
+    """'개인정보 보호법 제17조(개인정보의 제공)' 또는 '근로기준법 제3조~제5조' 형태의 표시용 라벨"""
+    if not metadata.get("article_no"):
+        return default or metadata.get("law_name", "")
+    if metadata.get("article_no_end"):
+        return f"{metadata.get('law_name', '')} {metadata['article_no']}~{metadata['article_no_end']}"
+    title = metadata.get("article_title")
+    return f"{metadata.get('law_name', '')} {metadata['article_no']}" + (f"({title})" if title else "")
@@ -0,0 +1,400 @@
+# mmap_index.py
+"""
+읽기 전용 memory-mapped 벡터 인덱스 (기존 Chroma 컬렉션에서 export)
+- embeddings-<세대>.npy: 단위 벡터로 정규화한 float32 (N, D) 행렬
+- texts-<세대>.bin / offsets-<세대>.npy: 청크 본문(UTF-8)을 이어 붙인 바이트와 경계 오프셋
+- metadata-<세대>.json: 청크 ID와 메타데이터 키별 열(column), 반복 값이 많은 열은 사전(dictionary) 인코딩
+- manifest.json: 현재 세대의 파일 목록/개수/차원/임베딩 모델 (마지막에 원자적으로 교체)
+행렬과 본문은 np.load(mmap_mode="r")로 열기 때문에 여러 Streamlit/API 워커 프로세스가
+OS 페이지 캐시에 올라간 한 벌을 공유하며, Chroma 클라이언트를 프로세스마다 띄우지 않는다.
+검색은 질의 배치 × 행렬 곱(코사인 유사도) + argpartition으로 정확한 top-k를 구하고,
+점수는 Chroma 기본(l2 공간)과 같은 제곱 거리 2−2cos로 반환해 같은 코사인 임계값(RETRIEVAL_SCORE_THRESHOLD)을 쓴다.
+
+사용법: python mmap_index.py [chroma_persist_dir] [output_dir]
+"""
+
+import glob
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from config import AZURE_OPENAI_EMBEDDING_MODEL, CHROMA_PERSIST_DIR, MMAP_INDEX_DIRNAME
+
+MANIFEST_FILENAME = "manifest.json"
+FORMAT_VERSION = 1
+_GENERATION_FILES = ("embeddings-*.npy", "texts-*.bin", "offsets-*.npy", "metadata-*.json")
+
+
+def mmap_index_path(persist_directory: str = CHROMA_PERSIST_DIR) -> str:
+    return os.path.join(persist_directory, MMAP_INDEX_DIRNAME)
+
+
+def manifest_signature(index_dir: str) -> Optional[Tuple[int, int]]:
+    """manifest.json의 (mtime_ns, size) 시그니처 (export 전이면 None)"""
+    try:
+        stat = os.stat(os.path.join(index_dir, MANIFEST_FILENAME))
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# 메타데이터 열 인코딩 (1과 True처럼 같은 해시를 갖는 값이 섞이지 않도록 타입까지 키로 사용)
+
+def _value_key(value: Any) -> Tuple[str, Any]:
+    # 리스트 값(예: article_nos)은 해시 가능한 튜플로 비교
+    return (type(value).__name__, tuple(value) if isinstance(value, list) else value)
+
+
+def _encode_column(values: Sequence[Any]) -> Dict:
+    present = [value for value in values if value is not None]
+    codes_by_value: Dict[Tuple[str, Any], int] = {}
+    dictionary: List[Any] = []
+    for value in present:
+        key = _value_key(value)
+        if key not in codes_by_value:
+            codes_by_value[key] = len(dictionary)
+            dictionary.append(value)
+    if len(dictionary) * 2 > len(values):
+        return {"values": list(values)}
+    return {
+        "dictionary": dictionary,
+        "codes": [-1 if value is None else codes_by_value[_value_key(value)] for value in values],
+    }
+
+
+class _Column:
+    """사전 인코딩 열은 코드 배열(int32)로, 그 외는 값 목록으로 보관"""
+
+    def __init__(self, encoded: Dict):
+        if "codes" in encoded:
+            self.dictionary = encoded["dictionary"]
+            self.codes = np.asarray(encoded["codes"], dtype=np.int32)
+            self.values = None
+        else:
+            self.dictionary = None
+            self.codes = None
+            self.values = encoded["values"]
+
+    def get(self, row: int) -> Any:
+        if self.values is not None:
+            return self.values[row]
+        code = self.codes[row]
+        return None if code < 0 else self.dictionary[code]
+
+    def equals(self, target: Any) -> np.ndarray:
+        """값이 target과 같은 행의 불리언 마스크"""
+        if self.values is not None:
+            return np.fromiter(
+                (value is not None and type(value) is type(target) and value == target for value in self.values),
+                dtype=bool, count=len(self.values),
+            )
+        for code, value in enumerate(self.dictionary):
+            if type(value) is type(target) and value == target:
+                return self.codes == code
+        return np.zeros(len(self.codes), dtype=bool)
+
+
+def export_mmap_index(
+    vectorstore,
+    output_dir: str,
+    embedding_model: str = AZURE_OPENAI_EMBEDDING_MODEL,
+    page_size: int = 1000,
+    source_signature: Optional[Tuple[int, int]] = None
+) -> Dict:
+    """
+    Chroma 컬렉션 전체를 새 세대 파일로 내보내고 manifest.json을 교체한 뒤 이전 세대 파일을 삭제
+    이미 이전 세대를 mmap으로 연 프로세스는 다음 재로딩 전까지 기존 매핑으로 계속 검색한다. (POSIX)
+    반환: manifest 내용
+    """
+    ids = vectorstore.get(include=[])["ids"]
+    if not ids:
+        raise ValueError("빈 컬렉션은 export할 수 없습니다.")
+    os.makedirs(output_dir, exist_ok=True)
+    generation = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    files = {
+        "embeddings": f"embeddings-{generation}.npy",
+        "texts": f"texts-{generation}.bin",
+        "offsets": f"offsets-{generation}.npy",
+        "metadata": f"metadata-{generation}.json",
+    }
+
+    embeddings = None
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    metadatas: List[Dict] = []
+    with open(os.path.join(output_dir, files["texts"]), "wb") as texts:
+        for start in range(0, len(ids), page_size):
+            page_ids = ids[start:start + page_size]
+            page = vectorstore.get(ids=page_ids, include=["embeddings", "documents", "metadatas"])
+            rows = {doc_id: i for i, doc_id in enumerate(page["ids"])}
+            if len(rows) != len(page_ids):
+                raise RuntimeError("export 중 컬렉션이 변경되었습니다. 다시 실행하세요.")
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    os.path.join(output_dir, files["embeddings"]), mode="w+", dtype=np.float32,
+                    shape=(len(ids), vectors.shape[1]),
+                )
+            # Chroma는 요청한 ID 순서를 보장하지 않으므로 ids 순서로 다시 배치
+            order = [rows[doc_id] for doc_id in page_ids]
+            embeddings[start:start + len(page_ids)] = _normalize_rows(vectors[order])
+            for offset, i in enumerate(order, start=start):
+                data = (page["documents"][i] or "").encode("utf-8")
+                texts.write(data)
+                offsets[offset + 1] = offsets[offset] + len(data)
+                metadatas.append(page["metadatas"][i] or {})
+    embeddings.flush()
+    dim = embeddings.shape[1]
+    del embeddings
+    np.save(os.path.join(output_dir, files["offsets"]), offsets)
+
+    keys = sorted({key for metadata in metadatas for key in metadata})
+    with open(os.path.join(output_dir, files["metadata"]), "w", encoding="utf-8") as f:
+        json.dump(
+            {"ids": ids, "columns": {key: _encode_column([m.get(key) for m in metadatas]) for key in keys}},
+            f, ensure_ascii=False, separators=(",", ":"),
+        )
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "generation": generation,
+        "count": len(ids),
+        "dim": dim,
+        "embedding_model": embedding_model,
+        "metric": "cosine",
+        "source_signature": list(source_signature) if source_signature else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": files,
+    }
+    tmp_path = os.path.join(output_dir, MANIFEST_FILENAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_FILENAME))
+
+    current = set(files.values())
+    for pattern in _GENERATION_FILES:
+        for path in glob.glob(os.path.join(output_dir, pattern)):
+            if os.path.basename(path) not in current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Windows 등에서 다른 프로세스가 매핑 중이면 다음 export 때 정리
+    return manifest
+
+
+class MmapVectorIndex:
+    """export된 인덱스의 읽기 전용 뷰 (행렬/본문은 mmap, ID/메타데이터 열은 프로세스 메모리)"""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, MANIFEST_FILENAME), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 인덱스 형식입니다: {self.manifest.get('format_version')}")
+        files = self.manifest["files"]
+        self.index_dir = index_dir
+        self.embeddings = np.load(os.path.join(index_dir, files["embeddings"]), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, files["offsets"]), mmap_mode="r")
+        self.texts = np.memmap(os.path.join(index_dir, files["texts"]), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        with open(os.path.join(index_dir, files["metadata"]), encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.ids: List[str] = sidecar["ids"]
+        self.columns = {key: _Column(encoded) for key, encoded in sidecar["columns"].items()}
+        self.rows_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def text(self, row: int) -> str:
+        return self.texts[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        metadata = {}
+        for key, column in self.columns.items():
+            value = column.get(row)
+            if value is not None:
+                metadata[key] = value
+        return metadata
+
+    def document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.text(row), metadata=self.metadata(row))
+
+    def filter_mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """{"key": 값, ...} 동등 조건(AND)의 행 마스크 (Chroma의 $ 연산자는 지원하지 않음)"""
+        if not where:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, target in where.items():
+            if key.startswith("$") or isinstance(target, dict):
+                raise ValueError(f"mmap 인덱스는 동등 조건 필터만 지원합니다: {key}")
+            column = self.columns.get(key)
+            mask &= column.equals(target) if column is not None else False
+        return mask
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        block_rows: int = 65536
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        질의 배치 (B, D)에 대한 코사인 유사도 top-k: (B, k) 행 번호와 유사도 (내림차순)
+        행렬을 block_rows 단위로 나눠 곱하므로 임시 메모리는 B × block_rows로 묶인다.
+        mask로 제외된 행은 유사도 -inf로 반환된다. (후보가 k개보다 적을 때)
+        """
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"질의 차원({queries.shape[1]})이 인덱스 차원({self.dim})과 다릅니다.")
+        n = len(self.ids)
+        k = min(k, n)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, n, block_rows):
+            scores = queries @ self.embeddings[start:start + block_rows].T
+            if mask is not None:
+                scores[:, ~mask[start:start + block_rows]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class MmapVectorStore(VectorStore):
+    """
+    MmapVectorIndex를 LangChain VectorStore로 감싼 읽기 전용 백엔드 (rag_utils.get_retriever/HybridRetriever에 그대로 사용)
+    HybridRetriever/build_lexical_index가 쓰는 Chroma식 get(ids=..., include=...)도 지원한다.
+    """
+
+    def __init__(self, index: MmapVectorIndex, embedding_function: Embeddings):
+        self.index = index
+        self._embedding_function = embedding_function
+
+    @classmethod
+    def load(cls, index_dir: str, embedding_function: Embeddings) -> "MmapVectorStore":
+        return cls(MmapVectorIndex(index_dir), embedding_function)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def _select_relevance_score_fn(self):
+        # 제곱 거리 2−2cos를 Chroma(l2)와 같은 방식(1 − d/√2)으로 relevance 변환
+        return self._euclidean_relevance_score_fn
+
+    def _results(self, rows: np.ndarray, scores: np.ndarray) -> List[Tuple[Document, float]]:
+        return [
+            (self.index.document(int(row)), max(0.0, 2.0 - 2.0 * float(score)))
+            for row, score in zip(rows, scores)
+            if np.isfinite(score)
+        ]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        if not len(self.index):
+            return []
+        rows, scores = self.index.search(np.asarray([embedding]), k, mask=self.index.filter_mask(filter))
+        return self._results(rows[0], scores[0])
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def batch_similarity_search_with_score(
+        self, queries: Sequence[str], k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """여러 질의를 한 번의 임베딩 호출과 행렬 곱으로 검색 (오프라인 평가/일괄 검색용)"""
+        if not queries or not len(self.index):
+            return [[] for _ in queries]
+        vectors = np.asarray(self._embedding_function.embed_documents(list(queries)), dtype=np.float32)
+        rows, scores = self.index.search(vectors, k, mask=self.index.filter_mask(filter))
+        return [self._results(r, s) for r, s in zip(rows, scores)]
+
+    def get(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, Any]:
+        """Chroma Collection.get 호환 조회 (없는 ID는 결과에서 빠진다)"""
+        if ids is not None:
+            rows = [self.index.rows_by_id[doc_id] for doc_id in ids if doc_id in self.index.rows_by_id]
+        else:
+            rows = list(range(len(self.index)))
+        mask = self.index.filter_mask(where)
+        if mask is not None:
+            rows = [row for row in rows if mask[row]]
+        rows = rows[offset:offset + limit if limit is not None else None]
+        result: Dict[str, Any] = {"ids": [self.index.ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [self.index.text(row) for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.index.metadata(row) for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.index.embeddings[rows])
+        return result
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return [self.index.document(self.index.rows_by_id[doc_id]) for doc_id in ids if doc_id in self.index.rows_by_id]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("mmap 인덱스는 읽기 전용입니다. Chroma에 추가한 뒤 다시 export하세요.")
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        raise NotImplementedError("mmap 인덱스는 읽기 전용입니다. Chroma에 추가한 뒤 다시 export하세요.")
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        raise NotImplementedError("mmap 인덱스는 읽기 전용입니다. Chroma에서 삭제한 뒤 다시 export하세요.")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        raise NotImplementedError("export_mmap_index로 기존 Chroma 컬렉션에서 생성하세요.")
+
+
+if __name__ == "__main__":
+    from rag_utils import get_collection_signature, get_pooled_vectorstore
+
+    persist_directory = sys.argv[1] if len(sys.argv) > 1 else CHROMA_PERSIST_DIR
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else mmap_index_path(persist_directory)
+    manifest = export_mmap_index(
+        get_pooled_vectorstore(persist_directory), output_dir,
+        source_signature=get_collection_signature(persist_directory),
+    )
+    print({key: manifest[key] for key in ("generation", "count", "dim", "embedding_model")})
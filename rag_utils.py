@@ -1,68 +1,252 @@
+import hashlib
+import logging
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
 from glob import glob
-from typing import List, Literal
-from config import LEGAL_DOCS_DIR, CHROMA_PERSIST_DIR, AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_EMBEDDING_MODEL
+from typing import Dict, Iterator, List, Literal, Optional, Tuple
+from config import LEGAL_DOCS_DIR, CHROMA_PERSIST_DIR, AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_EMBEDDING_MODEL, RETRIEVAL_MODE, CHUNK_STRATEGY, STATUTE_PACK_CHARS, RETRIEVAL_LEXICAL_MIN_RATIO, RETRIEVAL_SCORE_THRESHOLD, VECTOR_BACKEND
 
-from langchain_community.document_loaders import PyPDFLoader, PyMuPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_chroma import Chroma
+import httpx
+
+# langchain_community 로더, langchain_openai, langchain_chroma는 import 비용이 커서 (합계 1초 이상)
+# 실제로 쓰는 함수 안에서 import 한다. (db_manager/크롤러/앱 시작 시 필요한 것만 로드)
+from embedding_cache import CachedEmbeddings, EmbeddingDiskCache
+from legal_chunker import chunk_statute_documents
+from hybrid_search import (
+    DenseRetriever,
+    HybridRetriever,
+    LexicalIndex,
+    get_lexical_index,
+    lexical_index_path,
+    mark_lexical_index_saved,
+)
+
+logger = logging.getLogger(__name__)
 
 # PDF 파일 로딩 함수
 
+def load_pdf_file(
+    file: str,
+    loader_type: Literal["pypdf", "pymupdf"] = "pypdf"
+) -> List:
+    if loader_type == "pypdf":
+        from langchain_community.document_loaders import PyPDFLoader
+        loader = PyPDFLoader(file)
+    else:
+        from langchain_community.document_loaders import PyMuPDFLoader
+        loader = PyMuPDFLoader(file)
+    return loader.load()
+
+def _parse_pdf_worker(file: str, loader_type: str) -> Tuple[str, List, float]:
+    """프로세스 풀 워커: PDF 한 개를 파싱하고 소요 시간을 함께 반환"""
+    start = time.perf_counter()
+    docs = load_pdf_file(file, loader_type)
+    return file, docs, time.perf_counter() - start
+
+def parse_pdf_files(
+    files: List[str],
+    loader_type: Literal["pypdf", "pymupdf"] = "pypdf",
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, List, float]]:
+    """
+    PDF 파일들을 병렬로 파싱하여 완료되는 순서대로 (file, pages, parse_seconds) 반환
+    동시에 진행 중인 파일 수를 워커 수의 2배로 제한해 메모리 사용량을 묶어 둔다.
+    """
+    if max_workers is None:
+        max_workers = min(len(files), os.cpu_count() or 1)
+    if max_workers <= 1:
+        for file in files:
+            yield _parse_pdf_worker(file, loader_type)
+        return
+
+    pending_files = iter(files)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        for file in pending_files:
+            in_flight.add(executor.submit(_parse_pdf_worker, file, loader_type))
+            if len(in_flight) >= max_workers * 2:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                next_file = next(pending_files, None)
+                if next_file is not None:
+                    in_flight.add(executor.submit(_parse_pdf_worker, next_file, loader_type))
+
 def load_pdf_documents(
     folder: str = LEGAL_DOCS_DIR,
-    loader_type: Literal["pypdf", "pymupdf"] = "pypdf"
+    loader_type: Literal["pypdf", "pymupdf"] = "pypdf",
+    max_workers: Optional[int] = 1
 ) -> List:
     """
     지정 폴더 내 모든 PDF 파일을 로딩하여 LangChain Document 리스트로 반환
     loader_type: 'pypdf' 또는 'pymupdf'
+    max_workers: 파싱 프로세스 수 (None이면 CPU 수, 1이면 현재 프로세스에서 순차 처리)
     """
-    pdf_files = glob(os.path.join(folder, "*.pdf"))
+    pdf_files = sorted(glob(os.path.join(folder, "*.pdf")))
     docs = []
-    for file in pdf_files:
-        if loader_type == "pypdf":
-            loader = PyPDFLoader(file)
-        else:
-            loader = PyMuPDFLoader(file)
-        docs.extend(loader.load())
+    for _, pages, _ in parse_pdf_files(pdf_files, loader_type, max_workers):
+        docs.extend(pages)
     return docs
 
+# 증분 수집용 콘텐츠 해시 (변경 여부는 db_manager.SourceIndex에 기록)
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+@dataclass
+class IngestStats:
+    """파일별 파싱 시간과 전체 처리량 (pages/sec)"""
+    files: Dict[str, Dict] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    total_pages: int = 0
+    total_chunks: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.total_pages / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"파싱 {len(self.files)}개 / 스킵 {len(self.skipped)}개, "
+            f"{self.total_pages}페이지 → {self.total_chunks}청크, "
+            f"{self.elapsed_seconds:.2f}s ({self.pages_per_second:.1f} pages/sec)"
+        )
+
+    def record_file(self, file: str, pages: int, chunks: int, parse_seconds: float, started_at: float) -> None:
+        self.files[file] = {"pages": pages, "chunks": chunks, "parse_seconds": parse_seconds}
+        self.total_pages += pages
+        self.total_chunks += chunks
+        self.elapsed_seconds = time.perf_counter() - started_at
+
+def iter_pdf_chunks(
+    folder: str = LEGAL_DOCS_DIR,
+    loader_type: Literal["pypdf", "pymupdf"] = "pypdf",
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    strategy: Literal["statute", "recursive"] = CHUNK_STRATEGY,
+    max_workers: Optional[int] = None,
+    stats: Optional[IngestStats] = None
+) -> Iterator:
+    """
+    폴더 내 PDF를 프로세스 풀에서 파싱하고 청크를 파일 단위로 스트리밍 반환
+    변경분만 벡터스토어에 반영하려면 ingest_pdf_folder(LegalDocDBManager.sync_documents)를 사용한다.
+    """
+    stats = stats if stats is not None else IngestStats()
+    start = time.perf_counter()
+    files = sorted(glob(os.path.join(folder, "*.pdf")))
+    for file, pages, parse_seconds in parse_pdf_files(files, loader_type, max_workers):
+        chunks = chunk_documents(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap, strategy=strategy)
+        stats.record_file(file, len(pages), len(chunks), parse_seconds, start)
+        yield from chunks
+    stats.elapsed_seconds = time.perf_counter() - start
+
 # 텍스트 청킹 함수
 
 def chunk_documents(
     docs: List,
     chunk_size: int = 1000,
-    chunk_overlap: int = 200
+    chunk_overlap: int = 200,
+    strategy: Literal["statute", "recursive"] = CHUNK_STRATEGY
 ) -> List:
+    """
+    strategy='statute': 조(條) 경계 기준 청크 (짧은 조문은 STATUTE_PACK_CHARS 이내로 묶고,
+                        큰 조문만 항/크기 기준으로 분할)
+    strategy='recursive': 크기 기준 분할 (chunk_size/chunk_overlap)
+    """
+    if strategy == "statute":
+        return chunk_statute_documents(docs, pack_chars=STATUTE_PACK_CHARS)
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
     return splitter.split_documents(docs)
 
+# 공유 HTTP 클라이언트 (임베딩 호출 간 커넥션 풀 재사용)
+
+_HTTP_CLIENT: Optional[httpx.Client] = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+def get_shared_http_client() -> httpx.Client:
+    """프로세스 전역에서 재사용하는 keep-alive HTTP 클라이언트 반환"""
+    global _HTTP_CLIENT
+    with _HTTP_CLIENT_LOCK:
+        if _HTTP_CLIENT is None:
+            _HTTP_CLIENT = httpx.Client(
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+        return _HTTP_CLIENT
+
 # 임베딩 객체 생성 함수
 
-def get_azure_embeddings():
+def get_azure_embeddings(model: str = AZURE_OPENAI_EMBEDDING_MODEL):
+    from langchain_openai import AzureOpenAIEmbeddings
     return AzureOpenAIEmbeddings(
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
         api_key=AZURE_OPENAI_API_KEY,
-        model=AZURE_OPENAI_EMBEDDING_MODEL,
+        model=model,
+        http_client=get_shared_http_client(),
+    )
+
+# 디스크 캐시 임베딩 생성 함수 (동일 텍스트는 다시 임베딩하지 않음)
+
+_EMBEDDING_CACHE: Optional[EmbeddingDiskCache] = None
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingDiskCache:
+    global _EMBEDDING_CACHE
+    with _EMBEDDING_CACHE_LOCK:
+        if _EMBEDDING_CACHE is None:
+            _EMBEDDING_CACHE = EmbeddingDiskCache()
+        return _EMBEDDING_CACHE
+
+def get_cached_embeddings(model: str = AZURE_OPENAI_EMBEDDING_MODEL) -> CachedEmbeddings:
+    return CachedEmbeddings(
+        get_azure_embeddings(model),
+        namespace=model or "default",
+        cache=get_embedding_cache(),
     )
 
+# 벡터스토어 영속화 (langchain_chroma는 자동 저장되어 persist()가 없을 수 있음)
+
+def persist_vectorstore(vectorstore) -> None:
+    if hasattr(vectorstore, "persist"):
+        vectorstore.persist()
+
 # ChromaDB 벡터스토어 생성 및 저장 함수
 
 def build_chroma_vectorstore(
     chunks: List,
     persist_directory: str = CHROMA_PERSIST_DIR
 ):
-    embeddings = get_azure_embeddings()
+    from langchain_chroma import Chroma
+    embeddings = get_cached_embeddings()
+    ids = [str(uuid.uuid4()) for _ in chunks]
     vectorstore = Chroma.from_documents(
         documents=chunks,
         embedding=embeddings,
+        ids=ids,
         persist_directory=persist_directory
     )
-    vectorstore.persist()
+    persist_vectorstore(vectorstore)
+
+    # 같은 청크로 BM25 어휘 인덱스도 함께 구축
+    lexical_index = LexicalIndex(lexical_index_path(persist_directory))
+    lexical_index.add(ids, [chunk.page_content for chunk in chunks])
+    lexical_index.save()
+    mark_lexical_index_saved(lexical_index)
     return vectorstore
 
 # ChromaDB 벡터스토어 로드 함수
@@ -70,7 +254,8 @@ def build_chroma_vectorstore(
 def load_chroma_vectorstore(
     persist_directory: str = CHROMA_PERSIST_DIR
 ):
-    embeddings = get_azure_embeddings()
+    from langchain_chroma import Chroma
+    embeddings = get_cached_embeddings()
     return Chroma(
         embedding_function=embeddings,
         persist_directory=persist_directory
@@ -81,8 +266,209 @@ def load_chroma_vectorstore(
 def get_retriever(
     vectorstore,
     top_k: int = 5,
-    score_threshold: float = 0.7
+    score_threshold: float = RETRIEVAL_SCORE_THRESHOLD
+):
+    # score_threshold는 코사인 유사도 하한 (원시 거리에서 변환, LangChain relevance 점수는 쓰지 않음)
+    return DenseRetriever(vectorstore=vectorstore, top_k=top_k, score_threshold=score_threshold)
+
+# 벡터스토어 풀 (프로세스 전역 공유)
+
+def get_collection_signature(persist_directory: str = CHROMA_PERSIST_DIR) -> Optional[Tuple[int, int]]:
+    """디스크 상 Chroma 컬렉션의 변경 여부를 판단하기 위한 (mtime_ns, size) 시그니처"""
+    try:
+        stat = os.stat(os.path.join(persist_directory, "chroma.sqlite3"))
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class VectorStorePool:
+    """
+    (persist_directory, 임베딩 모델, 백엔드) 단위로 벡터스토어를 한 번만 생성해 재사용하는 스레드 안전 레지스트리
+    backend="chroma"는 Chroma 컬렉션(읽기/쓰기), backend="mmap"은 export된 읽기 전용 mmap 인덱스(검색 전용)
+    디스크 상 컬렉션(또는 mmap manifest)이 바뀌면 다음 조회 시 자동으로 다시 연다.
+    """
+
+    def __init__(self, embeddings_factory=get_cached_embeddings, reload_check_interval: float = 1.0):
+        self.embeddings_factory = embeddings_factory
+        self.reload_check_interval = reload_check_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str, str], Dict] = {}
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0, "init_seconds_total": 0.0, "init_seconds_last": 0.0}
+
+    @staticmethod
+    def _signature(persist_directory: str, backend: str) -> Optional[Tuple[int, int]]:
+        if backend == "mmap":
+            from mmap_index import manifest_signature, mmap_index_path
+            return manifest_signature(mmap_index_path(persist_directory))
+        return get_collection_signature(persist_directory)
+
+    def _open_chroma(self, persist_directory: str, embedding_model: str):
+        from langchain_chroma import Chroma
+        return Chroma(
+            embedding_function=self.embeddings_factory(embedding_model),
+            persist_directory=persist_directory
+        )
+
+    def _open_mmap(self, persist_directory: str, embedding_model: str):
+        from mmap_index import MmapVectorStore, mmap_index_path
+        vectorstore = MmapVectorStore.load(mmap_index_path(persist_directory), self.embeddings_factory(embedding_model))
+        exported_model = vectorstore.index.manifest.get("embedding_model")
+        if exported_model and embedding_model and exported_model != embedding_model:
+            logger.warning(f"mmap 인덱스 임베딩 모델({exported_model})이 설정({embedding_model})과 다릅니다.")
+        return vectorstore
+
+    def _open(self, persist_directory: str, embedding_model: str, backend: str = "chroma") -> Dict:
+        signature = self._signature(persist_directory, backend)
+        if backend == "mmap" and signature is None:
+            # export 전에는 Chroma로 검색하고, manifest가 생기면 시그니처가 바뀌어 mmap으로 다시 연다
+            logger.warning(f"mmap 인덱스가 없어 Chroma로 검색합니다: {persist_directory} (python mmap_index.py로 export)")
+            backend = "chroma"
+        start = time.perf_counter()
+        if backend == "mmap":
+            vectorstore = self._open_mmap(persist_directory, embedding_model)
+        else:
+            vectorstore = self._open_chroma(persist_directory, embedding_model)
+        elapsed = time.perf_counter() - start
+        self._stats["init_seconds_total"] += elapsed
+        self._stats["init_seconds_last"] = elapsed
+        return {
+            "vectorstore": vectorstore,
+            "signature": signature,
+            "checked_at": time.monotonic(),
+        }
+
+    def get(
+        self,
+        persist_directory: str = CHROMA_PERSIST_DIR,
+        embedding_model: str = AZURE_OPENAI_EMBEDDING_MODEL,
+        backend: str = "chroma"
+    ):
+        """풀에서 벡터스토어를 가져오고, 없거나 디스크가 바뀌었으면 새로 연다"""
+        key = (os.path.abspath(persist_directory), embedding_model, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                entry = self._entries[key] = self._open(persist_directory, embedding_model, backend)
+                return entry["vectorstore"]
+
+            now = time.monotonic()
+            if now - entry["checked_at"] >= self.reload_check_interval:
+                entry["checked_at"] = now
+                if self._signature(persist_directory, backend) != entry["signature"]:
+                    self._stats["reloads"] += 1
+                    entry = self._entries[key] = self._open(persist_directory, embedding_model, backend)
+                    return entry["vectorstore"]
+
+            self._stats["hits"] += 1
+            return entry["vectorstore"]
+
+    def mark_fresh(
+        self,
+        persist_directory: str = CHROMA_PERSIST_DIR,
+        embedding_model: str = AZURE_OPENAI_EMBEDDING_MODEL
+    ) -> None:
+        """이 프로세스가 직접 쓴 변경은 재로딩 없이 현재 시그니처로 갱신 (쓰기는 Chroma에만 한다)"""
+        key = (os.path.abspath(persist_directory), embedding_model, "chroma")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["signature"] = get_collection_signature(persist_directory)
+                entry["checked_at"] = time.monotonic()
+
+    def warm_up(
+        self,
+        persist_directory: str = CHROMA_PERSIST_DIR,
+        embedding_model: str = AZURE_OPENAI_EMBEDDING_MODEL,
+        backend: str = VECTOR_BACKEND
+    ) -> None:
+        """첫 요청 전에 (검색에 쓰는) 벡터스토어와 임베딩 클라이언트를 미리 초기화"""
+        self.get(persist_directory, embedding_model, backend)
+
+    def invalidate(self, persist_directory: Optional[str] = None) -> None:
+        """지정 디렉터리(없으면 전체)의 캐시 항목 제거"""
+        with self._lock:
+            if persist_directory is None:
+                self._entries.clear()
+                return
+            target = os.path.abspath(persist_directory)
+            for key in [k for k in self._entries if k[0] == target]:
+                del self._entries[key]
+
+    def stats(self) -> Dict:
+        """hit/miss/reload 횟수와 초기화 소요 시간 통계"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"] + stats["reloads"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+VECTORSTORE_POOL = VectorStorePool()
+
+def get_pooled_vectorstore(
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    embedding_model: str = AZURE_OPENAI_EMBEDDING_MODEL,
+    backend: str = "chroma"
+):
+    """기본은 색인/삭제가 가능한 Chroma, 검색 경로는 backend=VECTOR_BACKEND로 호출"""
+    return VECTORSTORE_POOL.get(persist_directory, embedding_model, backend)
+
+def get_pooled_retriever(
+    top_k: int = 5,
+    score_threshold: float = RETRIEVAL_SCORE_THRESHOLD,
+    persist_directory: str = CHROMA_PERSIST_DIR
+):
+    vectorstore = get_pooled_vectorstore(persist_directory, backend=VECTOR_BACKEND)
+    return get_retriever(vectorstore, top_k=top_k, score_threshold=score_threshold)
+
+# 하이브리드(BM25 + dense) 리트리버 생성 함수
+
+def get_hybrid_retriever(
+    vectorstore,
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    top_k: int = 5,
+    fetch_k: int = 20,
+    score_threshold: Optional[float] = None
+):
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        lexical_index=get_lexical_index(persist_directory),
+        top_k=top_k,
+        fetch_k=max(fetch_k, top_k),
+        score_threshold=score_threshold,
+        lexical_min_ratio=RETRIEVAL_LEXICAL_MIN_RATIO if score_threshold is not None else 0.0,
+    )
+
+def get_pooled_search_retriever(
+    top_k: int = 5,
+    score_threshold: float = RETRIEVAL_SCORE_THRESHOLD,
+    persist_directory: str = CHROMA_PERSIST_DIR
 ):
-    return vectorstore.as_retriever(
-        search_kwargs={"k": top_k, "score_threshold": score_threshold}
-    ) 
\ No newline at end of file
+    """
+    RETRIEVAL_MODE에 따라 하이브리드 또는 dense 리트리버 반환 (어휘 인덱스가 비어 있으면 dense)
+    dense 검색은 VECTOR_BACKEND(chroma/mmap) 벡터스토어를 사용한다.
+    """
+    vectorstore = get_pooled_vectorstore(persist_directory, backend=VECTOR_BACKEND)
+    if RETRIEVAL_MODE == "hybrid" and len(get_lexical_index(persist_directory)) > 0:
+        return get_hybrid_retriever(vectorstore, persist_directory, top_k=top_k, score_threshold=score_threshold)
+    return get_retriever(vectorstore, top_k=top_k, score_threshold=score_threshold)
+
+# PDF 폴더 증분 인덱싱 함수
+
+def ingest_pdf_folder(
+    folder: str = LEGAL_DOCS_DIR,
+    persist_directory: str = CHROMA_PERSIST_DIR,
+    max_workers: Optional[int] = None
+) -> IngestStats:
+    """
+    LegalDocDBManager.sync_documents로 폴더를 동기화하고 파일별 파싱 시간/처리량 반환
+    바뀐 PDF만 프로세스 풀에서 파싱해 해당 파일의 청크를 교체하고, 사라진 PDF의 청크는 삭제한다.
+    """
+    from db_manager import LegalDocDBManager  # db_manager가 rag_utils를 import하므로 지연 import
+    stats = IngestStats()
+    manager = LegalDocDBManager(persist_directory=persist_directory, docs_directory=folder, max_workers=max_workers)
+    manager.sync_documents(stats=stats)
+    return stats
@@ -0,0 +1,147 @@
+# semantic_cache.py
+"""
+질문 임베딩 유사도 기반 답변 캐시 (LangGraph 에이전트 앞단)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    CHROMA_PERSIST_DIR,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+)
+from mmap_index import manifest_signature, mmap_index_path
+from rag_utils import get_collection_signature
+
+
+def corpus_signature(persist_directory: str = CHROMA_PERSIST_DIR) -> Tuple:
+    """Chroma 컬렉션과 mmap 인덱스 manifest 시그니처 (어느 백엔드로 서빙하든 재색인/재export를 감지)"""
+    return (
+        get_collection_signature(persist_directory),
+        manifest_signature(mmap_index_path(persist_directory)),
+    )
+
+
+class SemanticAnswerCache:
+    """
+    이전 질문과 코사인 유사도가 threshold 이상이면 저장된 답변과 참조 문서를 바로 반환
+    - 정규화된 질문 벡터를 하나의 행렬로 유지하여 한 번의 행렬곱으로 최근접 항목 검색
+    - TTL 만료 및 max_entries 초과 시 LRU 순서로 제거
+    - CHROMA_PERSIST_DIR의 컬렉션 또는 mmap 인덱스 manifest가 바뀌면 전체 무효화
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        persist_directory: str = CHROMA_PERSIST_DIR
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_directory = persist_directory
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_key = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[int] = []
+        self._signature = corpus_signature(persist_directory)
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_corpus(self) -> None:
+        signature = corpus_signature(self.persist_directory)
+        if signature != self._signature:
+            self._signature = signature
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+    def _drop(self, key: int) -> None:
+        self._entries.pop(key, None)
+        self._matrix = None
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            self._drop(key)
+        self._stats["expirations"] += len(expired)
+
+    def _index(self) -> Optional[np.ndarray]:
+        if self._matrix is None and self._entries:
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key]["vector"] for key in self._matrix_keys])
+        return self._matrix
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        """유사 질문의 캐시 항목 반환 (없으면 None)"""
+        vector = self._embed(question)
+        with self._lock:
+            self._check_corpus()
+            self._expire(time.time())
+            matrix = self._index()
+            if matrix is not None:
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._matrix_keys[best]
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    entry = self._entries[key]
+                    return {
+                        "question": entry["question"],
+                        "answer": entry["answer"],
+                        "references": entry["references"],
+                        "similarity": float(scores[best]),
+                    }
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, question: str, answer: str, references: Optional[List[Dict]] = None) -> None:
+        vector = self._embed(question)
+        with self._lock:
+            self._check_corpus()
+            self._entries[self._next_key] = {
+                "question": question,
+                "answer": answer,
+                "references": references or [],
+                "vector": vector,
+                "created_at": time.time(),
+            }
+            self._next_key += 1
+            self._matrix = None
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stats["invalidations"] += 1
+            self._clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
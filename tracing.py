@@ -0,0 +1,401 @@
+# tracing.py
+"""
+질문(턴) 단위 성능 추적: 그래프 노드/도구/LLM/리트리버/캐시 구간(span)을 기록하고 SQLite 또는 JSONL로 저장
+비활성화 상태에서는 콜백을 등록하지 않으므로 추가 비용이 거의 없다.
+"""
+
+import contextvars
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import TRACE_DB_PATH, TRACE_RETENTION, TRACING_ENABLED
+
+_ENABLED = TRACING_ENABLED
+_CURRENT_TRACE: contextvars.ContextVar[Optional["TraceRecorder"]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def set_tracing_enabled(enabled: bool) -> None:
+    global _ENABLED
+    _ENABLED = enabled
+
+
+def tracing_enabled() -> bool:
+    return _ENABLED
+
+
+def _percentile(ordered: List[float], p: int) -> float:
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def _summarize(samples: Dict[tuple, List[float]]) -> List[Dict]:
+    """(구간 이름, 종류)별 소요 시간 목록 → 횟수, p50/p95 (p95 내림차순)"""
+    summary = []
+    for (name, kind), values in samples.items():
+        if not values:
+            continue
+        ordered = sorted(values)
+        summary.append({
+            "name": name, "kind": kind, "count": len(ordered),
+            "p50_ms": round(_percentile(ordered, 50), 1), "p95_ms": round(_percentile(ordered, 95), 1),
+        })
+    return sorted(summary, key=lambda row: row["p95_ms"], reverse=True)
+
+
+class SqliteTraceSink:
+    """traces/spans 두 테이블에 턴 단위로 한 번에 기록하고, 최근 retention개 턴만 유지"""
+
+    def __init__(self, path: str = TRACE_DB_PATH, retention: int = TRACE_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS traces ("
+            " trace_id TEXT PRIMARY KEY, thread_id TEXT, question TEXT,"
+            " started_at REAL, duration_ms REAL, cached INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spans ("
+            " trace_id TEXT, span_id TEXT, parent_id TEXT, name TEXT, kind TEXT,"
+            " started_at REAL, duration_ms REAL, attrs TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spans_trace ON spans (trace_id)")
+        self._conn.commit()
+
+    def write(self, trace: Dict, spans: List[Dict]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?)",
+                (trace["trace_id"], trace["thread_id"], trace["question"], trace["started_at"],
+                 trace["duration_ms"], int(trace["cached"])),
+            )
+            self._conn.executemany(
+                "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(trace["trace_id"], s["span_id"], s["parent_id"], s["name"], s["kind"], s["started_at"],
+                  s["duration_ms"], json.dumps(s["attrs"], ensure_ascii=False)) for s in spans],
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self) -> None:
+        row = self._conn.execute(
+            "SELECT started_at FROM traces ORDER BY started_at DESC LIMIT 1 OFFSET ?", (self.retention,)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute(
+                "DELETE FROM spans WHERE trace_id IN (SELECT trace_id FROM traces WHERE started_at <= ?)", (row[0],)
+            )
+            self._conn.execute("DELETE FROM traces WHERE started_at <= ?", (row[0],))
+
+    def recent_traces(self, limit: int = 20, thread_id: Optional[str] = None) -> List[Dict]:
+        """최근 턴 목록 (최신순, 각 턴의 spans 포함)"""
+        query = "SELECT trace_id, thread_id, question, started_at, duration_ms, cached FROM traces"
+        params: tuple = ()
+        if thread_id is not None:
+            query += " WHERE thread_id = ?"
+            params = (thread_id,)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + (limit,)).fetchall()
+            traces = []
+            for trace_id, tid, question, started_at, duration_ms, cached in rows:
+                spans = [
+                    {"span_id": r[0], "parent_id": r[1], "name": r[2], "kind": r[3], "started_at": r[4],
+                     "duration_ms": r[5], "attrs": json.loads(r[6])}
+                    for r in self._conn.execute(
+                        "SELECT span_id, parent_id, name, kind, started_at, duration_ms, attrs"
+                        " FROM spans WHERE trace_id = ? ORDER BY started_at", (trace_id,)
+                    )
+                ]
+                traces.append({
+                    "trace_id": trace_id, "thread_id": tid, "question": question, "started_at": started_at,
+                    "duration_ms": duration_ms, "cached": bool(cached), "spans": spans,
+                })
+        return traces
+
+    def span_percentiles(self, window: int = 200) -> List[Dict]:
+        """최근 window개 턴에서 구간 이름별 횟수와 p50/p95 (턴 전체는 name='turn')"""
+        with self._lock:
+            recent = "SELECT trace_id FROM traces ORDER BY started_at DESC LIMIT ?"
+            turn_rows = self._conn.execute(
+                f"SELECT duration_ms FROM traces WHERE trace_id IN ({recent})", (window,)
+            ).fetchall()
+            span_rows = self._conn.execute(
+                f"SELECT name, kind, duration_ms FROM spans WHERE trace_id IN ({recent})", (window,)
+            ).fetchall()
+        samples: Dict[tuple, List[float]] = defaultdict(list)
+        samples[("turn", "turn")] = [row[0] for row in turn_rows]
+        for name, kind, duration_ms in span_rows:
+            samples[(name, kind)].append(duration_ms)
+        return _summarize(samples)
+
+
+class JsonlTraceSink:
+    """턴마다 {trace..., spans: [...]} 한 줄을 추가 기록하고, 최근 retention개 턴만 유지 (외부 분석 도구로 내보내기용)"""
+
+    def __init__(self, path: str, retention: int = TRACE_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def write(self, trace: Dict, spans: List[Dict]) -> None:
+        line = json.dumps({**trace, "spans": spans}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        """줄 수가 retention을 넘으면 최근 retention줄만 남기도록 파일을 교체"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            total = sum(1 for _ in f)
+            if total <= self.retention:
+                return
+            f.seek(0)
+            kept = deque(f, maxlen=self.retention)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(kept)
+        os.replace(tmp_path, self.path)
+
+    def _tail(self, limit: int) -> List[Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in deque(f, maxlen=limit) if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def recent_traces(self, limit: int = 20, thread_id: Optional[str] = None) -> List[Dict]:
+        traces = self._tail(limit if thread_id is None else limit * 50)[::-1]
+        if thread_id is not None:
+            traces = [t for t in traces if t["thread_id"] == thread_id]
+        return traces[:limit]
+
+    def span_percentiles(self, window: int = 200) -> List[Dict]:
+        samples: Dict[tuple, List[float]] = defaultdict(list)
+        for trace in self._tail(window):
+            samples[("turn", "turn")].append(trace["duration_ms"])
+            for span in trace["spans"]:
+                samples[(span["name"], span["kind"])].append(span["duration_ms"])
+        return _summarize(samples)
+
+
+_SINK = None
+_SINK_LOCK = threading.Lock()
+
+
+def get_trace_sink(path: str = TRACE_DB_PATH):
+    """프로세스 전역 trace 저장소 (.jsonl 경로면 JSONL, 그 외에는 SQLite)"""
+    global _SINK
+    with _SINK_LOCK:
+        if _SINK is None:
+            _SINK = JsonlTraceSink(path) if path.endswith(".jsonl") else SqliteTraceSink(path)
+        return _SINK
+
+
+class TraceRecorder(BaseCallbackHandler):
+    """
+    한 턴 동안 LangChain 콜백으로 구간을 수집하는 핸들러 (요청마다 새로 생성)
+    - 그래프 노드: metadata의 langgraph_node/checkpoint_ns로 'agent/tools' 같은 경로 이름 부여
+    - LLM: 프롬프트/응답 토큰 (응답에 usage가 없으면 근사치, tokens_estimated=True)
+    - 도구/리트리버: 검색 문서 수
+    루트 실행이 끝나면 모은 구간을 저장소에 한 번에 기록한다.
+    """
+
+    run_inline = True
+
+    def __init__(self, sink, thread_id: str, question: str):
+        self.sink = sink
+        self.trace_id = uuid.uuid4().hex
+        self.thread_id = thread_id
+        self.question = question
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, Dict] = {}
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+        self._spans: List[Dict] = []
+        self._root: Optional[UUID] = None
+        self._finished = False
+        self._token = None
+
+    # 컨텍스트 (CachedEmbeddings 등 콜백 밖의 코드가 현재 턴에 구간을 추가할 때 사용)
+    def __enter__(self) -> "TraceRecorder":
+        self._token = _CURRENT_TRACE.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is not None:
+            try:
+                _CURRENT_TRACE.reset(self._token)
+            except ValueError:
+                # 스트리밍 제너레이터가 다른 컨텍스트에서 닫힌 경우
+                _CURRENT_TRACE.set(None)
+            self._token = None
+        self.finish(error=repr(exc) if exc is not None else None)
+
+    def _tracked_parent(self, parent_run_id: Optional[UUID]) -> Optional[str]:
+        while parent_run_id is not None and parent_run_id not in self._open:
+            parent_run_id = self._parents.get(parent_run_id)
+        return str(parent_run_id) if parent_run_id is not None else None
+
+    def _begin(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attrs: Any) -> None:
+        with self._lock:
+            self._open[run_id] = {
+                "span_id": str(run_id),
+                "parent_id": self._tracked_parent(parent_run_id),
+                "name": name,
+                "kind": kind,
+                "started_at": time.time(),
+                "_start": time.perf_counter(),
+                "attrs": attrs,
+            }
+
+    def _end(self, run_id: UUID, **attrs: Any) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            span["duration_ms"] = round((time.perf_counter() - span.pop("_start")) * 1000, 3)
+            span["attrs"].update(attrs)
+            self._spans.append(span)
+
+    def add_span(self, name: str, kind: str, duration_ms: float, **attrs: Any) -> None:
+        """콜백 밖에서 측정한 구간 추가 (시맨틱 캐시 조회, 임베딩 등)"""
+        with self._lock:
+            self._spans.append({
+                "span_id": uuid.uuid4().hex,
+                "parent_id": str(self._root) if self._root else None,
+                "name": name,
+                "kind": kind,
+                "started_at": time.time() - duration_ms / 1000,
+                "duration_ms": round(duration_ms, 3),
+                "attrs": attrs,
+            })
+
+    # 체인 / 그래프 노드
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        if parent_run_id is None and self._root is None:
+            self._root = run_id
+            self._begin(run_id, None, "graph", "graph")
+            return
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            namespace = metadata.get("langgraph_checkpoint_ns", "")
+            path = "/".join(part.split(":")[0] for part in namespace.split("|") if part) or node
+            self._begin(run_id, parent_run_id, path, "node")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+        if run_id == self._root:
+            self.finish()
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+        if run_id == self._root:
+            self.finish(error=repr(error))
+
+    # LLM
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        from langchain_core.messages.utils import count_tokens_approximately
+
+        self._parents[run_id] = parent_run_id
+        self._begin(run_id, parent_run_id, "llm", "llm",
+                    prompt_tokens=count_tokens_approximately(messages[0]) if messages else 0,
+                    tokens_estimated=True)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = None
+        text = ""
+        if response.generations and response.generations[0]:
+            generation = response.generations[0][0]
+            text = getattr(generation, "text", "") or ""
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+        if usage:
+            self._end(run_id, prompt_tokens=usage.get("input_tokens", 0),
+                      completion_tokens=usage.get("output_tokens", 0), tokens_estimated=False)
+        else:
+            self._end(run_id, completion_tokens=max(1, len(text) // 2) if text else 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    # 도구 / 리트리버
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._begin(run_id, parent_run_id, f"tool:{name}", "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        artifact = getattr(output, "artifact", None)
+        self._end(run_id, doc_count=len(artifact) if isinstance(artifact, list) else None)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        self._begin(run_id, parent_run_id, "retriever", "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, doc_count=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    def finish(self, cached: bool = False, error: Optional[str] = None) -> None:
+        """턴 종료: 한 번만 저장소에 기록"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            spans = list(self._spans)
+        trace = {
+            "trace_id": self.trace_id,
+            "thread_id": self.thread_id,
+            "question": self.question,
+            "started_at": self.started_at,
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "cached": cached,
+        }
+        if error:
+            trace["error"] = error
+        self.sink.write(trace, spans)
+
+
+def start_trace(thread_id: str, question: str) -> Optional[TraceRecorder]:
+    """추적이 켜져 있으면 새 턴의 TraceRecorder, 꺼져 있으면 None"""
+    if not _ENABLED:
+        return None
+    return TraceRecorder(get_trace_sink(), thread_id, question)
+
+
+def current_trace() -> Optional[TraceRecorder]:
+    return _CURRENT_TRACE.get()
+
+
+def record_span(name: str, kind: str, duration_ms: float, **attrs: Any) -> None:
+    """현재 턴이 추적 중이면 구간 추가 (추적 중이 아니면 아무 것도 하지 않음)"""
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_span(name, kind, duration_ms, **attrs)